@@ -0,0 +1,133 @@
+"""
+Benchmark dos endpoints do dashboard executados em processo (Django test client)
+
+Gera (ou reutiliza) um banco sintético na escala pedida, aponta o app para ele
+via OSC_DB_PATH e mede cada cenário isoladamente e o mix de tráfego completo,
+reportando p50/p95/p99, vazão e memória residente.
+
+Exemplos:
+    python benchmarks/bench_endpoints.py --linhas 50000
+    python benchmarks/bench_endpoints.py --linhas 500000 --trigramas --json resultados.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'core' / 'utils'))
+
+from benchmarks.comum import imprimir_tabela, montar_cenarios, percentis, rss_mb, sortear
+from gerador_sintetico import gerar_banco
+
+
+def preparar_banco(args):
+    banco = Path(args.banco or project_root / 'data' / 'sintetico' / f'oscs_{args.linhas}.db')
+    if not banco.exists() or args.regerar:
+        print(f"Gerando banco sintético com {args.linhas} OSCs em {banco}...")
+        inicio = time.perf_counter()
+        gerar_banco(banco, args.linhas, trigramas=args.trigramas)
+        print(f"Banco gerado em {time.perf_counter() - inicio:.1f} s")
+    return banco
+
+
+def configurar_django(banco):
+    os.environ['OSC_DB_PATH'] = str(banco)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+    import django
+    django.setup()
+    # Um log por requisição distorceria as medições
+    logging.getLogger('osc_dashboard.performance').setLevel(logging.WARNING)
+    from django.test import Client
+    return Client(HTTP_HOST='localhost')
+
+
+def requisitar(client, metodo, caminho, payload):
+    inicio = time.perf_counter()
+    if metodo == 'GET':
+        response = client.get(caminho)
+    else:
+        response = client.post(caminho, json.dumps(payload), content_type='application/json')
+    ms = (time.perf_counter() - inicio) * 1000
+    return response.status_code, ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark em processo dos endpoints do dashboard')
+    parser.add_argument('--linhas', type=int, default=50000, help='Escala do banco sintético (ex.: 50000, 500000, 5000000)')
+    parser.add_argument('--banco', default=None, help='Usa este banco em vez do sintético padrão')
+    parser.add_argument('--regerar', action='store_true', help='Regera o banco sintético mesmo se existir')
+    parser.add_argument('--trigramas', action='store_true', help='Cria o índice de trigramas ao gerar o banco')
+    parser.add_argument('--repeticoes', type=int, default=20, help='Execuções por cenário')
+    parser.add_argument('--mix', type=int, default=200, help='Requisições do mix de tráfego')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--json', default=None, help='Salva os resultados neste arquivo JSON')
+    args = parser.parse_args()
+
+    banco = preparar_banco(args)
+    client = configurar_django(banco)
+    rng = random.Random(args.semente)
+
+    rss_inicial = rss_mb()
+    # Aquecimento e descoberta dos valores de filtro do banco
+    requisitar(client, 'GET', '/', None)
+    response = client.post('/filter/', json.dumps({'facetas': True, 'per_page': 1}), content_type='application/json')
+    geradores = montar_cenarios(response.json()['facetas'])
+
+    print(f"\nBanco: {banco} ({os.path.getsize(banco) / 1024 / 1024:.1f} MB)")
+
+    # Cenários isolados
+    isolados = {}
+    erros = 0
+    for nome, gerador in geradores.items():
+        latencias = []
+        for _ in range(args.repeticoes):
+            status, ms = requisitar(client, *gerador(rng))
+            erros += status >= 500
+            latencias.append(ms)
+        isolados[nome] = latencias
+    print("\n=== CENÁRIOS ISOLADOS ===")
+    imprimir_tabela(isolados)
+
+    # Mix de tráfego
+    mix = {}
+    inicio = time.perf_counter()
+    for _ in range(args.mix):
+        nome, metodo, caminho, payload = sortear(geradores, rng)
+        status, ms = requisitar(client, metodo, caminho, payload)
+        erros += status >= 500
+        mix.setdefault(nome, []).append(ms)
+    duracao = time.perf_counter() - inicio
+    todas = [ms for latencias in mix.values() for ms in latencias]
+    geral = percentis(todas)
+
+    print("\n=== MIX DE TRÁFEGO ===")
+    imprimir_tabela(mix, duracao)
+    print(f"\nTotal: {len(todas)} requisições em {duracao:.1f} s ({len(todas) / duracao:.1f} req/s)")
+    print(f"Latência geral: p50 {geral['p50']:.1f} ms, p95 {geral['p95']:.1f} ms, p99 {geral['p99']:.1f} ms")
+    print(f"Erros 5xx: {erros}")
+    print(f"RSS: {rss_inicial:.1f} MB no início, {rss_mb():.1f} MB no fim")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'banco': str(banco),
+                'linhas': args.linhas,
+                'isolados': {nome: percentis(l) for nome, l in isolados.items()},
+                'mix': {nome: percentis(l) for nome, l in mix.items()},
+                'geral': geral,
+                'vazao_req_s': len(todas) / duracao,
+                'erros_5xx': erros,
+                'rss_mb': rss_mb(),
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
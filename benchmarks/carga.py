@@ -0,0 +1,132 @@
+"""
+Gerador de carga assíncrono para um servidor do dashboard em execução
+
+Simula N usuários concorrentes disparando o mix de tráfego (filtros,
+exportações, dashboard e dados do mapa) durante um tempo fixo e reporta
+latências p50/p95/p99 por cenário, vazão, erros e, opcionalmente, a memória
+residente dos processos do servidor.
+
+Exemplos:
+    python benchmarks/carga.py --url http://127.0.0.1:8000 --usuarios 20 --duracao 30
+    python benchmarks/carga.py --url http://127.0.0.1:8000 --pids $(pgrep -f gunicorn)
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from benchmarks.comum import imprimir_tabela, montar_cenarios, percentis, rss_mb, sortear
+
+
+async def requisitar(url, metodo, caminho, payload=None, timeout=120):
+    """Faz uma requisição HTTP/1.1 simples e retorna (status, corpo, ms)"""
+    partes = urlsplit(url)
+    host = partes.hostname
+    porta = partes.port or (443 if partes.scheme == 'https' else 80)
+    corpo = json.dumps(payload).encode('utf-8') if payload is not None else b''
+
+    cabecalhos = [
+        f'{metodo} {caminho} HTTP/1.1',
+        f'Host: {partes.netloc}',
+        'Connection: close',
+        'Accept-Encoding: identity',
+    ]
+    if payload is not None:
+        cabecalhos += ['Content-Type: application/json', f'Content-Length: {len(corpo)}']
+    requisicao = ('\r\n'.join(cabecalhos) + '\r\n\r\n').encode('latin-1') + corpo
+
+    inicio = time.perf_counter()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, porta, ssl=partes.scheme == 'https'), timeout
+    )
+    try:
+        writer.write(requisicao)
+        await writer.drain()
+        resposta = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    ms = (time.perf_counter() - inicio) * 1000
+
+    cabecalho, _, conteudo = resposta.partition(b'\r\n\r\n')
+    status = int(cabecalho.split(b' ', 2)[1])
+    return status, conteudo, ms
+
+
+async def usuario(url, geradores, rng, fim, resultados, erros):
+    """Usuário virtual: dispara requisições sorteadas do mix até o fim do teste"""
+    while time.perf_counter() < fim:
+        nome, metodo, caminho, payload = sortear(geradores, rng)
+        try:
+            status, _, ms = await requisitar(url, metodo, caminho, payload)
+        except (OSError, asyncio.TimeoutError) as e:
+            erros[type(e).__name__] = erros.get(type(e).__name__, 0) + 1
+            continue
+        if status >= 400:
+            erros[str(status)] = erros.get(str(status), 0) + 1
+        resultados.setdefault(nome, []).append(ms)
+
+
+async def executar(args):
+    status, conteudo, _ = await requisitar(args.url, 'POST', '/filter/', {'facetas': True, 'per_page': 1})
+    if status != 200:
+        raise SystemExit(f"Não foi possível obter as facetas do servidor (HTTP {status})")
+    geradores = montar_cenarios(json.loads(conteudo)['facetas'])
+
+    resultados = {}
+    erros = {}
+    rss_inicial = {pid: rss_mb(pid) for pid in args.pids}
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(
+        usuario(args.url, geradores, random.Random(args.semente + i), fim, resultados, erros)
+        for i in range(args.usuarios)
+    ))
+    duracao = time.perf_counter() - inicio
+
+    todas = [ms for latencias in resultados.values() for ms in latencias]
+    geral = percentis(todas)
+    imprimir_tabela(resultados, duracao)
+    print(f"\nUsuários concorrentes: {args.usuarios}, duração: {duracao:.1f} s")
+    print(f"Total: {len(todas)} requisições ({len(todas) / duracao:.1f} req/s)")
+    if todas:
+        print(f"Latência geral: p50 {geral['p50']:.1f} ms, p95 {geral['p95']:.1f} ms, p99 {geral['p99']:.1f} ms")
+    print(f"Erros: {erros or 'nenhum'}")
+    for pid in args.pids:
+        print(f"RSS do processo {pid}: {rss_inicial[pid] or 0:.1f} MB -> {rss_mb(pid) or 0:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'url': args.url,
+                'usuarios': args.usuarios,
+                'duracao_s': duracao,
+                'cenarios': {nome: percentis(l) for nome, l in resultados.items()},
+                'geral': geral,
+                'vazao_req_s': len(todas) / duracao,
+                'erros': erros,
+                'rss_mb': {str(pid): rss_mb(pid) for pid in args.pids},
+            }, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do dashboard')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base do servidor')
+    parser.add_argument('--usuarios', type=int, default=10, help='Usuários virtuais concorrentes')
+    parser.add_argument('--duracao', type=float, default=30, help='Duração do teste em segundos')
+    parser.add_argument('--pids', type=int, nargs='*', default=[], help='PIDs do servidor para medir RSS')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--json', default=None, help='Salva os resultados neste arquivo JSON')
+    args = parser.parse_args()
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
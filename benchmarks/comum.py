@@ -0,0 +1,108 @@
+"""
+Cenários de carga e estatísticas compartilhados pelos benchmarks
+"""
+
+import os
+import resource
+
+# Peso relativo de cada tipo de requisição no mix de tráfego
+PESOS = {
+    'dashboard': 10,
+    'municipios_data': 5,
+    'filtro_municipio': 25,
+    'filtro_municipio_palavras': 15,
+    'filtro_palavras': 10,
+    'filtro_bacia': 8,
+    'filtro_natureza_situacao': 10,
+    'filtro_aproximado': 5,
+    'filtro_pagina_profunda': 5,
+    'exportacao': 2,
+}
+
+PALAVRAS = ['ambiental', 'agua', 'rural', 'recursos hidricos', 'bacia', 'rio', 'conservacao', 'moradores']
+PALAVRAS_COM_ERRO = ['ambeintal', 'agau', 'hidircos', 'conservasao']
+
+
+def montar_cenarios(facetas):
+    """
+    Monta os cenários (nome, método, caminho, payload) a partir das facetas
+    retornadas por /filter/, para funcionar com qualquer banco
+    """
+    municipios = sorted(facetas['municipio'], key=facetas['municipio'].get, reverse=True)
+    naturezas = sorted(facetas['natureza_juridica'], key=facetas['natureza_juridica'].get, reverse=True)
+    situacoes = sorted(facetas['situacao_cadastral'], key=facetas['situacao_cadastral'].get, reverse=True)
+
+    def filtro(rng):
+        return {'municipio': rng.choice(municipios[:50])}
+
+    geradores = {
+        'dashboard': lambda rng: ('GET', '/', None),
+        'municipios_data': lambda rng: ('GET', '/municipios-data/', None),
+        'filtro_municipio': lambda rng: ('POST', '/filter/', filtro(rng)),
+        'filtro_municipio_palavras': lambda rng: ('POST', '/filter/', {
+            **filtro(rng), 'palavras_chave': ' '.join(rng.sample(PALAVRAS, 2)),
+        }),
+        'filtro_palavras': lambda rng: ('POST', '/filter/', {'palavras_chave': rng.choice(PALAVRAS)}),
+        'filtro_bacia': lambda rng: ('POST', '/filter/', {
+            'municipio': ','.join(rng.sample(municipios, min(20, len(municipios)))),
+        }),
+        'filtro_natureza_situacao': lambda rng: ('POST', '/filter/', {
+            'natureza_juridica': rng.choice(naturezas), 'situacao_cadastral': situacoes[0],
+        }),
+        'filtro_aproximado': lambda rng: ('POST', '/filter/', {
+            'palavras_chave': rng.choice(PALAVRAS_COM_ERRO), 'busca_aproximada': True,
+        }),
+        'filtro_pagina_profunda': lambda rng: ('POST', '/filter/', {
+            'situacao_cadastral': situacoes[0], 'page': rng.randint(20, 200),
+        }),
+        'exportacao': lambda rng: ('POST', '/export/', {
+            **filtro(rng), 'natureza_juridica': naturezas[-1],
+        }),
+    }
+    return geradores
+
+
+def sortear(geradores, rng, pesos=PESOS):
+    """Sorteia um cenário conforme os pesos e retorna (nome, método, caminho, payload)"""
+    nomes = [nome for nome in pesos if nome in geradores]
+    nome = rng.choices(nomes, [pesos[n] for n in nomes])[0]
+    return (nome, *geradores[nome](rng))
+
+
+def percentis(latencias):
+    """Resumo das latências em ms (p50, p95, p99, máximo)"""
+    if not latencias:
+        return {'n': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    ordenadas = sorted(latencias)
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(round(q * (len(ordenadas) - 1))))]
+
+    return {'n': len(ordenadas), 'p50': p(0.50), 'p95': p(0.95), 'p99': p(0.99), 'max': ordenadas[-1]}
+
+
+def rss_mb(pid=None):
+    """Memória residente atual (MB) do processo, via /proc quando disponível"""
+    caminho = f'/proc/{pid or os.getpid()}/status'
+    try:
+        with open(caminho) as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is None:
+        # ru_maxrss é o pico (KB no Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def imprimir_tabela(resultados, duracao=None):
+    """Imprime a tabela de latências por cenário"""
+    print(f"\n{'Cenário':<28}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'req/s':>9}")
+    for nome, latencias in sorted(resultados.items()):
+        r = percentis(latencias)
+        if not r['n']:
+            continue
+        vazao = r['n'] / duracao if duracao else r['n'] / (sum(latencias) / 1000)
+        print(f"{nome:<28}{r['n']:>7}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['max']:>10.1f}{vazao:>9.1f}")
@@ -0,0 +1,138 @@
+"""
+Compara os modos WSGI (workers síncronos) e ASGI (workers do uvicorn com
+views assíncronas) sob tráfego misto: usuários disparando exportações lentas
+enquanto outros fazem filtragens rápidas.
+
+Para cada modo, sobe o gunicorn com o mesmo número de workers, aplica a carga
+e reporta as latências p50/p95/p99 das requisições rápidas e lentas. No modo
+WSGI as filtragens ficam na fila atrás das exportações; no ASGI o event loop
+continua atendendo-as enquanto o pool de threads processa as exportações.
+
+Exemplo:
+    python benchmarks/concorrencia.py --workers 2 --lentos 4 --rapidos 16 --duracao 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from benchmarks.carga import requisitar
+from benchmarks.comum import imprimir_tabela, percentis
+
+MODOS = {
+    'wsgi': (['dashboard_osc.wsgi:application'], {'ASYNC_VIEWS': 'False'}),
+    'asgi': (['dashboard_osc.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'], {'ASYNC_VIEWS': 'True'}),
+}
+
+
+def iniciar_servidor(modo, args):
+    """Sobe o gunicorn no modo pedido e espera a porta aceitar conexões"""
+    alvo, env_modo = MODOS[modo]
+    env = {**os.environ, **env_modo, 'PERFORMANCE_METRICS': 'False'}
+    if args.banco:
+        env['OSC_DB_PATH'] = args.banco
+    processo = subprocess.Popen(
+        ['gunicorn', *alvo, '--workers', str(args.workers), '--bind', f'127.0.0.1:{args.porta}', '--timeout', '300'],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', args.porta), timeout=1).close()
+            return processo
+        except OSError:
+            time.sleep(0.3)
+    processo.terminate()
+    raise SystemExit(f"O servidor {modo} não subiu na porta {args.porta}")
+
+
+async def usuario(url, nome, gerador, rng, fim, resultados, erros):
+    while time.perf_counter() < fim:
+        metodo, caminho, payload = gerador(rng)
+        try:
+            status, _, ms = await requisitar(url, metodo, caminho, payload, timeout=300)
+        except (OSError, asyncio.TimeoutError) as e:
+            erros[type(e).__name__] = erros.get(type(e).__name__, 0) + 1
+            continue
+        if status >= 500:
+            erros[str(status)] = erros.get(str(status), 0) + 1
+        resultados.setdefault(nome, []).append(ms)
+
+
+async def medir(args):
+    url = f'http://127.0.0.1:{args.porta}'
+    status, conteudo, _ = await requisitar(url, 'POST', '/filter/', {'facetas': True, 'per_page': 1})
+    if status != 200:
+        raise SystemExit(f"Não foi possível obter as facetas do servidor (HTTP {status})")
+    facetas = json.loads(conteudo)['facetas']
+    municipios = sorted(facetas['municipio'], key=facetas['municipio'].get, reverse=True)
+    situacoes = sorted(facetas['situacao_cadastral'], key=facetas['situacao_cadastral'].get, reverse=True)
+
+    # Exportação grande (lenta) e página de um município (rápida)
+    def lenta(rng):
+        return 'POST', '/export/', {'situacao_cadastral': situacoes[0], 'municipio': ','.join(municipios[:args.municipios_export])}
+
+    def rapida(rng):
+        return 'POST', '/filter/', {'municipio': rng.choice(municipios[:50]), 'page': rng.randint(1, 3)}
+
+    resultados = {}
+    erros = {}
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(
+        *(usuario(url, 'exportacao_lenta', lenta, random.Random(args.semente + i), fim, resultados, erros)
+          for i in range(args.lentos)),
+        *(usuario(url, 'filtro_rapido', rapida, random.Random(args.semente + 1000 + i), fim, resultados, erros)
+          for i in range(args.rapidos)),
+    )
+    return resultados, erros, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara os modos WSGI e ASGI sob tráfego misto')
+    parser.add_argument('--modos', nargs='+', default=list(MODOS), choices=list(MODOS))
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn em cada modo')
+    parser.add_argument('--porta', type=int, default=8766)
+    parser.add_argument('--banco', default=None, help='Banco usado pelo servidor (padrão: OSC_DB_PATH)')
+    parser.add_argument('--lentos', type=int, default=4, help='Usuários disparando exportações')
+    parser.add_argument('--rapidos', type=int, default=16, help='Usuários disparando filtragens')
+    parser.add_argument('--municipios-export', type=int, default=10, help='Municípios incluídos na exportação lenta')
+    parser.add_argument('--duracao', type=float, default=20, help='Duração de cada medição em segundos')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    resumo = {}
+    for modo in args.modos:
+        print(f"\n=== MODO {modo.upper()} ({args.workers} workers) ===")
+        processo = iniciar_servidor(modo, args)
+        try:
+            resultados, erros, duracao = asyncio.run(medir(args))
+        finally:
+            processo.terminate()
+            processo.wait()
+        imprimir_tabela(resultados, duracao)
+        print(f"Erros: {erros or 'nenhum'}")
+        resumo[modo] = {nome: percentis(latencias) for nome, latencias in resultados.items()}
+        resumo[modo]['vazao_rapidas'] = len(resultados.get('filtro_rapido', [])) / duracao
+
+    if len(resumo) > 1:
+        print(f"\n{'Modo':<8}{'rápidas req/s':>15}{'rápidas p50':>13}{'rápidas p95':>13}{'lentas p50':>12}")
+        for modo, r in resumo.items():
+            rapidas = r.get('filtro_rapido', {})
+            lentas = r.get('exportacao_lenta', {})
+            print(f"{modo:<8}{r['vazao_rapidas']:>15.1f}{rapidas.get('p50') or 0:>13.1f}"
+                  f"{rapidas.get('p95') or 0:>13.1f}{lentas.get('p50') or 0:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
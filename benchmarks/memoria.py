@@ -0,0 +1,87 @@
+"""
+Relatório de memória da carga da tabela oscs em DataFrame
+
+Compara o carregador antigo (SELECT * com colunas object) com o compacto de
+load_osc_data (categorias e int32), cada um em um processo novo, reportando
+o acréscimo de memória residente, o tamanho do DataFrame e o tempo de carga.
+
+Exemplo:
+    python benchmarks/memoria.py --banco data/sintetico/oscs_500000.db
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from benchmarks.comum import rss_mb
+
+CARREGADORES = ['objeto', 'compacto', 'compacto_colunas']
+
+# Colunas usadas por agregações e listagens que não precisam de endereço e contatos
+COLUNAS_REDUZIDAS = ['id_osc', 'nome', 'natureza_juridica', 'situacao_cadastral', 'edmu_nm_municipio']
+
+
+def medir(carregador):
+    """Carrega a tabela no processo atual e retorna as medições"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+    import django
+    django.setup()
+    import pandas as pd
+    from osc_dashboard import views
+
+    gc.collect()
+    rss_inicial = rss_mb()
+    inicio = time.perf_counter()
+    if carregador == 'objeto':
+        conn = views.get_db_connection()
+        df = pd.read_sql_query("SELECT * FROM oscs", conn)
+        conn.close()
+    elif carregador == 'compacto':
+        df = views.load_osc_data()
+    else:
+        df = views.load_osc_data(COLUNAS_REDUZIDAS)
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    return {
+        'linhas': len(df),
+        'rss_mb': rss_mb() - rss_inicial,
+        'df_mb': df.memory_usage(deep=True).sum() / 1024 / 1024,
+        'carga_ms': segundos * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória do DataFrame da tabela oscs por carregador')
+    parser.add_argument('--banco', default=None, help='Banco medido (padrão: OSC_DB_PATH)')
+    parser.add_argument('--carregador', choices=CARREGADORES, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.carregador:
+        # Processo filho: mede um único carregador
+        print(json.dumps(medir(args.carregador)))
+        return
+
+    env = dict(os.environ)
+    if args.banco:
+        env['OSC_DB_PATH'] = args.banco
+
+    print(f"{'Carregador':<18}{'linhas':>10}{'RSS +MB':>10}{'DataFrame MB':>14}{'carga ms':>10}")
+    for carregador in CARREGADORES:
+        saida = subprocess.run(
+            [sys.executable, __file__, '--carregador', carregador],
+            cwd=project_root, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(saida.strip().splitlines()[-1])
+        print(f"{carregador:<18}{r['linhas']:>10}{r['rss_mb']:>10.1f}{r['df_mb']:>14.1f}{r['carga_ms']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,18 @@ pip install -r requirements.txt
 
 # Verificar se o banco de dados existe
 echo "🗄️ Verificando banco de dados..."
-if [ ! -f "data/oscs_parana_novo.db" ]; then
-    echo "⚠️ Banco de dados não encontrado em data/oscs_parana_novo.db"
+DB_PATH="${OSC_DB_PATH:-data/oscs_parana_novo.db}"
+if [ -f "$DB_PATH.zst" ]; then
+    echo "🗜️ Descomprimindo $DB_PATH.zst..."
+    python core/utils/otimizar_banco.py --origem "$DB_PATH" --descomprimir
+fi
+if [ ! -f "$DB_PATH" ]; then
+    echo "⚠️ Banco de dados não encontrado em $DB_PATH"
     echo "   Certifique-se de que o arquivo está no repositório"
+else
+    # Bancos sem o índice atual (ou com o formato antigo) fariam a busca aproximada voltar à exata
+    echo "🔤 Verificando índice da busca aproximada..."
+    python core/utils/criar_indice_trigramas.py --se-ausente
 fi
 
 # Coletar arquivos estáticos
@@ -7,6 +7,8 @@ import os
 import sys
 from pathlib import Path
 
+from dashboard_osc.settings import OSC_DB_PATH
+
 def check_file_exists(file_path, description):
     """Verifica se um arquivo existe"""
     if os.path.exists(file_path):
@@ -33,7 +35,7 @@ def check_file_content(file_path, required_content, description):
 
 def check_database():
     """Verifica o banco de dados"""
-    db_path = "data/oscs_parana_novo.db"
+    db_path = OSC_DB_PATH
     if os.path.exists(db_path):
         size = os.path.getsize(db_path)
         size_mb = size / (1024 * 1024)
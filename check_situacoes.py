@@ -6,9 +6,11 @@ Script para verificar situações cadastrais disponíveis
 import sqlite3
 import os
 
+from dashboard_osc.settings import OSC_DB_PATH
+
 def check_situacoes():
     """Verifica situações cadastrais no banco"""
-    db_path = os.path.join('data', 'oscs_parana_novo.db')
+    db_path = OSC_DB_PATH
     
     if not os.path.exists(db_path):
         print(f"❌ Banco não encontrado: {db_path}")
@@ -7,9 +7,11 @@ import json
 import sqlite3
 import os
 
+from dashboard_osc.settings import OSC_DB_PATH
+
 def get_municipios_banco():
     """Obtém lista de municípios do banco"""
-    conn = sqlite3.connect('data/oscs_parana_novo.db')
+    conn = sqlite3.connect(OSC_DB_PATH)
     cursor = conn.cursor()
     cursor.execute('SELECT DISTINCT edmu_nm_municipio FROM oscs WHERE edmu_nm_municipio != "" ORDER BY edmu_nm_municipio')
     municipios = [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,109 @@
+"""
+Script para atualizar incrementalmente o banco SQLite3 de um estado a partir
+de uma nova saída do pipeline (CSV)
+
+Aplica só as OSCs inseridas, alteradas e removidas, em uma transação, com
+os trigramas e o resumo estatístico atualizados junto, e imprime o
+relatório de alterações. Mudanças na estrutura do CSV exigem a migração
+completa (migrar_novo_sqlite.py). Exemplos:
+    python core/utils/atualizar_banco.py --simular
+    python core/utils/atualizar_banco.py --csv data/dados_osc_PR_FINAL.csv --relatorio alteracoes.json
+    python core/utils/atualizar_banco.py --publicar
+"""
+
+import argparse
+import django
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# Configura o Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+from osc_dashboard import analytics
+from osc_dashboard.partitions import default_state, state_db_path
+from osc_dashboard.updates import read_pipeline_csv, update_from_dataframe
+from osc_dashboard.versions import publish_version
+
+CSV_PATH = 'data/dados_osc_{uf}_FINAL.csv'
+
+
+def imprimir_relatorio(relatorio):
+    print(f"Linhas na nova saída: {relatorio['linhas_novas']} "
+          f"(descartadas sem id_osc ou repetidas: {relatorio['linhas_descartadas']})")
+    print(f"Inseridas: {relatorio['inseridos']} | Alteradas: {relatorio['alterados']} | "
+          f"Removidas: {relatorio['removidos']} | Inalteradas: {relatorio['inalterados']}")
+    for coluna, total in sorted(relatorio['colunas_alteradas'].items(), key=lambda item: -item[1]):
+        print(f"  {coluna:<22}{total:>8} alteração(ões)")
+    for tipo in ('inseridos', 'alterados', 'removidos'):
+        if relatorio[f'exemplos_{tipo}']:
+            print(f"Exemplos de {tipo}: {', '.join(str(i) for i in relatorio[f'exemplos_{tipo}'])}")
+
+
+def atualizar_banco(uf=None, csv_path=None, simular=False, publicar=False, arquivo_relatorio=None):
+    """Atualiza o banco da UF com a nova saída do pipeline e retorna o relatório"""
+    uf = (uf or default_state()).upper()
+    csv_path = Path(csv_path or CSV_PATH.format(uf=uf))
+    db_path = state_db_path(uf)
+
+    if not csv_path.exists():
+        print(f"Arquivo CSV não encontrado: {csv_path}")
+        return None
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path} (use migrar_novo_sqlite.py)")
+        return None
+
+    print(f"Carregando nova saída: {csv_path}")
+    df = read_pipeline_csv(csv_path)
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        relatorio = update_from_dataframe(conn, df, simular=simular, origem=csv_path.name)
+    finally:
+        conn.close()
+    relatorio['segundos'] = round(time.perf_counter() - inicio, 2)
+
+    imprimir_relatorio(relatorio)
+    if arquivo_relatorio:
+        with open(arquivo_relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if simular:
+        print(f"Simulação concluída em {relatorio['segundos']} s; nada foi gravado")
+        return relatorio
+
+    houve_alteracao = relatorio['inseridos'] or relatorio['alterados'] or relatorio['removidos']
+    print(f"Atualização concluída em {relatorio['segundos']} s")
+    if houve_alteracao:
+        print(f"Versão registrada no histórico: {relatorio['versao']}")
+
+    # O snapshot Parquet é derivado: regravado só se já existia
+    if houve_alteracao and analytics.pa is not None and analytics.snapshot_path(db_path).exists():
+        conn = sqlite3.connect(db_path)
+        analytics.write_snapshot(conn, analytics.snapshot_path(db_path))
+        conn.close()
+        print("Snapshot Parquet regravado")
+
+    if publicar and uf == default_state():
+        destino = publish_version(db_path)
+        print(f"Versão publicada e ativa: {destino.stem}")
+    return relatorio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Atualiza incrementalmente o banco de OSCs de um estado')
+    parser.add_argument('--uf', default=None, help='UF do banco (padrão: OSC_UF_PADRAO)')
+    parser.add_argument('--csv', default=None, help='Nova saída do pipeline (padrão: data/dados_osc_<UF>_FINAL.csv)')
+    parser.add_argument('--simular', action='store_true', help='Apenas calcula e imprime o relatório')
+    parser.add_argument('--relatorio', default=None, help='Salva o relatório neste arquivo JSON')
+    parser.add_argument('--publicar', action='store_true', help='Publica o banco atualizado como nova versão (UF padrão)')
+    args = parser.parse_args()
+    atualizar_banco(args.uf, args.csv, args.simular, args.publicar, args.relatorio)
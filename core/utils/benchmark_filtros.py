@@ -0,0 +1,115 @@
+"""
+Script para comparar o motor de filtragem em bitmaps com as consultas SQLite
+"""
+
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import django
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# Configura o Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+from osc_dashboard.bitmap import BitmapIndex, rowid_query
+from osc_dashboard.filters import build_query, parse_filters
+from osc_dashboard.views import get_db_connection
+
+REPETICOES = 50
+PER_PAGE = 50
+
+
+def cenarios(conn):
+    """Combinações de filtros categóricos montadas a partir dos valores mais frequentes"""
+    municipios = [row[0] for row in conn.execute(
+        "SELECT edmu_nm_municipio FROM oscs WHERE edmu_nm_municipio != '' "
+        "GROUP BY edmu_nm_municipio ORDER BY COUNT(*) DESC LIMIT 20"
+    )]
+    naturezas = [row[0] for row in conn.execute(
+        "SELECT DISTINCT natureza_juridica FROM oscs WHERE natureza_juridica != ''"
+    )]
+    situacoes = [row[0] for row in conn.execute(
+        "SELECT situacao_cadastral FROM oscs WHERE situacao_cadastral != '' "
+        "GROUP BY situacao_cadastral ORDER BY COUNT(*) DESC LIMIT 2"
+    )]
+
+    return {
+        'sem filtros': {},
+        '1 município': {'municipio': municipios[0]},
+        '20 municípios': {'municipio': ','.join(municipios)},
+        'município + natureza': {'municipio': municipios[0], 'natureza_juridica': naturezas[0]},
+        'natureza + situação': {'natureza_juridica': ','.join(naturezas[:2]), 'situacao_cadastral': situacoes[0]},
+        'todas as dimensões, página 5': {
+            'municipio': ','.join(municipios[:5]),
+            'natureza_juridica': naturezas[0],
+            'situacao_cadastral': ','.join(situacoes),
+            'page': 5,
+        },
+    }
+
+
+def medir(funcao):
+    """Executa a função REPETICOES vezes e retorna (resultado, mediana ms, p95 ms)"""
+    tempos = []
+    resultado = None
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return resultado, statistics.median(tempos), tempos[int(len(tempos) * 0.95) - 1]
+
+
+def consulta_sqlite(conn, filtros, page):
+    with_clause, from_where, params, order_by = build_query(conn, filtros)
+    total = conn.execute(f"{with_clause}SELECT COUNT(*) {from_where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"{with_clause}SELECT * {from_where}{order_by} LIMIT ? OFFSET ?",
+        params + [PER_PAGE, (page - 1) * PER_PAGE],
+    ).fetchall()
+    return total, len(rows)
+
+
+def consulta_bitmap(conn, index, filtros, page):
+    total = index.count(filtros)
+    query, params = rowid_query(index.page(filtros, (page - 1) * PER_PAGE, PER_PAGE))
+    rows = conn.execute(query, params).fetchall()
+    return total, len(rows)
+
+
+def benchmark_filtros():
+    """Compara contagem + página entre SQLite e bitmaps para cada cenário"""
+    conn = get_db_connection()
+
+    inicio = time.perf_counter()
+    index = BitmapIndex.from_connection(conn)
+    carga_ms = (time.perf_counter() - inicio) * 1000
+    print(f"Índice de bitmaps carregado: {index.size} linhas em {carga_ms:.1f} ms")
+
+    print(f"\n{'Cenário':<32}{'Total':>8}{'SQLite p50':>12}{'p95':>9}{'Bitmap p50':>12}{'p95':>9}{'Ganho':>8}")
+    for nome, payload in cenarios(conn).items():
+        filtros = parse_filters(payload)
+        page = payload.get('page', 1)
+
+        (total_sql, _), sql_p50, sql_p95 = medir(lambda: consulta_sqlite(conn, filtros, page))
+        (total_bmp, _), bmp_p50, bmp_p95 = medir(lambda: consulta_bitmap(conn, index, filtros, page))
+
+        if total_sql != total_bmp:
+            print(f"❌ {nome}: totais divergentes (SQLite {total_sql}, bitmap {total_bmp})")
+            continue
+
+        ganho = sql_p50 / bmp_p50 if bmp_p50 else float('inf')
+        print(f"{nome:<32}{total_sql:>8}{sql_p50:>10.2f}ms{sql_p95:>7.2f}ms{bmp_p50:>10.2f}ms{bmp_p95:>7.2f}ms{ganho:>7.1f}x")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    benchmark_filtros()
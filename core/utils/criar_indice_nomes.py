@@ -0,0 +1,37 @@
+"""
+Script para criar o índice de nomes normalizados da consulta em lote em um banco existente
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+from osc_dashboard.search import NAME_TABLE, create_name_index
+
+DB_PATH = OSC_DB_PATH
+
+
+def criar_indice_nomes():
+    """Cria (ou recria) a tabela de nomes normalizados a partir dos nomes das OSCs"""
+    db_path = Path(DB_PATH)
+
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    print(f"Criando tabela '{NAME_TABLE}'...")
+    total = create_name_index(conn)
+    conn.close()
+
+    print(f"Total de nomes indexados: {total}")
+    return True
+
+
+if __name__ == "__main__":
+    criar_indice_nomes()
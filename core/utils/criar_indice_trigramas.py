@@ -0,0 +1,50 @@
+"""
+Script para criar o índice de trigramas da busca aproximada em um banco existente
+"""
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+from osc_dashboard.search import TRIGRAM_TABLE, WORDS_TABLE, create_trigram_index, has_trigram_index
+
+DB_PATH = OSC_DB_PATH
+
+
+def criar_indice_trigramas(se_ausente=False):
+    """
+    Cria (ou recria) as tabelas de palavras e de trigramas a partir dos nomes
+    das OSCs; com se_ausente, só quando o banco ainda não tem o índice atual
+    """
+    db_path = Path(DB_PATH)
+
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    if se_ausente and has_trigram_index(conn):
+        print(f"Índice de trigramas já existe em {db_path}")
+        conn.close()
+        return True
+
+    print(f"Criando tabelas '{WORDS_TABLE}' e '{TRIGRAM_TABLE}'...")
+    total = create_trigram_index(conn)
+    conn.close()
+
+    print(f"Total de trigramas indexados: {total}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cria o índice de trigramas da busca aproximada')
+    parser.add_argument('--se-ausente', action='store_true',
+                        help='Só cria o índice quando o banco não o tem (ou tem o formato antigo)')
+    args = parser.parse_args()
+    criar_indice_trigramas(se_ausente=args.se_ausente)
@@ -0,0 +1,58 @@
+"""
+Script para carregar o mapeamento município -> mesorregião/bacia em um banco existente
+
+O CSV deve ter as colunas municipio, regiao e bacia (uma linha por bacia
+quando o município atravessa mais de uma). Exemplo:
+    python core/utils/criar_regioes.py --csv data/municipios_regioes_PR.csv
+"""
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH, OSC_UF_PADRAO
+from osc_dashboard.regions import REGIONS_CSV, REGIONS_TABLE, create_regions_table, read_regions_csv
+from osc_dashboard.summary import create_summary_table
+
+
+def criar_regioes(db_path, csv_path):
+    """Grava o mapeamento no banco e atualiza o resumo (opções dos filtros)"""
+    db_path = Path(db_path)
+    csv_path = Path(csv_path)
+
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path}")
+        return False
+    if not csv_path.exists():
+        print(f"Arquivo CSV não encontrado: {csv_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    total = create_regions_table(conn, read_regions_csv(csv_path))
+    print(f"Linhas gravadas em '{REGIONS_TABLE}': {total}")
+
+    sem_mapeamento = conn.execute(f"""
+        SELECT COUNT(DISTINCT edmu_nm_municipio) FROM oscs
+        WHERE edmu_nm_municipio NOT IN (SELECT edmu_nm_municipio FROM {REGIONS_TABLE})
+    """).fetchone()[0]
+    if sem_mapeamento:
+        print(f"Atenção: {sem_mapeamento} município(s) da tabela oscs sem região/bacia no CSV")
+
+    resumo = create_summary_table(conn)
+    conn.close()
+    print(f"Regiões: {len(resumo['regioes'])} | Bacias: {len(resumo['bacias'])}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Carrega o mapeamento município -> região/bacia')
+    parser.add_argument('--banco', default=OSC_DB_PATH, help='Banco de destino (padrão: OSC_DB_PATH)')
+    parser.add_argument('--csv', default=REGIONS_CSV.format(uf=OSC_UF_PADRAO.upper()),
+                        help='CSV com as colunas municipio, regiao e bacia')
+    args = parser.parse_args()
+    criar_regioes(args.banco, args.csv)
@@ -0,0 +1,40 @@
+"""
+Script para (re)calcular o resumo estatístico exibido no dashboard em um banco existente
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+from osc_dashboard.summary import SUMMARY_TABLE, create_summary_table
+
+DB_PATH = OSC_DB_PATH
+
+
+def criar_resumo():
+    """Grava o resumo estatístico da tabela oscs na tabela de resumo"""
+    db_path = Path(DB_PATH)
+
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    print(f"Calculando resumo em '{SUMMARY_TABLE}'...")
+    resumo = create_summary_table(conn)
+    conn.close()
+
+    print(f"Total de OSCs: {resumo['total']}")
+    print(f"Com email: {resumo['com_email']}")
+    print(f"Com telefone: {resumo['com_telefone']}")
+    print(f"Municípios: {resumo['total_municipios']}")
+    return True
+
+
+if __name__ == "__main__":
+    criar_resumo()
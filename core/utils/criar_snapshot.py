@@ -0,0 +1,94 @@
+"""
+Script para gravar o snapshot Parquet de um banco existente e comparar as
+agregações colunares com o SQLite e com o DataFrame completo (SELECT *)
+
+Requer o pacote opcional pyarrow. Exemplo:
+    python core/utils/criar_snapshot.py --comparar
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+import pandas as pd
+from django.conf import settings
+
+from osc_dashboard import analytics
+from osc_dashboard.filters import parse_filters
+
+
+def cronometrar(func, repeticoes=5):
+    """Mediana (ms) de repetições de func"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def comparar(db_path):
+    """Compara tempo e memória do agrupamento por município nos três caminhos"""
+    filtros = parse_filters({})
+    conn = sqlite3.connect(db_path)
+
+    inicio = time.perf_counter()
+    tabela = analytics.get_snapshot(db_path)
+    carga_snapshot = (time.perf_counter() - inicio) * 1000
+    inicio = time.perf_counter()
+    df = pd.read_sql_query("SELECT * FROM oscs", conn)
+    carga_df = (time.perf_counter() - inicio) * 1000
+
+    tempos = {
+        'parquet': cronometrar(lambda: analytics.aggregate_snapshot([tabela], filtros, ['municipio'])),
+        'sqlite': cronometrar(lambda: analytics.aggregate_sql(conn, filtros, ['municipio'])),
+        'pandas': cronometrar(lambda: df.groupby('edmu_nm_municipio').size()),
+    }
+    conn.close()
+
+    print(f"\n{'Caminho':<10}{'carga ms':>10}{'agrupar ms':>12}{'memória MB':>12}")
+    print(f"{'parquet':<10}{carga_snapshot:>10.1f}{tempos['parquet']:>12.2f}{tabela.nbytes / 1024 / 1024:>12.1f}")
+    print(f"{'sqlite':<10}{'-':>10}{tempos['sqlite']:>12.2f}{'-':>12}")
+    print(f"{'pandas':<10}{carga_df:>10.1f}{tempos['pandas']:>12.2f}{df.memory_usage(deep=True).sum() / 1024 / 1024:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grava o snapshot Parquet da tabela oscs')
+    parser.add_argument('--banco', default=settings.OSC_DB_PATH, help='Banco de origem (padrão: OSC_DB_PATH)')
+    parser.add_argument('--comparar', action='store_true', help='Compara as agregações após gravar')
+    args = parser.parse_args()
+
+    if analytics.pa is None:
+        print("O pacote 'pyarrow' é necessário para o snapshot (pip install pyarrow)")
+        return
+    db_path = Path(args.banco)
+    if not db_path.exists():
+        print(f"Banco de dados não encontrado: {db_path}")
+        return
+
+    destino = analytics.snapshot_path(db_path)
+    conn = sqlite3.connect(db_path)
+    linhas = analytics.write_snapshot(conn, destino)
+    conn.close()
+    print(f"Snapshot com {linhas} OSCs gravado em {destino} "
+          f"({destino.stat().st_size / 1024 / 1024:.1f} MB; banco {db_path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+    if args.comparar:
+        comparar(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Script para gerar bancos SQLite sintéticos com a estrutura da tabela oscs
+
+Usado para testes de carga e benchmarks em escala maior que a base real
+(50k, 500k, 5M linhas, ou a escala nacional), sem depender de acesso à rede.
+
+As distribuições (vocabulário dos nomes, municípios, naturezas, situações e
+taxas de email/telefone ausentes) vêm de um perfil. O perfil pode ser extraído
+de um banco real com --perfilar e salvo em JSON, para que o banco sintético
+reproduza as estatísticas da base sem copiar os registros.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+from collections import Counter
+import sqlite3
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from osc_dashboard.regions import create_regions_table
+from osc_dashboard.search import create_name_index, create_trigram_index
+from osc_dashboard.summary import create_summary_table
+
+TABLE_NAME = 'oscs'
+
+# Tamanho dos vocabulários guardados no perfil
+MAX_PALAVRAS_INICIAIS = 200
+MAX_VOCABULARIO = 3000
+
+MUNICIPIOS_PRINCIPAIS = [
+    'Curitiba', 'Londrina', 'Maringá', 'Ponta Grossa', 'Cascavel', 'São José dos Pinhais',
+    'Foz do Iguaçu', 'Colombo', 'Guarapuava', 'Paranaguá', 'Araucária', 'Toledo',
+    'Apucarana', 'Pinhais', 'Campo Largo', 'Arapongas', 'Almirante Tamandaré', 'Umuarama',
+    'Piraquara', 'Cambé', 'Palmeira', 'Irati', 'União da Vitória', 'Francisco Beltrão',
+]
+
+NATUREZAS = [
+    ('Associação Privada', 0.80),
+    ('Organização Religiosa', 0.14),
+    ('Fundação Privada', 0.05),
+    ('Organização Social', 0.01),
+]
+
+SITUACOES = [
+    ('ATIVA', 0.70),
+    ('BAIXADA', 0.20),
+    ('INAPTA', 0.08),
+    ('SUSPENSA', 0.02),
+]
+
+PREFIXOS = ['ASSOCIACAO', 'ASSOCIAÇÃO', 'INSTITUTO', 'FUNDACAO', 'IGREJA', 'CLUBE', 'CENTRO', 'CONSELHO', 'SOCIEDADE']
+TERMOS = [
+    'DE MORADORES', 'DE PAIS E MESTRES', 'AMBIENTAL', 'DOS PRODUTORES RURAIS', 'CULTURAL',
+    'ESPORTIVA', 'BENEFICENTE', 'EVANGELICA', 'DE PROTECAO AMBIENTAL', 'DA BACIA DO RIO',
+    'DE RECURSOS HÍDRICOS', 'COMUNITARIA', 'DE APOIO', 'DOS AMIGOS DA ÁGUA', 'DE CONSERVAÇÃO',
+]
+
+
+def _municipios(total=399):
+    """Lista de (código, nome) com os municípios principais e nomes sintéticos até o total"""
+    nomes = MUNICIPIOS_PRINCIPAIS + [f'Município {i:03d}' for i in range(len(MUNICIPIOS_PRINCIPAIS) + 1, total + 1)]
+    return [(4100000 + i, nome) for i, nome in enumerate(nomes[:total], start=1)]
+
+
+def perfil_padrao(total_municipios=399):
+    """Perfil embutido, usado quando não há um banco real para perfilar"""
+    municipios = _municipios(total_municipios)
+    palavras = Counter()
+    for termo in TERMOS:
+        palavras.update(termo.split())
+    return {
+        'total': None,
+        # Distribuição concentrada nas cidades grandes (lei de Zipf)
+        'municipios': [[codigo, nome, 1 / i] for i, (codigo, nome) in enumerate(municipios, start=1)],
+        'naturezas': dict(NATUREZAS),
+        'situacoes': dict(SITUACOES),
+        'taxa_email': 0.45,
+        'taxa_telefone': 0.55,
+        'palavras_iniciais': {prefixo: 1 for prefixo in PREFIXOS},
+        'vocabulario': dict(palavras),
+        'tamanhos_nome': {'3': 2, '4': 3, '5': 3, '6': 2, '7': 1},
+    }
+
+
+def perfilar_banco(conn):
+    """
+    Extrai de um banco real as distribuições usadas pelo gerador
+
+    Guarda apenas frequências agregadas (contagem por município, natureza e
+    situação, taxas de preenchimento e frequência das palavras dos nomes).
+    """
+    cursor = conn.cursor()
+    total = cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+
+    cursor.execute(f"""
+        SELECT edmu_cd_municipio, edmu_nm_municipio, COUNT(*) FROM {TABLE_NAME}
+        WHERE edmu_nm_municipio IS NOT NULL AND edmu_nm_municipio != ''
+        GROUP BY edmu_cd_municipio, edmu_nm_municipio ORDER BY COUNT(*) DESC
+    """)
+    municipios = [list(linha) for linha in cursor.fetchall()]
+
+    def contagens(coluna):
+        cursor.execute(f"""
+            SELECT {coluna}, COUNT(*) FROM {TABLE_NAME}
+            WHERE {coluna} IS NOT NULL AND {coluna} != '' GROUP BY {coluna}
+        """)
+        return dict(cursor.fetchall())
+
+    def taxa(coluna):
+        preenchidos = cursor.execute(
+            f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE {coluna} IS NOT NULL AND TRIM({coluna}) != ''"
+        ).fetchone()[0]
+        return preenchidos / total if total else 0
+
+    iniciais = Counter()
+    vocabulario = Counter()
+    tamanhos = Counter()
+    for (nome,) in cursor.execute(f"SELECT nome FROM {TABLE_NAME} WHERE nome IS NOT NULL"):
+        palavras = re.findall(r'\S+', str(nome).upper())
+        if not palavras:
+            continue
+        tamanhos[str(len(palavras))] += 1
+        iniciais[palavras[0]] += 1
+        vocabulario.update(palavras[1:])
+
+    return {
+        'total': total,
+        'municipios': municipios,
+        'naturezas': contagens('natureza_juridica'),
+        'situacoes': contagens('situacao_cadastral'),
+        'taxa_email': taxa('email'),
+        'taxa_telefone': taxa('telefone'),
+        'palavras_iniciais': dict(iniciais.most_common(MAX_PALAVRAS_INICIAIS)),
+        'vocabulario': dict(vocabulario.most_common(MAX_VOCABULARIO)),
+        'tamanhos_nome': dict(tamanhos),
+    }
+
+
+def carregar_perfil(caminho):
+    """Lê um perfil salvo em JSON"""
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_perfil(perfil, caminho):
+    """Salva o perfil em JSON"""
+    Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(perfil, f, ensure_ascii=False, indent=2)
+
+
+def _ampliar_municipios(municipios, total):
+    """
+    Completa a lista de municípios até o total pedido (ex.: 5570 para o país),
+    com nomes sintéticos e a cauda da lei de Zipf a partir do menor peso real
+    """
+    municipios = list(municipios)
+    if len(municipios) >= total:
+        return municipios
+    base = min(peso for _, _, peso in municipios) if municipios else 1
+    inicio = len(municipios)
+    for i in range(inicio + 1, total + 1):
+        municipios.append([5900000 + i, f'Município Sintético {i:04d}', base * inicio / i])
+    return municipios
+
+
+def _amostrador(distribuicao):
+    """Retorna (valores, pesos acumulados) para rng.choices(cum_weights=...)"""
+    valores = list(distribuicao)
+    acumulado = list(itertools.accumulate(distribuicao[v] for v in valores))
+    return valores, acumulado
+
+
+def gerar_linhas(total, rng, perfil=None, total_municipios=None):
+    """
+    Gera as linhas da tabela oscs seguindo as distribuições do perfil
+
+    Os nomes são sorteados palavra a palavra (primeira palavra, quantidade de
+    palavras e vocabulário), o que preserva a frequência de termos e de
+    trigramas que determina a seletividade das buscas por palavra-chave.
+    """
+    perfil = perfil or perfil_padrao()
+    municipios = perfil['municipios']
+    if total_municipios:
+        municipios = _ampliar_municipios(municipios, total_municipios)
+    acumulado_municipios = list(itertools.accumulate(peso for _, _, peso in municipios))
+    naturezas, acumulado_naturezas = _amostrador(perfil['naturezas'])
+    situacoes, acumulado_situacoes = _amostrador(perfil['situacoes'])
+    iniciais, acumulado_iniciais = _amostrador(perfil['palavras_iniciais'])
+    vocabulario, acumulado_vocabulario = _amostrador(perfil['vocabulario'])
+    tamanhos, acumulado_tamanhos = _amostrador(perfil['tamanhos_nome'])
+    tamanhos = [int(t) for t in tamanhos]
+    taxa_email = perfil['taxa_email']
+    taxa_telefone = perfil['taxa_telefone']
+
+    for id_osc in range(1, total + 1):
+        codigo, municipio, _ = rng.choices(municipios, cum_weights=acumulado_municipios)[0]
+        tamanho = rng.choices(tamanhos, cum_weights=acumulado_tamanhos)[0]
+        palavras = rng.choices(iniciais, cum_weights=acumulado_iniciais)
+        if tamanho > 1 and vocabulario:
+            palavras += rng.choices(vocabulario, cum_weights=acumulado_vocabulario, k=tamanho - 1)
+        nome = ' '.join(palavras)
+        email = f"contato{id_osc}@osc.org.br" if rng.random() < taxa_email else ''
+        telefone = f"({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}" if rng.random() < taxa_telefone else ''
+        endereco = f"Rua {rng.randint(1, 999)}, {rng.randint(1, 3000)}"
+        yield (
+            id_osc, nome, email, endereco, telefone,
+            rng.choices(naturezas, cum_weights=acumulado_naturezas)[0],
+            rng.choices(situacoes, cum_weights=acumulado_situacoes)[0],
+            codigo, municipio,
+        )
+
+
+def gerar_regioes(conn, rng, total_regioes=10, total_bacias=16, taxa_duas_bacias=0.15):
+    """
+    Cria um mapeamento sintético município -> região/bacia para os municípios
+    do banco (cerca de 15% dos municípios em duas bacias)
+    """
+    municipios = [m for (m,) in conn.execute(f"SELECT DISTINCT edmu_nm_municipio FROM {TABLE_NAME} ORDER BY 1")]
+    linhas = []
+    for i, municipio in enumerate(municipios):
+        regiao = f'Região Sintética {i * total_regioes // max(len(municipios), 1) + 1:02d}'
+        bacias = {rng.randint(1, total_bacias)}
+        if rng.random() < taxa_duas_bacias:
+            bacias.add(rng.randint(1, total_bacias))
+        for bacia in sorted(bacias):
+            linhas.append((municipio, regiao, f'Bacia Sintética {bacia:02d}'))
+    return create_regions_table(conn, pd.DataFrame(linhas, columns=['municipio', 'regiao', 'bacia']))
+
+
+def gerar_banco(db_path, linhas, semente=42, trigramas=False, lote=50000, perfil=None, total_municipios=None):
+    """Cria o banco sintético em db_path com o número de linhas pedido"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+
+    rng = random.Random(semente)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE {TABLE_NAME} (
+            id_osc INTEGER, nome TEXT, email TEXT, endereco TEXT, telefone TEXT,
+            natureza_juridica TEXT, situacao_cadastral TEXT,
+            edmu_cd_municipio INTEGER, edmu_nm_municipio TEXT
+        )
+    """)
+
+    buffer = []
+    for linha in gerar_linhas(linhas, rng, perfil, total_municipios):
+        buffer.append(linha)
+        if len(buffer) >= lote:
+            cursor.executemany(f"INSERT INTO {TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", buffer)
+            buffer = []
+    if buffer:
+        cursor.executemany(f"INSERT INTO {TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", buffer)
+
+    # Mesmos índices da migração real
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_id_osc ON oscs(id_osc)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nome ON oscs(nome)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_municipio ON oscs(edmu_nm_municipio)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_natureza ON oscs(natureza_juridica)")
+    conn.commit()
+    create_name_index(conn)
+
+    if trigramas:
+        create_trigram_index(conn)
+    gerar_regioes(conn, random.Random(semente + 1))
+    create_summary_table(conn)
+
+    conn.close()
+    return db_path
+
+
+def main():
+    from dashboard_osc.settings import OSC_DB_PATH
+
+    parser = argparse.ArgumentParser(description='Gera um banco SQLite sintético de OSCs')
+    parser.add_argument('--linhas', type=int, default=50000, help='Número de OSCs a gerar')
+    parser.add_argument('--saida', default=None, help='Caminho do banco gerado')
+    parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+    parser.add_argument('--trigramas', action='store_true', help='Cria também o índice de trigramas')
+    parser.add_argument('--perfil', default=None, help='Perfil JSON com as distribuições a reproduzir')
+    parser.add_argument('--perfilar', nargs='?', const=OSC_DB_PATH, default=None, metavar='BANCO',
+                        help='Extrai o perfil de um banco real (padrão: OSC_DB_PATH) e salva em --perfil')
+    parser.add_argument('--municipios', type=int, default=None,
+                        help='Amplia a lista de municípios até este total (ex.: 5570 para o Brasil)')
+    args = parser.parse_args()
+
+    if args.perfilar:
+        if not Path(args.perfilar).exists():
+            print(f"Banco de dados não encontrado: {args.perfilar}")
+            return
+        conn = sqlite3.connect(args.perfilar)
+        perfil = perfilar_banco(conn)
+        conn.close()
+        destino = args.perfil or 'data/sintetico/perfil.json'
+        salvar_perfil(perfil, destino)
+        print(f"Perfil de {perfil['total']} OSCs ({len(perfil['municipios'])} municípios) salvo em {destino}")
+        return
+
+    perfil = carregar_perfil(args.perfil) if args.perfil else None
+    saida = args.saida or f'data/sintetico/oscs_{args.linhas}.db'
+    print(f"Gerando {args.linhas} OSCs em {saida}...")
+    gerar_banco(saida, args.linhas, semente=args.semente, trigramas=args.trigramas,
+                perfil=perfil, total_municipios=args.municipios)
+    print("Banco sintético gerado com sucesso!")
+
+
+if __name__ == "__main__":
+    main()
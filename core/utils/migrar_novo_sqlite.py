@@ -1,21 +1,47 @@
 """
 Script para migrar dados do CSV para um novo banco SQLite3
+
+Cada estado tem seu próprio banco: o da UF padrão em OSC_DB_PATH e os demais
+em OSC_ESTADOS_DIR/oscs_<UF>.db. Exemplo:
+    python core/utils/migrar_novo_sqlite.py --uf SP --csv data/dados_osc_SP_FINAL.csv
+
+Com data/municipios_regioes_<UF>.csv (ou --regioes), carrega também o
+mapeamento município -> mesorregião/bacia usado nos filtros de bacia e região.
 """
 
+import argparse
+import django
 import pandas as pd
 import sqlite3
 import os
+import sys
 from pathlib import Path
 
-CSV_PATH = 'data/dados_osc_PR_FINAL.csv'
-NEW_DB_PATH = 'data/oscs_parana_novo.db'
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# Configura o Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+from osc_dashboard import analytics
+from osc_dashboard.partitions import default_state, state_db_path
+from osc_dashboard.history import COMPLETA, record_version
+from osc_dashboard.regions import create_regions_table, default_regions_csv, read_regions_csv
+from osc_dashboard.search import create_name_index, create_trigram_index
+from osc_dashboard.storage import optimize_database
+from osc_dashboard.summary import create_summary_table
+
+CSV_PATH = 'data/dados_osc_{uf}_FINAL.csv'
 TABLE_NAME = 'oscs'
 
 
-def migrar_csv_para_novo_sqlite():
-    """Migra dados do CSV para um novo banco SQLite3"""
-    csv_path = Path(CSV_PATH)
-    db_path = Path(NEW_DB_PATH)
+def migrar_csv_para_novo_sqlite(uf=None, csv_path=None, regioes_csv=None):
+    """Migra dados do CSV de uma UF para o banco SQLite3 desse estado"""
+    uf = (uf or default_state()).upper()
+    csv_path = Path(csv_path or CSV_PATH.format(uf=uf))
+    db_path = state_db_path(uf)
 
     if not csv_path.exists():
         print(f"Arquivo CSV não encontrado: {csv_path}")
@@ -25,7 +51,8 @@ def migrar_csv_para_novo_sqlite():
     df = pd.read_csv(csv_path, encoding='utf-8')
     print(f"Dados carregados: {len(df)} registros")
 
-    print(f"Criando novo banco SQLite: {db_path}")
+    print(f"Criando novo banco SQLite ({uf}): {db_path}")
+    db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(db_path)
 
     print(f"Criando tabela '{TABLE_NAME}' e inserindo dados...")
@@ -39,14 +66,56 @@ def migrar_csv_para_novo_sqlite():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_natureza ON oscs(natureza_juridica)")
     conn.commit()
 
+    # Índice de trigramas para a busca aproximada por palavras-chave
+    print("Criando índice de trigramas...")
+    total_trigramas = create_trigram_index(conn)
+    print(f"Trigramas indexados: {total_trigramas}")
+
+    # Índice de nomes normalizados para a consulta em lote por nome
+    print("Criando índice de nomes...")
+    total_nomes = create_name_index(conn)
+    print(f"Nomes indexados: {total_nomes}")
+
+    # Mapeamento município -> mesorregião e bacia hidrográfica (filtros de bacia/região)
+    regioes_csv = Path(regioes_csv) if regioes_csv else default_regions_csv(uf)
+    if regioes_csv:
+        print(f"Carregando mapeamento de bacias e regiões: {regioes_csv}")
+        total_mapeados = create_regions_table(conn, read_regions_csv(regioes_csv))
+        print(f"Linhas do mapeamento: {total_mapeados}")
+
     cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
     total_registros = cursor.fetchone()[0]
     print(f"Total de registros inseridos: {total_registros}")
 
+    # Histórico de versões: a carga completa é a nova base do filtro alterado_desde
+    versao = record_version(conn, COMPLETA, origem=csv_path.name, inseridos=total_registros)
+    print(f"Versão registrada no histórico: {versao}")
+
+    # Resumo estatístico servido pelo dashboard (seu commit grava também a versão)
+    print("Calculando resumo estatístico...")
+    create_summary_table(conn)
+
     conn.close()
+
+    # Artefato somente leitura: páginas maiores e estatísticas do planejador
+    print("Otimizando banco para leitura...")
+    optimize_database(db_path, db_path)
+
+    # Snapshot colunar para as agregações (gravado depois do banco, para não ficar mais antigo)
+    if analytics.pa is not None:
+        print("Gravando snapshot Parquet...")
+        conn = sqlite3.connect(db_path)
+        analytics.write_snapshot(conn, analytics.snapshot_path(db_path))
+        conn.close()
     print("Migração concluída com sucesso!")
     return True
 
 
 if __name__ == "__main__":
-    migrar_csv_para_novo_sqlite()
+    parser = argparse.ArgumentParser(description='Migra o CSV de OSCs de um estado para SQLite')
+    parser.add_argument('--uf', default=None, help='UF do banco gerado (padrão: OSC_UF_PADRAO)')
+    parser.add_argument('--csv', default=None, help='CSV de origem (padrão: data/dados_osc_<UF>_FINAL.csv)')
+    parser.add_argument('--regioes', default=None,
+                        help='CSV município -> região/bacia (padrão: data/municipios_regioes_<UF>.csv, se existir)')
+    args = parser.parse_args()
+    migrar_csv_para_novo_sqlite(args.uf, args.csv, args.regioes)
@@ -5,9 +5,16 @@ Script para migrar dados do CSV para SQLite3
 import pandas as pd
 import sqlite3
 import os
+import sys
 from pathlib import Path
 import logging
 
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,7 +28,7 @@ def migrar_csv_para_sqlite():
     
     # Caminhos dos arquivos
     csv_path = Path('data/dados_osc_PR_completo.csv')
-    db_path = Path('data/oscs_parana_novo.db')
+    db_path = Path(OSC_DB_PATH)
     
     try:
         logger.info("Iniciando migração de dados CSV para SQLite3...")
@@ -0,0 +1,120 @@
+"""
+Script para gerar o artefato somente leitura otimizado do banco de OSCs
+
+Passos: cópia compactada com VACUUM INTO usando o page_size escolhido,
+estatísticas do planejador (ANALYZE), VACUUM final e, opcionalmente, a
+versão comprimida com zstd para distribuição. Ao final imprime um relatório
+de tamanho e latência de consultas com conexões novas (arquivo original x
+otimizado).
+
+Exemplos:
+    python core/utils/otimizar_banco.py
+    python core/utils/otimizar_banco.py --page-size 16384 --comprimir
+    python core/utils/otimizar_banco.py --relatorio data/oscs_parana_novo.db /tmp/outro.db
+    python core/utils/otimizar_banco.py --descomprimir
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+from osc_dashboard.storage import PAGE_SIZE_PADRAO, compress_database, compressed_path, ensure_database, optimize_database
+
+# Consultas representativas do dashboard para o relatório de latência
+CONSULTAS = {
+    'contagem_municipio': ("SELECT COUNT(*) FROM oscs WHERE edmu_nm_municipio = ?", ['Curitiba']),
+    'pagina_natureza': ("SELECT * FROM oscs WHERE natureza_juridica = ? LIMIT 50 OFFSET 500", ['Associação Privada']),
+    'palavra_chave': ("SELECT COUNT(*) FROM oscs WHERE nome LIKE ?", ['%AMBIENTAL%']),
+    'agrupamento_situacao': ("SELECT situacao_cadastral, COUNT(*) FROM oscs GROUP BY situacao_cadastral", []),
+    'busca_id': ("SELECT * FROM oscs WHERE id_osc = ?", [12345]),
+}
+
+
+def medir_consultas(db_path, repeticoes=5):
+    """Mediana (ms) de cada consulta representativa, abrindo uma conexão nova por execução"""
+    resultados = {}
+    for nome, (sql, params) in CONSULTAS.items():
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+            conn.execute(sql, params).fetchall()
+            conn.close()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[nome] = statistics.median(tempos)
+    return resultados
+
+
+def relatorio(caminhos, repeticoes=5):
+    """Imprime tamanho, page_size, páginas e latência das consultas de cada banco"""
+    medicoes = {}
+    print(f"\n{'Banco':<40}{'MB':>9}{'page_size':>11}{'páginas':>10}{'.zst MB':>10}")
+    for caminho in caminhos:
+        conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+        conn.close()
+        comprimido = compressed_path(caminho)
+        tamanho_zst = f"{comprimido.stat().st_size / 1024 / 1024:.1f}" if comprimido.exists() else '-'
+        print(f"{str(caminho)[-40:]:<40}{os.path.getsize(caminho) / 1024 / 1024:>9.1f}{page_size:>11}{paginas:>10}{tamanho_zst:>10}")
+        medicoes[caminho] = medir_consultas(caminho, repeticoes)
+
+    print(f"\n{'Consulta (ms, mediana)':<26}" + ''.join(f"{Path(c).name[-18:]:>20}" for c in caminhos))
+    for nome in CONSULTAS:
+        print(f"{nome:<26}" + ''.join(f"{medicoes[c][nome]:>20.2f}" for c in caminhos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera o banco somente leitura otimizado')
+    parser.add_argument('--origem', default=OSC_DB_PATH, help='Banco de origem (padrão: OSC_DB_PATH)')
+    parser.add_argument('--destino', default=None, help='Banco otimizado (padrão: substitui a origem)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE_PADRAO, help='page_size do banco gerado')
+    parser.add_argument('--comprimir', action='store_true', help='Gera também <destino>.zst')
+    parser.add_argument('--descomprimir', action='store_true', help='Apenas descomprime OSC_DB_PATH.zst, se for mais novo')
+    parser.add_argument('--relatorio', nargs='+', default=None, metavar='BANCO', help='Apenas compara os bancos informados')
+    args = parser.parse_args()
+
+    if args.descomprimir:
+        if ensure_database(args.origem):
+            print(f"Banco descomprimido em {args.origem}")
+        else:
+            print("Nenhuma versão comprimida mais nova para descomprimir")
+        return
+
+    if args.relatorio:
+        relatorio(args.relatorio)
+        return
+
+    origem = Path(args.origem)
+    if not origem.exists():
+        print(f"Banco de dados não encontrado: {origem}")
+        return
+
+    destino = Path(args.destino) if args.destino else origem
+    original = origem
+    if destino == origem:
+        # Mantém a versão anterior para o relatório comparativo
+        original = origem.with_name(f'{origem.stem}_original{origem.suffix}')
+        os.replace(origem, original)
+
+    print(f"Otimizando {original} -> {destino} (page_size {args.page_size})...")
+    optimize_database(original, destino, args.page_size)
+    if args.comprimir:
+        print(f"Comprimido em {compress_database(destino)}")
+
+    relatorio([original, destino])
+    if original != origem:
+        print(f"\nA versão anterior ficou em {original} e pode ser removida.")
+
+
+if __name__ == "__main__":
+    main()
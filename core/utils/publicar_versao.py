@@ -0,0 +1,71 @@
+"""
+Script para publicar uma nova versão do banco do estado padrão sem reiniciar o servidor
+
+Copia o banco para OSC_VERSOES_DIR/<hash>.db e troca o ponteiro "current";
+os workers passam a servir a versão nova na próxima requisição, depois de
+aquecê-la. Exemplos:
+    python core/utils/publicar_versao.py
+    python core/utils/publicar_versao.py --banco data/oscs_parana_novo.db
+    python core/utils/publicar_versao.py --listar
+    python core/utils/publicar_versao.py --ativar 3fa2c1d9e0b4a7f2
+"""
+
+import argparse
+import django
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# Configura o Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+from django.conf import settings
+
+from osc_dashboard.versions import activate_version, current_version_path, list_versions, publish_version
+
+
+def listar():
+    atual = current_version_path()
+    versoes = list_versions()
+    if not versoes:
+        print(f"Nenhuma versão publicada em {settings.OSC_VERSOES_DIR}")
+        return
+    for caminho in versoes:
+        marcador = '*' if atual is not None and caminho.name == atual.name else ' '
+        stat = caminho.stat()
+        publicado = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{marcador} {caminho.stem}  {stat.st_size / 1024 / 1024:8.1f} MB  {publicado}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publica uma versão do banco de OSCs')
+    parser.add_argument('--banco', default=settings.OSC_DB_PATH, help='Banco a publicar (padrão: OSC_DB_PATH)')
+    parser.add_argument('--manter', type=int, default=None, help='Versões mantidas (padrão: OSC_VERSOES_MANTER)')
+    parser.add_argument('--listar', action='store_true', help='Lista as versões publicadas (* = ativa)')
+    parser.add_argument('--ativar', default=None, metavar='VERSAO', help='Volta a apontar para uma versão publicada')
+    args = parser.parse_args()
+
+    if args.listar:
+        listar()
+        return
+
+    if args.ativar:
+        destino = activate_version(args.ativar)
+        print(f"Versão ativa: {destino.stem}")
+        return
+
+    if not Path(args.banco).exists():
+        print(f"Banco de dados não encontrado: {args.banco}")
+        return
+    destino = publish_version(args.banco, args.manter)
+    print(f"Versão publicada e ativa: {destino.stem} ({destino})")
+
+
+if __name__ == "__main__":
+    main()
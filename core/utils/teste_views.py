@@ -15,6 +15,7 @@ sys.path.append(str(project_root))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
 django.setup()
 
+from django.conf import settings
 from osc_dashboard.views import get_filter_options, get_db_connection
 import sqlite3
 
@@ -111,7 +112,7 @@ def verificar_arquivo_banco():
     """Verifica se o arquivo do banco existe"""
     print("\n=== VERIFICANDO ARQUIVO DO BANCO ===")
     
-    db_path = Path('data/oscs_parana_novo.db')
+    db_path = Path(settings.OSC_DB_PATH)
     
     if db_path.exists():
         size = db_path.stat().st_size
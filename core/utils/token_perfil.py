@@ -0,0 +1,29 @@
+"""
+Script para gerar um token de perfilamento de requisições
+
+O token (assinado com a SECRET_KEY, válido por 24 horas) habilita o
+perfilamento de uma requisição pelo cabeçalho X-Perfil, sem sessão de staff.
+Exemplo:
+    curl -X POST https://.../filter/ -H "X-Perfil: $(python core/utils/token_perfil.py)" -d '{...}'
+
+O relatório fica em /perfis/<id>/ (indicado no cabeçalho X-Perfil-Relatorio
+da resposta), visível só para staff.
+"""
+
+import django
+import os
+import sys
+from pathlib import Path
+
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# Configura o Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+django.setup()
+
+from osc_dashboard.profiling import create_token
+
+if __name__ == "__main__":
+    print(create_token())
@@ -3,13 +3,20 @@ Script para verificar se o banco SQLite está funcionando corretamente
 """
 
 import sqlite3
+import sys
 import pandas as pd
 from pathlib import Path
 
+# Adiciona o diretório do projeto ao path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from dashboard_osc.settings import OSC_DB_PATH
+
 def verificar_banco():
     """Verifica se o banco está funcionando"""
     
-    db_path = Path('data/oscs_parana_novo.db')
+    db_path = Path(OSC_DB_PATH)
     
     if not db_path.exists():
         print("❌ Banco de dados não encontrado!")
@@ -0,0 +1,15 @@
+"""
+ASGI config for dashboard_osc project.
+
+Com ASYNC_VIEWS=True, as views de leitura assíncronas atendem /filter/,
+/export/ e /municipios-data/. Exemplo com workers do uvicorn:
+    gunicorn dashboard_osc.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashboard_osc.settings')
+
+application = get_asgi_application()
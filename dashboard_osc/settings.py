@@ -47,11 +47,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'osc_dashboard.middleware.AsyncWhiteNoiseMiddleware',
+    'osc_dashboard.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'osc_dashboard.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +86,19 @@ DATABASES = {
     }
 }
 
+# Banco SQLite das OSCs (somente leitura, consultado diretamente pelas views)
+OSC_DB_PATH = config('OSC_DB_PATH', default=str(BASE_DIR / 'data' / 'oscs_parana_novo.db'))
+
+# Bancos por estado: OSC_DB_PATH atende a UF padrão e os demais estados ficam
+# em OSC_ESTADOS_DIR como oscs_<UF>.db
+OSC_UF_PADRAO = config('OSC_UF_PADRAO', default='PR')
+OSC_ESTADOS_DIR = config('OSC_ESTADOS_DIR', default=str(BASE_DIR / 'data' / 'estados'))
+
+# Versões publicadas do banco do estado padrão (troca sem reinício): com o
+# ponteiro OSC_VERSOES_DIR/current, a versão apontada substitui OSC_DB_PATH
+OSC_VERSOES_DIR = config('OSC_VERSOES_DIR', default=str(BASE_DIR / 'data' / 'versions'))
+OSC_VERSOES_MANTER = config('OSC_VERSOES_MANTER', default=3, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -127,7 +142,16 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # WhiteNoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# (com os pacotes de scripts de STATIC_BUNDLES gerados no collectstatic)
+STATICFILES_STORAGE = 'osc_dashboard.staticfiles.BundledStaticFilesStorage'
+
+# Pacotes de scripts: nome do pacote -> arquivos, na ordem de carregamento
+STATIC_BUNDLES = {
+    'js/base.bundle.js': ['js/modern-table.js', 'js/osc-table.js'],
+    'js/dashboard.bundle.js': ['js/mapa_temp.js', 'js/dashboard.js'],
+}
+# Carregar os pacotes nos templates (em desenvolvimento, os arquivos originais)
+STATIC_BUNDLES_ENABLED = config('STATIC_BUNDLES_ENABLED', default=not DEBUG, cast=bool)
 
 # WhiteNoise settings for better performance
 WHITENOISE_USE_FINDERS = True
@@ -156,3 +180,71 @@ LOGGING = {
         'level': 'INFO',
     },
 }
+
+# Busca aproximada (índice de trigramas)
+# Similaridade mínima (trigramas em comum / união, como no pg_trgm) entre cada
+# palavra-chave e alguma palavra do nome da OSC
+BUSCA_SIMILARIDADE_MINIMA = config('BUSCA_SIMILARIDADE_MINIMA', default=0.3, cast=float)
+
+# Motor de filtragem: 'sqlite' (padrão) ou 'bitmap' (índice em memória por worker
+# para os filtros categóricos, com o SQLite como fallback)
+FILTER_ENGINE = config('FILTER_ENGINE', default='sqlite')
+
+# Cache de resultados de filtros (LRU por worker, chaveado pelos filtros e pela versão do banco)
+# RESULT_CACHE_SIZE=0 desativa; RESULT_CACHE_BACKEND='django' usa o backend de cache do Django
+RESULT_CACHE_SIZE = config('RESULT_CACHE_SIZE', default=64, cast=int)
+RESULT_CACHE_MAX_IDS = config('RESULT_CACHE_MAX_IDS', default=2000000, cast=int)
+RESULT_CACHE_BACKEND = config('RESULT_CACHE_BACKEND', default='local')
+RESULT_CACHE_ALIAS = config('RESULT_CACHE_ALIAS', default='default')
+
+# Instrumentação de performance (Server-Timing, logs estruturados e /metrics/)
+PERFORMANCE_METRICS = config('PERFORMANCE_METRICS', default=True, cast=bool)
+# /metrics/ e /cache-stats/ são só para staff ou para quem enviar
+# "Authorization: Bearer <METRICS_TOKEN>" (vazio: só staff)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Perfilamento sob demanda (staff ou token assinado): relatórios em PROFILING_DIR,
+# mantidos os PROFILING_MANTER mais recentes e servidos em /perfis/
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'data' / 'perfis'))
+PROFILING_MANTER = config('PROFILING_MANTER', default=50, cast=int)
+
+# Exportações em segundo plano: processos por worker, diretório das planilhas,
+# tempo sem progresso até a tarefa ser dada como interrompida e validade (s)
+# Memória: cada worker do gunicorn abre seu próprio pool (na primeira tarefa),
+# então há até WEB_CONCURRENCY × EXPORT_WORKERS processos, cada um com Django e
+# pandas carregados (~100 MB) mais a planilha em montagem; por isso o padrão
+# é 1 por worker.
+EXPORT_WORKERS = config('EXPORT_WORKERS', default=1, cast=int)
+EXPORT_DIR = config('EXPORT_DIR', default=str(BASE_DIR / 'data' / 'exportacoes'))
+EXPORT_JOB_TIMEOUT = config('EXPORT_JOB_TIMEOUT', default=600, cast=int)
+EXPORT_JOB_TTL = config('EXPORT_JOB_TTL', default=86400, cast=int)
+
+# Controle de admissão dos endpoints pesados (osc_dashboard/admission.py):
+# execuções simultâneas em todos os workers (0 desativa; as tarefas de
+# exportação em segundo plano ocupam as vagas de EXPORT_CONCURRENCY), espera
+# máxima (s) por uma vaga antes do 503 (nas views síncronas, a thread do worker
+# fica presa nesse tempo) e limite de requisições por cliente (limite, janela em s)
+ADMISSION_DIR = config('ADMISSION_DIR', default=str(BASE_DIR / 'data' / 'admissao'))
+ADMISSION_WAIT = config('ADMISSION_WAIT', default=2.0, cast=float)
+ADMISSION_CONCURRENCY = {
+    'exportacao': config('EXPORT_CONCURRENCY', default=1, cast=int),
+    'analise': config('ANALYTICS_CONCURRENCY', default=2, cast=int),
+    'lote': config('LOOKUP_CONCURRENCY', default=1, cast=int),
+}
+ADMISSION_RATE = {
+    'exportacao': (config('EXPORT_RATE_LIMIT', default=10, cast=int), config('EXPORT_RATE_WINDOW', default=60, cast=int)),
+    'lote': (config('LOOKUP_RATE_LIMIT', default=10, cast=int), config('LOOKUP_RATE_WINDOW', default=60, cast=int)),
+}
+
+# Consulta em lote (/lote/): máximo de linhas da planilha enviada
+LOOKUP_MAX_LINHAS = config('LOOKUP_MAX_LINHAS', default=20000, cast=int)
+
+# Modo ASGI: views de leitura assíncronas (dashboard_osc.asgi, workers do uvicorn)
+# com o acesso ao banco em um pool limitado de threads por worker
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+ASYNC_DB_THREADS = config('ASYNC_DB_THREADS', default=8, cast=int)
+
+# Aquecimento do worker na inicialização (caches, páginas do banco e consultas
+# representativas antes de aceitar tráfego; ver osc_dashboard/warmup.py)
+WARMUP_ON_BOOT = config('WARMUP_ON_BOOT', default=False, cast=bool)
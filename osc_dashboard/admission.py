@@ -0,0 +1,294 @@
+"""
+Controle de admissão dos endpoints pesados
+
+Limite de concorrência: cada endpoint limitado tem N vagas compartilhadas
+por todos os workers, uma por arquivo de trava em ADMISSION_DIR
+(<endpoint>.<i>.lock, com flock). Uma requisição ocupa a primeira vaga
+livre enquanto a view roda (respostas em streaming, até o fim do envio);
+sem vaga, espera até ADMISSION_WAIT segundos por uma e então recebe 503
+com Retry-After. A espera é curta porque, nas views síncronas, prende a
+thread do worker; nas assíncronas, não bloqueia o event loop. As tarefas de
+exportação em segundo plano ocupam as mesmas vagas de "exportacao"
+(occupy_slot), esperando sem prazo. A trava é liberada pelo sistema se o
+worker morrer.
+
+Limite por cliente: as requisições de cada cliente (IP) a um endpoint são
+registradas em uma tabela SQLite em ADMISSION_DIR; acima do limite na
+janela, a resposta é 429 com Retry-After até a vaga mais antiga expirar.
+Nas views, rate_limit fica por dentro de concurrency_limit: requisições
+recusadas por falta de vaga não contam no limite do cliente.
+
+Assim, rajadas de exportações ocupam no máximo as vagas configuradas e os
+demais workers continuam livres para a filtragem e o dashboard.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows: vagas por processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (s) entre as tentativas de ocupar uma vaga
+INTERVALO_ESPERA = 0.05
+# Retry-After (s) das respostas de endpoint ocupado
+RETRY_AFTER_OCUPADO = 5
+
+RATE_DB = 'limites.db'
+
+_lock = threading.Lock()
+_vagas_processo = {}
+
+
+def admission_dir():
+    diretorio = Path(settings.ADMISSION_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def client_id(request):
+    """
+    Identificador do cliente: o último endereço do X-Forwarded-For (o que o
+    proxy da plataforma acrescentou; os anteriores vêm do cliente) ou o
+    REMOTE_ADDR
+    """
+    encaminhado = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if encaminhado:
+        return encaminhado.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _try_acquire(endpoint, limite):
+    """Tenta ocupar uma vaga do endpoint; retorna o identificador da vaga ou None"""
+    if fcntl is None:
+        with _lock:
+            ocupadas = _vagas_processo.setdefault(endpoint, set())
+            for i in range(limite):
+                if i not in ocupadas:
+                    ocupadas.add(i)
+                    return i
+        return None
+
+    diretorio = admission_dir()
+    for i in range(limite):
+        fd = os.open(diretorio / f'{endpoint}.{i}.lock', os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def _release(endpoint, vaga):
+    if fcntl is None:
+        with _lock:
+            _vagas_processo[endpoint].discard(vaga)
+        return
+    fcntl.flock(vaga, fcntl.LOCK_UN)
+    os.close(vaga)
+
+
+def _busy_response(endpoint, espera):
+    response = JsonResponse(
+        {'error': 'Servidor ocupado com outras requisições pesadas; tente novamente em instantes'},
+        status=503,
+    )
+    response['Retry-After'] = str(RETRY_AFTER_OCUPADO)
+    logger.warning(f"Admissão: {endpoint} sem vaga após {espera} s")
+    return response
+
+
+def _wait_acquire(endpoint, limite, espera):
+    """Tenta ocupar uma vaga por até espera segundos (None: sem prazo); retorna a vaga ou None"""
+    prazo = None if espera is None else time.monotonic() + espera
+    vaga = _try_acquire(endpoint, limite)
+    while vaga is None and (prazo is None or time.monotonic() < prazo):
+        time.sleep(INTERVALO_ESPERA)
+        vaga = _try_acquire(endpoint, limite)
+    return vaga
+
+
+@contextmanager
+def _slot(endpoint, vaga):
+    try:
+        yield
+    finally:
+        _release(endpoint, vaga)
+
+
+@contextmanager
+def occupy_slot(endpoint):
+    """
+    Ocupa uma vaga do endpoint durante o bloco, esperando o tempo que for
+    preciso (tarefas em segundo plano, que não prendem requisições)
+    """
+    limite = settings.ADMISSION_CONCURRENCY.get(endpoint, 0)
+    if not limite:
+        yield
+        return
+    with _slot(endpoint, _wait_acquire(endpoint, limite, None)):
+        yield
+
+
+class _StreamingSlot:
+    """
+    Corpo de uma resposta em streaming que segura a vaga até a resposta ser
+    fechada: o corpo só é gerado depois que a view retorna (lendo o banco,
+    no caso do CSV da consulta em lote). O servidor fecha a resposta ao fim
+    do envio ou quando o cliente desiste.
+    """
+
+    def __init__(self, conteudo, endpoint, vaga):
+        self.conteudo = conteudo
+        self.endpoint = endpoint
+        self.vaga = vaga
+        self._liberada = False
+
+    def __iter__(self):
+        return iter(self.conteudo)
+
+    def close(self):
+        if not self._liberada:
+            self._liberada = True
+            _release(self.endpoint, self.vaga)
+
+
+def _hold_until_closed(response, endpoint, vaga):
+    """Libera a vaga já, ou, em respostas em streaming, quando a resposta for fechada"""
+    if not getattr(response, 'streaming', False):
+        _release(endpoint, vaga)
+        return response
+    response.streaming_content = _StreamingSlot(response.streaming_content, endpoint, vaga)
+    return response
+
+
+def concurrency_limit(endpoint):
+    """
+    Decorador que limita as execuções simultâneas da view (em todos os
+    workers) a ADMISSION_CONCURRENCY[endpoint]; 0 ou ausente desativa. Sem
+    vaga, a requisição espera até ADMISSION_WAIT segundos antes do 503. Nas
+    views síncronas, respostas em streaming seguram a vaga até serem fechadas.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                limite = settings.ADMISSION_CONCURRENCY.get(endpoint, 0)
+                if not limite:
+                    return await view(request, *args, **kwargs)
+                prazo = time.monotonic() + settings.ADMISSION_WAIT
+                vaga = _try_acquire(endpoint, limite)
+                while vaga is None and time.monotonic() < prazo:
+                    await asyncio.sleep(INTERVALO_ESPERA)
+                    vaga = _try_acquire(endpoint, limite)
+                if vaga is None:
+                    return _busy_response(endpoint, settings.ADMISSION_WAIT)
+                with _slot(endpoint, vaga):
+                    return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                limite = settings.ADMISSION_CONCURRENCY.get(endpoint, 0)
+                if not limite:
+                    return view(request, *args, **kwargs)
+                vaga = _wait_acquire(endpoint, limite, settings.ADMISSION_WAIT)
+                if vaga is None:
+                    return _busy_response(endpoint, settings.ADMISSION_WAIT)
+                try:
+                    response = view(request, *args, **kwargs)
+                except BaseException:
+                    _release(endpoint, vaga)
+                    raise
+                return _hold_until_closed(response, endpoint, vaga)
+        return wrapper
+    return decorator
+
+
+def _connect_rates():
+    conn = sqlite3.connect(admission_dir() / RATE_DB, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS requisicoes (
+            endpoint TEXT NOT NULL,
+            cliente TEXT NOT NULL,
+            instante REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requisicoes ON requisicoes(endpoint, cliente, instante)")
+    return conn
+
+
+def check_rate(endpoint, cliente, limite, janela):
+    """
+    Registra a requisição do cliente se estiver dentro do limite da janela
+    (s) e retorna None; acima do limite, retorna os segundos até a próxima
+    requisição ser aceita
+    """
+    agora = time.time()
+    conn = _connect_rates()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM requisicoes WHERE endpoint = ? AND instante < ?", [endpoint, agora - janela])
+        total, mais_antiga = conn.execute(
+            "SELECT COUNT(*), MIN(instante) FROM requisicoes WHERE endpoint = ? AND cliente = ?",
+            [endpoint, cliente],
+        ).fetchone()
+        if total >= limite:
+            conn.execute("COMMIT")
+            return max(1, math.ceil(mais_antiga + janela - agora))
+        conn.execute("INSERT INTO requisicoes (endpoint, cliente, instante) VALUES (?, ?, ?)", [endpoint, cliente, agora])
+        conn.execute("COMMIT")
+        return None
+    finally:
+        conn.close()
+
+
+def _rate_limited(endpoint, request):
+    """Resposta 429 quando o cliente excedeu ADMISSION_RATE[endpoint] (None caso contrário)"""
+    limite, janela = settings.ADMISSION_RATE.get(endpoint, (0, 0))
+    if not limite or request.method != 'POST':
+        return None
+    espera = check_rate(endpoint, client_id(request), limite, janela)
+    if espera is None:
+        return None
+    response = JsonResponse(
+        {'error': f'Limite de {limite} requisições a cada {janela} s atingido; tente novamente em {espera} s'},
+        status=429,
+    )
+    response['Retry-After'] = str(espera)
+    return response
+
+
+def rate_limit(endpoint):
+    """
+    Decorador que limita as requisições POST de cada cliente à view a
+    ADMISSION_RATE[endpoint] = (limite, janela em segundos); limite 0 desativa
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                limitada = await sync_to_async(_rate_limited, thread_sensitive=False)(endpoint, request)
+                return limitada or await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                return _rate_limited(endpoint, request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
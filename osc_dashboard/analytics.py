@@ -0,0 +1,199 @@
+"""
+Snapshot colunar (Parquet) da tabela oscs e agregações analíticas
+
+A migração grava, ao lado de cada banco, um arquivo <banco>.parquet com as
+colunas de baixa cardinalidade (município, natureza, situação) codificadas
+em dicionário. As agregações de /analise/ leem do snapshot só as colunas de
+agrupamento, mantêm por worker uma tabela Arrow compacta (dicionários e
+indicadores booleanos de email/telefone) e agrupam com varreduras colunares,
+sem o SELECT * linha a linha do SQLite nem um DataFrame completo.
+
+Depende do pacote opcional pyarrow. Sem ele, com snapshot ausente ou mais
+antigo que o banco, ou com filtros de palavras-chave, bacia, região ou
+alterado_desde, a agregação é feita com GROUP BY no SQLite.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from .filters import build_query
+from .regions import uses_regions
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # dependência opcional
+    pa = None
+
+# Dimensões de agrupamento: nome na API -> coluna da tabela oscs
+DIMENSOES = {
+    'municipio': 'edmu_nm_municipio',
+    'natureza_juridica': 'natureza_juridica',
+    'situacao_cadastral': 'situacao_cadastral',
+}
+
+# Colunas codificadas em dicionário no snapshot
+COLUNAS_DICIONARIO = ['natureza_juridica', 'situacao_cadastral', 'edmu_cd_municipio', 'edmu_nm_municipio']
+
+# Filtros atendidos pelo snapshot: chave em parse_filters -> coluna
+FILTROS_SNAPSHOT = {
+    'municipios': 'edmu_nm_municipio',
+    'naturezas': 'natureza_juridica',
+    'situacoes': 'situacao_cadastral',
+    'naturezas_ver': 'natureza_juridica',
+}
+
+# Limite máximo de linhas pedido em /analise/ (municípios × naturezas × situações cabem nele)
+MAX_LIMITE = 10000
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def snapshot_path(db_path):
+    """Caminho do snapshot Parquet do banco"""
+    return Path(db_path).with_suffix('.parquet')
+
+
+def write_snapshot(conn, destino):
+    """Grava o snapshot Parquet da tabela oscs da conexão e retorna o número de linhas"""
+    if pa is None:
+        raise RuntimeError("O pacote 'pyarrow' é necessário para o snapshot Parquet (pip install pyarrow)")
+    df = pd.read_sql_query("SELECT * FROM oscs", conn)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    for coluna in COLUNAS_DICIONARIO:
+        if coluna in tabela.column_names:
+            indice = tabela.column_names.index(coluna)
+            tabela = tabela.set_column(indice, coluna, pc.dictionary_encode(tabela[coluna]))
+
+    destino = Path(destino)
+    temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+    pq.write_table(tabela, temporario, compression='zstd')
+    os.replace(temporario, destino)
+    return tabela.num_rows
+
+
+def _preenchido(coluna):
+    valores = pc.utf8_trim_whitespace(pc.cast(coluna, pa.string()))
+    return pc.fill_null(pc.greater(pc.utf8_length(valores), 0), False)
+
+
+def _load_table(caminho):
+    """Lê do snapshot só as colunas usadas nas agregações, no formato compacto"""
+    colunas = sorted(set(DIMENSOES.values()))
+    tabela = pq.read_table(caminho, columns=colunas + ['email', 'telefone'])
+    return pa.table({
+        **{coluna: tabela[coluna] for coluna in colunas},
+        'tem_email': _preenchido(tabela['email']),
+        'tem_telefone': _preenchido(tabela['telefone']),
+    })
+
+
+def get_snapshot(db_path):
+    """
+    Tabela Arrow compacta do snapshot do banco (None sem pyarrow ou sem
+    snapshot atualizado), mantida por worker até o arquivo mudar
+    """
+    if pa is None:
+        return None
+    caminho = snapshot_path(db_path)
+    try:
+        stat = os.stat(caminho)
+        if stat.st_mtime < os.stat(db_path).st_mtime:
+            return None
+    except OSError:
+        return None
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        entrada = _cache.get(str(caminho))
+        if entrada is None or entrada[0] != assinatura:
+            entrada = (assinatura, _load_table(caminho))
+            _cache[str(caminho)] = entrada
+        return entrada[1]
+
+
+def supports(filtros):
+    """Indica se os filtros podem ser resolvidos sobre o snapshot"""
+    return not (
+        filtros['palavras_chave'] or filtros['palavras_excluir'] or uses_regions(filtros)
+        or filtros['alterado_desde'] is not None
+    )
+
+
+def parse_limit(valor):
+    """
+    Lê o limite de linhas da agregação: None (todas) ou um inteiro >= 1,
+    limitado a MAX_LIMITE. Levanta ValueError para outros valores.
+    """
+    if valor is None:
+        return None
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        limite = 0
+    if isinstance(valor, (bool, float)) or limite < 1:
+        raise ValueError("limite deve ser um número inteiro maior que zero")
+    return min(limite, MAX_LIMITE)
+
+
+def _ordenar(linhas, agrupar, limite):
+    linhas.sort(key=lambda linha: (-linha['total'], *(str(linha[d]) for d in agrupar)))
+    return linhas[:limite] if limite else linhas
+
+
+def aggregate_snapshot(tabelas, filtros, agrupar, limite=None):
+    """Agrega as tabelas Arrow (uma por estado) pelas dimensões pedidas"""
+    tabela = pa.concat_tables(tabelas).unify_dictionaries() if len(tabelas) > 1 else tabelas[0]
+
+    mascara = None
+    for chave, coluna in FILTROS_SNAPSHOT.items():
+        if filtros[chave]:
+            condicao = pc.is_in(tabela[coluna], value_set=pa.array(filtros[chave], pa.string()))
+            mascara = condicao if mascara is None else pc.and_(mascara, condicao)
+    if mascara is not None:
+        tabela = tabela.filter(mascara)
+
+    colunas = [DIMENSOES[d] for d in agrupar]
+    agregado = tabela.group_by(colunas).aggregate([
+        ('tem_email', 'count'), ('tem_email', 'sum'), ('tem_telefone', 'sum'),
+    ])
+    linhas = []
+    for registro in agregado.to_pylist():
+        if registro['tem_email_count'] == 0:
+            continue
+        linha = {d: registro[DIMENSOES[d]] for d in agrupar}
+        linha.update(
+            total=registro['tem_email_count'],
+            com_email=registro['tem_email_sum'] or 0,
+            com_telefone=registro['tem_telefone_sum'] or 0,
+        )
+        linhas.append(linha)
+    return _ordenar(linhas, agrupar, limite)
+
+
+def aggregate_sql(conn, filtros, agrupar, limite=None):
+    """Agrega com GROUP BY no SQLite (caminho sem snapshot)"""
+    with_clause, from_where, params, _ = build_query(conn, filtros)
+    colunas = [f"oscs.{DIMENSOES[d]}" for d in agrupar]
+    selecao = ''.join(f"{coluna}, " for coluna in colunas)
+    group_by = f" GROUP BY {', '.join(colunas)}" if colunas else ''
+    query = f"""
+        {with_clause}SELECT {selecao}COUNT(*),
+            SUM(CASE WHEN oscs.email IS NOT NULL AND TRIM(oscs.email) != '' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN oscs.telefone IS NOT NULL AND TRIM(oscs.telefone) != '' THEN 1 ELSE 0 END)
+        {from_where}{group_by}
+    """
+    linhas = []
+    for registro in conn.execute(query, params).fetchall():
+        total, com_email, com_telefone = registro[len(agrupar):]
+        if not total:
+            continue
+        linha = dict(zip(agrupar, registro[:len(agrupar)]))
+        linha.update(total=total, com_email=com_email or 0, com_telefone=com_telefone or 0)
+        linhas.append(linha)
+    return _ordenar(linhas, agrupar, limite)
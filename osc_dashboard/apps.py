@@ -1,6 +1,58 @@
+import logging
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
+# Servidores cujos processos atendem requisições (nome do executável ou do pacote em python -m)
+SERVIDORES = ('gunicorn', 'uvicorn')
+
+
+def _servindo_requisicoes():
+    """
+    Indica se o processo atual vai servir requisições: gunicorn, uvicorn ou o
+    runserver (scripts, benchmarks e demais comandos do manage.py não)
+    """
+    # Processos do pool de exportação (spawn) herdam o sys.argv do worker
+    if multiprocessing.parent_process() is not None:
+        return False
+    programa = Path(sys.argv[0])
+    nome = programa.parent.name if programa.name == '__main__.py' else programa.stem
+    if nome in SERVIDORES:
+        return True
+    # No runserver, só o processo filho do autoreloader serve requisições
+    return (
+        programa.name == 'manage.py'
+        and 'runserver' in sys.argv
+        and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv)
+    )
+
 
 class OscDashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'osc_dashboard'
+
+    def ready(self):
+        from django.conf import settings
+
+        from .storage import ensure_database
+
+        # Descomprime o banco distribuído como .zst, se for mais novo que o arquivo em disco
+        try:
+            if ensure_database(settings.OSC_DB_PATH):
+                logger.info("Banco descomprimido em %s", settings.OSC_DB_PATH)
+        except Exception:
+            logger.exception("Erro ao descomprimir o banco")
+
+        # Aquece caches e páginas do banco antes de o worker aceitar tráfego
+        if settings.WARMUP_ON_BOOT and _servindo_requisicoes():
+            from .warmup import warm_worker
+
+            try:
+                warm_worker()
+            except Exception:
+                logger.exception("Erro no aquecimento do worker")
@@ -0,0 +1,79 @@
+"""
+Versões assíncronas das views de leitura, usadas no modo ASGI (uvicorn)
+
+O acesso ao SQLite e o pandas continuam síncronos: o trabalho roda em um
+pool de threads limitado (ASYNC_DB_THREADS), e o event loop fica livre para
+atender as requisições rápidas enquanto consultas e exportações lentas
+executam.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import views
+from .admission import concurrency_limit, rate_limit
+
+_db_pool = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='osc-db')
+
+
+async def run_in_db_pool(func, *args):
+    """Executa func no pool de threads do banco, preservando o contexto da requisição"""
+    return await sync_to_async(func, thread_sensitive=False, executor=_db_pool)(*args)
+
+
+async def get_municipios_data(request):
+    """API endpoint para retornar dados de OSCs por município"""
+    dados = await run_in_db_pool(views.get_oscs_por_municipio)
+    return JsonResponse({'data': dados})
+
+
+async def filter_data(request):
+    """Filtra dados usando SQLite e retorna resultados em JSON"""
+    if request.method == 'POST':
+        try:
+            return await run_in_db_pool(views.filter_response, json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro ao filtrar dados: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+
+@concurrency_limit('exportacao')
+@rate_limit('exportacao')
+async def export_data(request):
+    """Exporta dados filtrados para Excel; consulta e planilha rodam no pool"""
+    if request.method == 'POST':
+        try:
+            return await run_in_db_pool(views.export_response, json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro ao exportar dados: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+
+@concurrency_limit('analise')
+async def analytics_data(request):
+    """API endpoint de agregações (contagens por município, natureza e situação)"""
+    if request.method == 'POST':
+        try:
+            return await run_in_db_pool(views.analytics_response, json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro ao agregar dados: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+
+# csrf_exempt do Django 4.2 não preserva views assíncronas; marca diretamente
+filter_data.csrf_exempt = True
+export_data.csrf_exempt = True
+analytics_data.csrf_exempt = True
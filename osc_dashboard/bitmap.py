@@ -0,0 +1,159 @@
+"""
+Motor de filtragem em memória baseado em bitmaps para os filtros categóricos
+
+Carrega uma vez por worker as colunas categóricas da tabela oscs (município,
+natureza jurídica e situação cadastral) e mantém, para cada valor, um bitset
+compactado (np.packbits) com as linhas que o possuem. Contagens e páginas
+para qualquer combinação de filtros saem de operações AND/OR entre bitsets.
+Filtros por palavras-chave continuam sendo resolvidos pelo SQLite.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from .filters import CATEGORICAL_FILTERS
+from .regions import uses_regions
+
+# Número de bits ligados em cada byte, para contar os bitsets
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint32)
+
+_lock = threading.Lock()
+# Índices mantidos por worker: o da versão ativa do banco e o da versão sendo aquecida
+MAX_INDICES = 2
+_cache = {}
+
+
+class BitmapIndex:
+    """Bitsets por valor das colunas categóricas, na ordem de rowid da tabela"""
+
+    def __init__(self, rowids, columns):
+        self.rowids = np.asarray(rowids, dtype=np.int64)
+        self.size = len(self.rowids)
+        self.all = np.packbits(np.ones(self.size, dtype=bool))
+        self.empty = np.zeros_like(self.all)
+        self.bitmaps = {}
+        # Código do valor de cada linha (-1 para nulo), usado nas contagens por faceta
+        self.codes = {}
+        self.values = {}
+
+        for column, values in columns.items():
+            values = np.asarray(values, dtype=object)
+            present = np.array([v is not None for v in values], dtype=bool)
+            uniques, codes = np.unique(values[present].astype(str), return_inverse=True)
+            positions = np.flatnonzero(present)
+            self.codes[column] = np.full(self.size, -1, dtype=np.int32)
+            self.codes[column][positions] = codes
+            self.values[column] = uniques.tolist()
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+            bitmaps = {}
+            for i, value in enumerate(uniques):
+                bits = np.zeros(self.size, dtype=bool)
+                bits[positions[order[bounds[i]:bounds[i + 1]]]] = True
+                bitmaps[value] = np.packbits(bits)
+            self.bitmaps[column] = bitmaps
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Carrega as colunas categóricas da tabela oscs"""
+        columns = [column for _, column in CATEGORICAL_FILTERS.values()]
+        rows = conn.execute(f"SELECT rowid, {', '.join(columns)} FROM oscs ORDER BY rowid").fetchall()
+        rowids = [row[0] for row in rows]
+        data = {column: [row[i + 1] for row in rows] for i, column in enumerate(columns)}
+        return cls(rowids, data)
+
+    @staticmethod
+    def supports(filtros):
+        """Indica se a combinação de filtros pode ser resolvida só com bitmaps"""
+        return (
+            not filtros['palavras_chave'] and not filtros['palavras_excluir']
+            and not uses_regions(filtros) and filtros['alterado_desde'] is None
+        )
+
+    def _union(self, column, values):
+        bitmaps = self.bitmaps[column]
+        result = self.empty.copy()
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                np.bitwise_or(result, bitmap, out=result)
+        return result
+
+    def mask(self, filtros):
+        """Bitset das linhas que atendem aos filtros (OR dentro da dimensão, AND entre dimensões)"""
+        result = self.all.copy()
+        for key, (_, column) in CATEGORICAL_FILTERS.items():
+            if filtros[key]:
+                np.bitwise_and(result, self._union(column, filtros[key]), out=result)
+        if filtros['naturezas_ver']:
+            np.bitwise_and(result, self._union('natureza_juridica', filtros['naturezas_ver']), out=result)
+        return result
+
+    def count(self, filtros):
+        """Total de linhas que atendem aos filtros"""
+        return int(_POPCOUNT[self.mask(filtros)].sum())
+
+    def facet_counts(self, filtros):
+        """
+        Contagem por valor de cada dimensão categórica, aplicando os demais
+        filtros mas ignorando a seleção da própria dimensão
+        """
+        facetas = {}
+        for key, (campo, column) in CATEGORICAL_FILTERS.items():
+            bits = np.unpackbits(self.mask({**filtros, key: []}), count=self.size).astype(bool)
+            codes = self.codes[column][bits]
+            counts = np.bincount(codes[codes >= 0], minlength=len(self.values[column]))
+            facetas[campo] = {
+                value: int(total)
+                for value, total in zip(self.values[column], counts)
+                if total and value != ''
+            }
+        return facetas
+
+    def page(self, filtros, offset, limit):
+        """rowids das linhas da página pedida, em ordem de rowid"""
+        bits = np.unpackbits(self.mask(filtros), count=self.size)
+        positions = np.flatnonzero(bits)[offset:offset + limit]
+        return self.rowids[positions].tolist()
+
+
+def get_bitmap_index(db_path, connect):
+    """
+    Retorna o índice de bitmaps do worker, recarregando-o quando o arquivo
+    do banco muda (data de modificação ou tamanho)
+
+    O índice é construído fora do lock: requisições de outra versão do banco
+    não esperam a construção.
+    """
+    stat = os.stat(db_path)
+    chave = str(db_path)
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        entrada = _cache.get(chave)
+        if entrada is not None and entrada[0] == assinatura:
+            return entrada[1]
+
+    conn = connect()
+    try:
+        index = BitmapIndex.from_connection(conn)
+    finally:
+        conn.close()
+
+    with _lock:
+        _cache.pop(chave, None)
+        _cache[chave] = (assinatura, index)
+        while len(_cache) > MAX_INDICES:
+            _cache.pop(next(iter(_cache)))
+    return index
+
+
+def rowid_query(rowids, columns='*'):
+    """Monta a consulta que busca as linhas pelos rowids, preservando a ordem do índice"""
+    if not rowids:
+        return f"SELECT {columns} FROM oscs WHERE 0", []
+    placeholders = ','.join('?' for _ in rowids)
+    return f"SELECT {columns} FROM oscs WHERE rowid IN ({placeholders}) ORDER BY rowid", list(rowids)
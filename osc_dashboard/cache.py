@@ -0,0 +1,191 @@
+"""
+Cache de resultados de filtros com despejo LRU
+
+Guarda, para cada combinação de filtros normalizada, a lista ordenada de
+rowids do resultado (e a relevância, na busca aproximada). Qualquer página
+sai de uma fatia dessa lista, sem repetir COUNT e consulta paginada. A chave
+inclui a versão do banco, e o cache local é esvaziado quando o arquivo muda.
+
+Cada entrada guarda também as últimas páginas já serializadas: uma página
+pedida é lida junto com a seguinte (JANELA_PAGINAS), de modo que o
+pré-carregamento da próxima página pelo dashboard não toca o banco.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .filters import build_query
+
+# Páginas lidas de uma vez a partir da pedida (a pedida e as seguintes)
+JANELA_PAGINAS = 2
+# Páginas serializadas mantidas por entrada do cache (as mais recentes)
+PAGINAS_POR_ENTRADA = 8
+
+
+def db_version(db_path):
+    """Identifica a versão do arquivo do banco pela data de modificação e tamanho"""
+    stat = os.stat(db_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def canonical_filters(filtros):
+    """Serializa os filtros de forma canônica (listas ordenadas e sem repetição)"""
+    spec = {
+        key: sorted(set(value)) if isinstance(value, list) else value
+        for key, value in filtros.items()
+        if key != 'similaridade_minima'
+    }
+    if filtros['busca_aproximada'] and filtros['palavras_chave']:
+        spec['similaridade_minima'] = filtros['similaridade_minima']
+    return json.dumps(spec, sort_keys=True, ensure_ascii=False)
+
+
+def compute_entry(conn, filtros):
+    """Executa a consulta completa e retorna a entrada de cache com os rowids ordenados"""
+    with_clause, from_where, params, order_by = build_query(conn, filtros)
+    colunas = "oscs.rowid, relevancia.relevancia" if with_clause else "oscs.rowid"
+    rows = conn.execute(f"{with_clause}SELECT {colunas} {from_where}{order_by}", params).fetchall()
+    return {
+        'rowids': np.array([row[0] for row in rows], dtype=np.int64),
+        'relevancias': np.array([row[1] for row in rows], dtype=np.float64) if with_clause else None,
+        'busca_aproximada': bool(with_clause),
+        'facetas': None,
+        'paginas': {},
+    }
+
+
+def cached_page(entry, page, per_page):
+    """Linhas serializadas da página, se estiverem na entrada (None caso contrário)"""
+    return entry.get('paginas', {}).get((per_page, page))
+
+
+def store_pages(entry, per_page, paginas):
+    """
+    Guarda na entrada as páginas serializadas ({página: linhas}), mantendo as
+    PAGINAS_POR_ENTRADA mais recentes. O dicionário é substituído, não
+    alterado, para não disputar com leituras de outras threads.
+    """
+    novas = dict(entry.get('paginas', {}))
+    for page, linhas in paginas.items():
+        novas.pop((per_page, page), None)
+        novas[(per_page, page)] = linhas
+    while len(novas) > PAGINAS_POR_ENTRADA:
+        novas.pop(next(iter(novas)))
+    entry['paginas'] = novas
+
+
+class ResultCache:
+    """Cache LRU em processo, opcionalmente delegando o armazenamento a um backend do Django"""
+
+    def __init__(self, max_entries, max_ids, backend='local', alias='default'):
+        self.max_entries = max_entries
+        self.max_ids = max_ids
+        self.backend = backend
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._ids = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _check_version(self, version):
+        # Banco trocado: descarta tudo que foi calculado para a versão anterior
+        if self._version != version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._ids = 0
+            self._version = version
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._ids += len(entry['rowids'])
+        while self._entries and (len(self._entries) > self.max_entries or self._ids > self.max_ids):
+            _, removed = self._entries.popitem(last=False)
+            self._ids -= len(removed['rowids'])
+            self.evictions += 1
+
+    def get(self, version, spec):
+        """Retorna a entrada em cache ou None"""
+        if self.backend == 'django':
+            entry = caches[self.alias].get(self._django_key(version, spec))
+        else:
+            with self._lock:
+                self._check_version(version)
+                entry = self._entries.get(spec)
+                if entry is not None:
+                    self._entries.move_to_end(spec)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, version, spec, entry):
+        """Armazena (ou atualiza) a entrada da combinação de filtros"""
+        if self.backend == 'django':
+            caches[self.alias].set(self._django_key(version, spec), entry)
+            return
+        with self._lock:
+            self._check_version(version)
+            if spec in self._entries:
+                self._ids -= len(self._entries.pop(spec)['rowids'])
+            self._store(spec, entry)
+
+    def get_or_compute(self, version, spec, compute):
+        entry = self.get(version, spec)
+        if entry is None:
+            entry = compute()
+            self.set(version, spec, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids = 0
+
+    def stats(self):
+        """Métricas de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'entradas': len(self._entries) if self.backend == 'local' else None,
+                'ids_armazenados': self._ids if self.backend == 'local' else None,
+                'max_entradas': self.max_entries,
+                'max_ids': self.max_ids,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': round(self.hits / total, 4) if total else None,
+                'evictions': self.evictions if self.backend == 'local' else None,
+                'invalidacoes': self.invalidations,
+            }
+
+    @staticmethod
+    def _django_key(version, spec):
+        digest = hashlib.sha1(f"{version}|{spec}".encode('utf-8')).hexdigest()
+        return f"osc_resultados:{digest}"
+
+
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_SIZE,
+    max_ids=settings.RESULT_CACHE_MAX_IDS,
+    backend=settings.RESULT_CACHE_BACKEND,
+    alias=settings.RESULT_CACHE_ALIAS,
+)
@@ -0,0 +1,330 @@
+"""
+Exportação dos dados filtrados para Excel, na requisição ou em segundo plano
+
+As tarefas de exportação rodam em um pool de processos (iniciados com spawn)
+e gravam a planilha em EXPORT_DIR: a consulta, o pandas e o openpyxl não
+disputam o GIL do worker do gunicorn, que fica livre para o tráfego
+interativo. Cada tarefa ocupa uma vaga de "exportacao" do controle de
+admissão, compartilhada por todos os workers. O identificador da tarefa é
+derivado da versão dos bancos e dos filtros canônicos, de modo que filtros
+idênticos reaproveitam o arquivo já gerado. O estado de cada tarefa fica em
+um JSON ao lado do arquivo, gravado pelo próprio processo da tarefa e
+legível por qualquer worker.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+
+from .admission import occupy_slot
+from .cache import canonical_filters
+from .filters import build_query
+from .partitions import default_state, states_version
+from .search import normalize_text
+
+COLUNAS_SQL = (
+    "oscs.id_osc, oscs.nome, oscs.email, oscs.endereco, oscs.telefone, oscs.natureza_juridica, "
+    "oscs.situacao_cadastral, oscs.edmu_cd_municipio, oscs.edmu_nm_municipio"
+)
+COLUNAS_EXPORT = [
+    'ID OSC', 'Nome', 'Email', 'Endereço', 'Telefone',
+    'Natureza Jurídica', 'Situação Cadastral', 'Código Município', 'Município'
+]
+
+# Linhas lidas por vez nas tarefas (cada bloco atualiza o progresso)
+CHUNK_SIZE = 5000
+# Intervalo (s) entre as regravações do estado durante a escrita da planilha
+INTERVALO_PULSO = 10
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def export_labels(estados):
+    """Retorna (rótulo do arquivo, nome da aba) conforme os estados exportados"""
+    if estados == [default_state()]:
+        return 'Parana', 'OSCs Paraná'
+    return '_'.join(estados), f"OSCs {' '.join(estados)}"[:31]
+
+
+def export_dataframe(conn, filtros, palavras_chave='', progresso=None):
+    """
+    Executa a consulta da exportação e retorna o DataFrame com as colunas
+    renomeadas (vazio quando nada é encontrado)
+
+    progresso, quando informado, recebe (linhas lidas, total estimado) a
+    cada bloco de CHUNK_SIZE linhas.
+    """
+    # Palavras-chave exatas são filtradas no Python
+    with_clause, from_where, params, order_by = build_query(conn, filtros, incluir_palavras_chave=False)
+    colunas = COLUNAS_SQL
+    if with_clause:
+        colunas += ", relevancia.relevancia"
+        palavras_chave = ''
+    query = f"{with_clause}SELECT {colunas} {from_where}{order_by}"
+
+    if progresso is None:
+        df = pd.read_sql_query(query, conn, params=params)
+    else:
+        total = conn.execute(f"{with_clause}SELECT COUNT(*) {from_where}", params).fetchone()[0]
+        partes = []
+        lidas = 0
+        for parte in pd.read_sql_query(query, conn, params=params, chunksize=CHUNK_SIZE):
+            partes.append(parte)
+            lidas += len(parte)
+            progresso(lidas, total)
+        df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+    if palavras_chave and not df.empty:
+        # Busca por palavras separadas por espaço ou vírgula, ignorando acentos e case
+        keywords_norm = [normalize_text(kw.strip()) for kw in re.split(r'[ ,]+', palavras_chave) if kw.strip()]
+        mask = df['nome'].apply(lambda x: any(kw in normalize_text(x) for kw in keywords_norm))
+        df = df[mask]
+
+    if df.empty:
+        return df
+
+    # Substitui NaN por string vazia para Excel
+    df_export = df.fillna('')
+
+    # Renomeia colunas para melhor visualização
+    colunas_export = list(COLUNAS_EXPORT)
+    if 'relevancia' in df_export.columns:
+        colunas_export.append('Relevância')
+    if len(df_export.columns) != len(colunas_export):
+        raise RuntimeError(f'número de colunas inesperado ({len(df_export.columns)})')
+    df_export.columns = colunas_export
+    return df_export
+
+
+def write_workbook(df_export, destino, sheet_name):
+    """Grava a planilha em destino (caminho ou arquivo aberto), ajustando a largura das colunas"""
+    with pd.ExcelWriter(destino, engine='openpyxl') as writer:
+        df_export.to_excel(writer, sheet_name=sheet_name, index=False)
+
+        # Ajusta largura das colunas
+        worksheet = writer.sheets[sheet_name]
+        for column in worksheet.columns:
+            max_length = 0
+            column_letter = column[0].column_letter
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            worksheet.column_dimensions[column_letter].width = adjusted_width
+
+
+def _export_dir():
+    diretorio = Path(settings.EXPORT_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def _job_path(job_id):
+    return _export_dir() / f'{job_id}.json'
+
+
+def artifact_path(job_id):
+    """Caminho da planilha gerada pela tarefa"""
+    return _export_dir() / f'{job_id}.xlsx'
+
+
+def make_job_id(version, spec):
+    """Identificador determinístico da tarefa: mesma versão e filtros, mesma tarefa"""
+    return hashlib.sha1(f'{version}\n{spec}'.encode('utf-8')).hexdigest()[:20]
+
+
+def _write_job(job_id, job):
+    # Grava em arquivo temporário e troca, para que outros workers nunca leiam JSON parcial
+    job['atualizado_em'] = time.time()
+    caminho = _job_path(job_id)
+    temporario = caminho.with_suffix(f'.json.{os.getpid()}.{threading.get_ident()}')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def read_job(job_id):
+    """
+    Lê o estado da tarefa (None se não existe). Tarefas sem atualização há
+    mais de EXPORT_JOB_TIMEOUT segundos (worker reiniciado, por exemplo) são
+    dadas como interrompidas.
+    """
+    if not re.fullmatch(r'[0-9a-f]{20}', job_id):
+        return None
+    try:
+        with open(_job_path(job_id), encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if job['status'] in (PENDENTE, EXECUTANDO) and time.time() - job['atualizado_em'] > settings.EXPORT_JOB_TIMEOUT:
+        job['status'] = ERRO
+        job['erro'] = 'Tarefa interrompida'
+    if job['status'] == CONCLUIDO and not artifact_path(job_id).exists():
+        return None
+    return job
+
+
+def cleanup_exports():
+    """Remove tarefas e planilhas mais antigas que EXPORT_JOB_TTL segundos"""
+    limite = time.time() - settings.EXPORT_JOB_TTL
+    for arquivo in _export_dir().iterdir():
+        try:
+            if arquivo.stat().st_mtime < limite:
+                arquivo.unlink()
+        except OSError:
+            pass
+
+
+def _init_process():
+    """Inicializa o Django nos processos de exportação"""
+    import django
+
+    django.setup()
+
+
+def _get_executor(recriar=False):
+    global _executor
+    with _executor_lock:
+        if _executor is None or recriar:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process,
+            )
+        return _executor
+
+
+@contextmanager
+def _heartbeat(job_id, job):
+    """
+    Regrava o estado da tarefa a cada INTERVALO_PULSO segundos enquanto o
+    bloco roda, para etapas sem progresso próprio (a espera por uma vaga e a
+    escrita da planilha) não parecerem interrompidas
+    """
+    parar = threading.Event()
+
+    def pulsar():
+        while not parar.wait(INTERVALO_PULSO):
+            _write_job(job_id, job)
+
+    thread = threading.Thread(target=pulsar, name=f'exportacao-{job_id}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        thread.join()
+
+
+def submit_export(filtros, palavras_chave, connect):
+    """
+    Cria (ou reaproveita) a tarefa de exportação dos filtros e retorna
+    (job_id, estado). connect(estados) abre a conexão usada pela tarefa e é
+    enviada ao processo da tarefa (deve ser uma função de módulo).
+    """
+    version = states_version(filtros['estados'])
+    job_id = make_job_id(version, canonical_filters(filtros))
+    cleanup_exports()
+
+    job = read_job(job_id)
+    if job is not None and job['status'] != ERRO:
+        return job_id, job
+    if job is not None:
+        _job_path(job_id).unlink(missing_ok=True)
+
+    job = {
+        'status': PENDENTE,
+        'progresso': 0,
+        'linhas': None,
+        'erro': None,
+        'arquivo': None,
+        'criado_em': time.time(),
+    }
+    try:
+        # Criação exclusiva: se outro worker criou a mesma tarefa, usa a dele
+        fd = os.open(_job_path(job_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return job_id, read_job(job_id) or job
+    os.close(fd)
+    _write_job(job_id, job)
+    estado = dict(job)
+
+    try:
+        _get_executor().submit(_run_export, job_id, job, filtros, palavras_chave, connect)
+    except BrokenProcessPool:
+        # Um processo do pool morreu (ex.: falta de memória): recria o pool
+        _get_executor(recriar=True).submit(_run_export, job_id, job, filtros, palavras_chave, connect)
+    return job_id, estado
+
+
+def _run_export(job_id, job, filtros, palavras_chave, connect):
+    """
+    Executa a tarefa: espera uma vaga de exportação (pendente), consulta
+    (até 80% do progresso), planilha e troca atômica do arquivo
+    """
+    # A vaga é a mesma do /export/ síncrono, em todos os workers; o pulso
+    # mantém a tarefa viva enquanto espera e durante a escrita da planilha
+    with _heartbeat(job_id, job), occupy_slot('exportacao'):
+        _execute_export(job_id, job, filtros, palavras_chave, connect)
+
+
+def _execute_export(job_id, job, filtros, palavras_chave, connect):
+    job['status'] = EXECUTANDO
+    _write_job(job_id, job)
+
+    def progresso(lidas, total):
+        job['progresso'] = int(80 * lidas / total) if total else 80
+        _write_job(job_id, job)
+
+    try:
+        conn = connect(filtros['estados'])
+        try:
+            df_export = export_dataframe(conn, filtros, palavras_chave, progresso)
+        finally:
+            conn.close()
+
+        if df_export.empty:
+            job.update(status=ERRO, erro='Nenhum dado encontrado')
+            _write_job(job_id, job)
+            return
+
+        rotulo, sheet_name = export_labels(filtros['estados'])
+        destino = artifact_path(job_id)
+        temporario = destino.with_suffix('.xlsx.tmp')
+        write_workbook(df_export, temporario, sheet_name)
+        os.replace(temporario, destino)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        job.update(
+            status=CONCLUIDO,
+            progresso=100,
+            linhas=len(df_export),
+            arquivo=f'OSCs_{rotulo}_{timestamp}.xlsx',
+        )
+        _write_job(job_id, job)
+    except Exception as e:
+        print(f"Erro na tarefa de exportação {job_id}: {e}")
+        job.update(status=ERRO, erro=f'Erro ao exportar dados: {str(e)}')
+        _write_job(job_id, job)
@@ -0,0 +1,43 @@
+"""
+Contagens por faceta (município, natureza jurídica, situação cadastral)
+
+Cada faceta aplica todos os filtros atuais exceto a seleção da própria
+dimensão, mostrando quantas OSCs cada valor alternativo retornaria.
+"""
+
+from collections import defaultdict
+
+from .filters import CATEGORICAL_FILTERS, build_query
+
+
+def facet_counts_sql(conn, filtros):
+    """
+    Calcula as facetas em uma única passada pelo SQLite.
+
+    Agrupa as OSCs que atendem aos filtros não categóricos (palavras-chave,
+    exclusões, naturezas para visualizar) pelas três dimensões categóricas e,
+    a partir desse cubo, soma para cada dimensão as células compatíveis com
+    a seleção das outras duas.
+    """
+    sem_categoricos = {**filtros, **{key: [] for key in CATEGORICAL_FILTERS}}
+    with_clause, from_where, params, _ = build_query(conn, sem_categoricos)
+    columns = [column for _, column in CATEGORICAL_FILTERS.values()]
+    cube = conn.execute(
+        f"{with_clause}SELECT {', '.join(columns)}, COUNT(*) {from_where} GROUP BY {', '.join(columns)}",
+        params,
+    ).fetchall()
+
+    selecoes = [set(filtros[key]) for key in CATEGORICAL_FILTERS]
+    facetas = {campo: defaultdict(int) for campo, _ in CATEGORICAL_FILTERS.values()}
+
+    for row in cube:
+        valores, total = row[:-1], row[-1]
+        atende = [not selecao or valor in selecao for valor, selecao in zip(valores, selecoes)]
+        for i, (campo, _) in enumerate(CATEGORICAL_FILTERS.values()):
+            if valores[i] in (None, ''):
+                continue
+            # Ignora a seleção da própria dimensão
+            if all(ok for j, ok in enumerate(atende) if j != i):
+                facetas[campo][valores[i]] += total
+
+    return {campo: dict(sorted(contagens.items())) for campo, contagens in facetas.items()}
@@ -0,0 +1,163 @@
+"""
+Interpretação dos filtros enviados pelo dashboard e montagem da cláusula WHERE
+compartilhada pelas views de filtragem e exportação
+"""
+
+from django.conf import settings
+
+from .history import build_since_condition, check_since, parse_since
+from .regions import REGION_FILTERS, build_region_conditions, has_regions_table, uses_regions
+from .search import build_relevance_cte, has_trigram_index
+
+# Filtros categóricos: chave em parse_filters -> (campo do payload, coluna da tabela oscs)
+CATEGORICAL_FILTERS = {
+    'municipios': ('municipio', 'edmu_nm_municipio'),
+    'naturezas': ('natureza_juridica', 'natureza_juridica'),
+    'situacoes': ('situacao_cadastral', 'situacao_cadastral'),
+}
+
+# Maior página aceita na paginação de /filter/
+MAX_POR_PAGINA = 500
+
+
+def split_values(value, separator=','):
+    """Separa um valor de filtro (string ou lista) em uma lista de termos não vazios"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if separator is None:
+        return [v.strip() for v in str(value).split() if v.strip()]
+    return [v.strip() for v in str(value).split(separator) if v.strip()]
+
+
+def parse_similarity(valor):
+    """
+    Lê similaridade_minima do payload (padrão: BUSCA_SIMILARIDADE_MINIMA).
+    Levanta ValueError se não for um número entre 0 e 1.
+    """
+    if valor is None:
+        return settings.BUSCA_SIMILARIDADE_MINIMA
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        valor = None
+    if valor is None or not 0 <= valor <= 1:
+        raise ValueError("similaridade_minima deve ser um número entre 0 e 1")
+    return valor
+
+
+def parse_filters(data):
+    """Normaliza o payload JSON de /filter/ e /export/ em listas de termos"""
+    return {
+        'municipios': split_values(data.get('municipio', '')),
+        'naturezas': split_values(data.get('natureza_juridica', '')),
+        'palavras_chave': split_values(data.get('palavras_chave', ''), separator=None),
+        'palavras_excluir': split_values(data.get('palavras_excluir', ''), separator=None),
+        'situacoes': split_values(data.get('situacao_cadastral', '')),
+        'naturezas_ver': split_values(data.get('naturezas_ver', [])),
+        'estados': [uf.upper() for uf in split_values(data.get('estado', ''))],
+        **{chave: split_values(data.get(campo, '')) for chave, (campo, _) in REGION_FILTERS.items()},
+        'alterado_desde': parse_since(data.get('alterado_desde')),
+        'busca_aproximada': bool(data.get('busca_aproximada', False)),
+        'similaridade_minima': parse_similarity(data.get('similaridade_minima')),
+    }
+
+
+def parse_pagination(data):
+    """
+    Lê page e per_page do payload como inteiros, limitados a page >= 1 e
+    1 <= per_page <= MAX_POR_PAGINA. Levanta ValueError se não forem números.
+    """
+    try:
+        page = int(data.get('page', 1))
+        per_page = int(data.get('per_page', 50))
+    except (TypeError, ValueError):
+        raise ValueError("page e per_page devem ser números inteiros")
+    return max(page, 1), min(max(per_page, 1), MAX_POR_PAGINA)
+
+
+def build_where(filtros, incluir_palavras_chave=True):
+    """
+    Monta as condições SQL (prefixadas com AND) e os parâmetros dos filtros.
+
+    Quando incluir_palavras_chave é False as palavras-chave ficam de fora,
+    para serem tratadas pela busca aproximada ou por filtragem em Python.
+    """
+    conditions = []
+    params = []
+
+    if filtros['municipios']:
+        # Busca OR com igualdade exata
+        conditions.append('(' + ' OR '.join('edmu_nm_municipio = ?' for _ in filtros['municipios']) + ')')
+        params.extend(filtros['municipios'])
+
+    if filtros['naturezas']:
+        conditions.append('(' + ' OR '.join('natureza_juridica = ?' for _ in filtros['naturezas']) + ')')
+        params.extend(filtros['naturezas'])
+
+    if incluir_palavras_chave and filtros['palavras_chave']:
+        # OSC deve conter QUALQUER uma das palavras
+        conditions.append('(' + ' OR '.join('nome LIKE ?' for _ in filtros['palavras_chave']) + ')')
+        params.extend(f'%{kw}%' for kw in filtros['palavras_chave'])
+
+    if filtros['palavras_excluir']:
+        conditions.append('(' + ' AND '.join('nome NOT LIKE ?' for _ in filtros['palavras_excluir']) + ')')
+        params.extend(f'%{kw}%' for kw in filtros['palavras_excluir'])
+
+    if filtros['situacoes']:
+        conditions.append('(' + ' OR '.join('situacao_cadastral = ?' for _ in filtros['situacoes']) + ')')
+        params.extend(filtros['situacoes'])
+
+    # Filtra apenas as naturezas jurídicas selecionadas para visualização
+    if filtros['naturezas_ver']:
+        placeholders = ','.join('?' for _ in filtros['naturezas_ver'])
+        conditions.append(f'natureza_juridica IN ({placeholders})')
+        params.extend(filtros['naturezas_ver'])
+
+    # Bacias e regiões: subconsulta indexada no mapeamento de municípios
+    region_conditions, region_params = build_region_conditions(filtros)
+    conditions.extend(region_conditions)
+    params.extend(region_params)
+
+    # OSCs inseridas ou alteradas desde uma versão/data: subconsulta no log de alterações
+    since_conditions, since_params = build_since_condition(filtros)
+    conditions.extend(since_conditions)
+    params.extend(since_params)
+
+    where = ''.join(f' AND {condition}' for condition in conditions)
+    return where, params
+
+
+def build_query(conn, filtros, incluir_palavras_chave=True):
+    """
+    Monta as partes da consulta filtrada sobre a tabela oscs.
+
+    Retorna (with_clause, from_where, params, order_by). Com busca aproximada
+    ativa e índice de trigramas disponível, as palavras-chave passam a ser
+    resolvidas pelo índice, a consulta ganha um JOIN com a CTE "relevancia"
+    e os resultados são ordenados pela relevância.
+
+    Levanta ValueError quando os filtros pedem bacia ou região e o banco não
+    tem o mapeamento de municípios, e quando alterado_desde não pode ser
+    respondido pelo histórico de versões do banco.
+    """
+    if uses_regions(filtros) and not has_regions_table(conn):
+        raise ValueError("Filtro de bacia/região indisponível: o banco não tem o mapeamento de municípios")
+    check_since(conn, filtros)
+
+    if filtros['busca_aproximada'] and filtros['palavras_chave'] and has_trigram_index(conn):
+        relevance_sql, relevance_params = build_relevance_cte(
+            conn, filtros['palavras_chave'], filtros['similaridade_minima']
+        )
+        if relevance_sql:
+            where, params = build_where(filtros, incluir_palavras_chave=False)
+            return (
+                f"WITH {relevance_sql} ",
+                f"FROM oscs JOIN relevancia ON relevancia.id_osc = oscs.id_osc WHERE 1=1{where}",
+                relevance_params + params,
+                " ORDER BY relevancia.relevancia DESC, oscs.id_osc",
+            )
+
+    where, params = build_where(filtros, incluir_palavras_chave=incluir_palavras_chave)
+    return '', f"FROM oscs WHERE 1=1{where}", params, ''
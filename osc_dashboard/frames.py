@@ -0,0 +1,98 @@
+"""
+Carga compacta da tabela oscs em DataFrame
+
+Lê só as colunas pedidas, converte as de baixa cardinalidade (município,
+natureza, situação) para category e os códigos para int32. A tabela
+carregada é mantida por worker, uma instância por conjunto de colunas,
+até o arquivo do banco mudar. O DataFrame é compartilhado: quem precisar
+alterá-lo deve trabalhar em uma cópia.
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from .partitions import COLUMNS
+
+TODAS_COLUNAS = [coluna.strip() for coluna in COLUMNS.split(',')]
+
+COLUNAS_CATEGORICAS = ['natureza_juridica', 'situacao_cadastral', 'edmu_nm_municipio']
+COLUNAS_INTEIRAS = ['id_osc', 'edmu_cd_municipio']
+
+_lock = threading.Lock()
+_cache = {}
+
+
+# Linhas lidas por bloco: cada bloco é convertido antes de ler o próximo
+CHUNK_SIZE = 20000
+
+
+def _categorical_dtypes(conn, colunas):
+    """Tipos category com as categorias fixas de cada coluna (iguais em todos os blocos)"""
+    tipos = {}
+    for coluna in colunas:
+        if coluna in COLUNAS_CATEGORICAS:
+            valores = [v for (v,) in conn.execute(
+                f"SELECT DISTINCT {coluna} FROM oscs WHERE {coluna} IS NOT NULL ORDER BY {coluna}"
+            )]
+            tipos[coluna] = pd.CategoricalDtype(valores)
+    return tipos
+
+
+def compact_frame(df, tipos=None):
+    """Converte as colunas do DataFrame para os tipos compactos"""
+    tipos = tipos or {}
+    for coluna in df.columns:
+        if coluna in COLUNAS_CATEGORICAS:
+            df[coluna] = df[coluna].astype(tipos.get(coluna, 'category'))
+        elif coluna in COLUNAS_INTEIRAS:
+            valores = pd.to_numeric(df[coluna], errors='coerce')
+            df[coluna] = valores.astype('Int32')
+    return df
+
+
+def read_frame(conn, colunas=None):
+    """
+    Lê as colunas pedidas da tabela oscs (padrão: todas) no formato compacto,
+    em blocos, sem materializar a tabela inteira com colunas object
+    """
+    colunas = list(colunas or TODAS_COLUNAS)
+    desconhecidas = [coluna for coluna in colunas if coluna not in TODAS_COLUNAS]
+    if desconhecidas:
+        raise ValueError(f"Coluna(s) inexistente(s): {', '.join(desconhecidas)}")
+
+    tipos = _categorical_dtypes(conn, colunas)
+    partes = [
+        compact_frame(parte, tipos)
+        for parte in pd.read_sql_query(f"SELECT {', '.join(colunas)} FROM oscs", conn, chunksize=CHUNK_SIZE)
+    ]
+    if not partes:
+        return compact_frame(pd.DataFrame(columns=colunas), tipos)
+    df = pd.concat(partes, ignore_index=True)
+    # Sem nulos, os inteiros ficam em int32 simples
+    for coluna in df.columns:
+        if coluna in COLUNAS_INTEIRAS and not df[coluna].isna().any():
+            df[coluna] = df[coluna].astype('int32')
+    return df
+
+
+def get_frame(db_path, connect, colunas=None):
+    """DataFrame compacto do worker para as colunas pedidas, relido quando o banco muda"""
+    stat = os.stat(db_path)
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+    chave = (str(db_path), tuple(colunas or TODAS_COLUNAS))
+
+    with _lock:
+        entrada = _cache.get(chave)
+        if entrada is None or entrada[0] != assinatura:
+            conn = connect()
+            try:
+                entrada = (assinatura, read_frame(conn, colunas))
+            finally:
+                conn.close()
+            # Descarta as cargas de versões anteriores do mesmo banco
+            for outra in [k for k, v in _cache.items() if k[0] == chave[0] and v[0] != assinatura]:
+                del _cache[outra]
+            _cache[chave] = entrada
+        return entrada[1]
@@ -0,0 +1,140 @@
+"""
+Histórico de versões dos dados e filtro "alteradas desde"
+
+Cada carga registra uma versão em oscs_versoes (data, tipo, origem e
+contagens). As atualizações incrementais registram também, em
+oscs_historico, as OSCs inseridas, alteradas e removidas naquela versão,
+com chave (versao, id_osc). O filtro alterado_desde (número de versão ou
+data) vira uma subconsulta nesse log de alterações, sem comparar planilhas.
+
+Uma carga completa recria a tabela sem registrar as alterações linha a
+linha: o histórico vale a partir da última carga completa.
+"""
+
+from datetime import date, datetime
+
+VERSIONS_TABLE = 'oscs_versoes'
+HISTORY_TABLE = 'oscs_historico'
+
+COMPLETA = 'completa'
+INCREMENTAL = 'incremental'
+
+
+def create_history_tables(conn):
+    """Cria as tabelas de versões e do log de alterações, se ainda não existem"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+            versao INTEGER PRIMARY KEY,
+            carregado_em TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            origem TEXT,
+            inseridos INTEGER NOT NULL DEFAULT 0,
+            alterados INTEGER NOT NULL DEFAULT 0,
+            removidos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+            versao INTEGER NOT NULL,
+            id_osc INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            PRIMARY KEY (versao, id_osc)
+        ) WITHOUT ROWID
+    """)
+
+
+def record_version(conn, tipo, origem=None, inseridos=0, alterados=0, removidos=0, alteracoes=None):
+    """
+    Registra uma versão (sem commit) e retorna seu número. alteracoes é uma
+    consulta que retorna (id_osc, tipo) das OSCs afetadas, gravadas no log.
+    """
+    create_history_tables(conn)
+    if tipo == INCREMENTAL and not conn.execute(f"SELECT 1 FROM {VERSIONS_TABLE} LIMIT 1").fetchone():
+        # Primeira atualização de um banco sem histórico: o estado anterior vira a base
+        record_version(conn, COMPLETA, 'estado anterior à primeira atualização incremental')
+
+    cursor = conn.execute(
+        f"INSERT INTO {VERSIONS_TABLE} (carregado_em, tipo, origem, inseridos, alterados, removidos) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [datetime.now().isoformat(timespec='seconds'), tipo, origem, inseridos, alterados, removidos],
+    )
+    versao = cursor.lastrowid
+    if alteracoes:
+        conn.execute(f"INSERT INTO {HISTORY_TABLE} (versao, id_osc, tipo) SELECT ?, id_osc, tipo FROM ({alteracoes})", [versao])
+    return versao
+
+
+def has_history(conn):
+    """Indica se o histórico está disponível na conexão (tabela ou view temporária)"""
+    cursor = conn.execute(
+        "SELECT 1 FROM sqlite_temp_master WHERE type = 'view' AND name = ? "
+        "UNION ALL SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        [VERSIONS_TABLE, VERSIONS_TABLE],
+    )
+    return cursor.fetchone() is not None
+
+
+def load_versions(conn):
+    """Versões registradas, da mais recente para a mais antiga (vazia sem histórico)"""
+    if not has_history(conn):
+        return []
+    cursor = conn.execute(
+        f"SELECT versao, carregado_em, tipo, origem, inseridos, alterados, removidos "
+        f"FROM {VERSIONS_TABLE} ORDER BY versao DESC"
+    )
+    colunas = [descricao[0] for descricao in cursor.description]
+    return [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+
+def parse_since(valor):
+    """
+    Interpreta alterado_desde: número de versão (int) ou data ISO
+    (AAAA-MM-DD, retornada como texto). Levanta ValueError se inválido.
+    """
+    if valor in (None, ''):
+        return None
+    texto = str(valor).strip()
+    if texto.isdigit():
+        return int(texto)
+    try:
+        return date.fromisoformat(texto[:10]).isoformat() if len(texto) == 10 else datetime.fromisoformat(texto).isoformat()
+    except ValueError:
+        raise ValueError(f"alterado_desde deve ser um número de versão ou uma data AAAA-MM-DD: {valor}")
+
+
+def build_since_condition(filtros):
+    """Condição (subconsulta no log de alterações) e parâmetros do filtro alterado_desde"""
+    desde = filtros.get('alterado_desde')
+    if desde is None:
+        return [], []
+    if isinstance(desde, int):
+        versoes = "versao > ?"
+    else:
+        versoes = f"versao IN (SELECT versao FROM {VERSIONS_TABLE} WHERE carregado_em >= ?)"
+    return [
+        f"oscs.id_osc IN (SELECT id_osc FROM {HISTORY_TABLE} WHERE {versoes} AND tipo != 'removido')"
+    ], [desde]
+
+
+def check_since(conn, filtros):
+    """
+    Valida alterado_desde contra o histórico do banco: levanta ValueError
+    sem histórico ou quando o ponto pedido é anterior à última carga completa
+    """
+    desde = filtros.get('alterado_desde')
+    if desde is None:
+        return
+    if not has_history(conn):
+        raise ValueError("Filtro alterado_desde indisponível: o banco não tem histórico de versões")
+    base = conn.execute(
+        f"SELECT versao, carregado_em FROM {VERSIONS_TABLE} WHERE tipo = ? ORDER BY versao DESC LIMIT 1",
+        [COMPLETA],
+    ).fetchone()
+    if base is None:
+        return
+    versao_base, carregado_base = base
+    if (isinstance(desde, int) and desde < versao_base) or (isinstance(desde, str) and desde <= carregado_base):
+        raise ValueError(
+            f"O histórico de alterações começa na versão {versao_base} "
+            f"(carga completa em {carregado_base}); use uma versão ou data posterior"
+        )
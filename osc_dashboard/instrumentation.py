@@ -0,0 +1,232 @@
+"""
+Instrumentação de desempenho por requisição
+
+Uma conexão SQLite rastreada (usada por get_db_connection) registra número de
+consultas, tempo de SQL e linhas retornadas na requisição corrente; trechos
+como a serialização são medidos com measure(). O middleware de performance
+consolida essas métricas e alimenta os histogramas de latência por view,
+servidos em /metrics/ (só para staff ou com METRICS_TOKEN). As métricas são
+mantidas por worker.
+
+Em requisições perfiladas (ver profiling.py), cada consulta é registrada
+também com seus parâmetros, duração e plano (EXPLAIN QUERY PLAN).
+"""
+
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites superiores (ms) dos buckets dos histogramas de latência
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Métricas acumuladas durante uma requisição"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.rows = 0
+        self.timings = {}
+        # Lista de consultas (SQL, parâmetros, duração e plano) só em requisições perfiladas
+        self.queries = None
+
+    def add_timing(self, name, ms):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+
+def start_request():
+    """Inicia a coleta de métricas da requisição corrente"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def measure(name):
+    """Mede a duração de um trecho e a acumula na requisição corrente"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_timing(name, (time.perf_counter() - inicio) * 1000)
+
+
+def _query_plan(connection, sql, parameters):
+    """Plano da consulta (linhas do EXPLAIN QUERY PLAN), com um cursor não rastreado"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    try:
+        rows = sqlite3.Cursor(connection).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"erro: {e}"]
+    return [row[-1] for row in rows]
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor que contabiliza consultas, tempo de execução e linhas lidas"""
+
+    def execute(self, sql, parameters=()):
+        metrics = _current.get()
+        if metrics is None:
+            return super().execute(sql, parameters)
+        plano = _query_plan(self.connection, sql, parameters) if metrics.queries is not None else None
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            metrics.sql_count += 1
+            metrics.sql_ms += ms
+            if metrics.queries is not None:
+                metrics.queries.append({'sql': sql, 'parametros': parameters, 'ms': ms, 'plano': plano})
+
+    def executemany(self, sql, seq_of_parameters):
+        metrics = _current.get()
+        if metrics is None:
+            return super().executemany(sql, seq_of_parameters)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.sql_count += 1
+            metrics.sql_ms += (time.perf_counter() - inicio) * 1000
+
+    def _fetch(self, fetch, *args):
+        metrics = _current.get()
+        if metrics is None:
+            return fetch(*args)
+        # Com o SQLite, boa parte do trabalho da consulta acontece durante a leitura
+        inicio = time.perf_counter()
+        result = fetch(*args)
+        metrics.sql_ms += (time.perf_counter() - inicio) * 1000
+        return result
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        metrics = _current.get()
+        if metrics is not None and row is not None:
+            metrics.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(super().fetchmany, size or self.arraysize)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.rows += len(rows)
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.rows += 1
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de execute()) são rastreados"""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class LatencyHistograms:
+    """Histogramas cumulativos de latência por view"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, ms, sql_ms=0.0, sql_count=0, response_bytes=0):
+        with self._lock:
+            data = self._views.setdefault(view, {
+                'buckets': [0] * len(self.buckets),
+                'count': 0,
+                'sum_ms': 0.0,
+                'sql_ms': 0.0,
+                'sql_queries': 0,
+                'response_bytes': 0,
+            })
+            for i, limite in enumerate(self.buckets):
+                if ms <= limite:
+                    data['buckets'][i] += 1
+            data['count'] += 1
+            data['sum_ms'] += ms
+            data['sql_ms'] += sql_ms
+            data['sql_queries'] += sql_count
+            data['response_bytes'] += response_bytes or 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {**data, 'buckets': list(data['buckets'])}
+                for view, data in self._views.items()
+            }
+
+    def render_prometheus(self, extra_gauges=None):
+        """Exporta os histogramas no formato texto do Prometheus"""
+        worker = os.getpid()
+        linhas = [
+            '# HELP osc_request_duration_ms Tempo total da requisição por view (ms)',
+            '# TYPE osc_request_duration_ms histogram',
+        ]
+        snapshot = self.snapshot()
+        for view, data in sorted(snapshot.items()):
+            labels = f'view="{view}",worker="{worker}"'
+            for limite, total in zip(self.buckets, data['buckets']):
+                linhas.append(f'osc_request_duration_ms_bucket{{{labels},le="{limite}"}} {total}')
+            linhas.append(f'osc_request_duration_ms_bucket{{{labels},le="+Inf"}} {data["count"]}')
+            linhas.append(f'osc_request_duration_ms_sum{{{labels}}} {data["sum_ms"]:.3f}')
+            linhas.append(f'osc_request_duration_ms_count{{{labels}}} {data["count"]}')
+
+        for nome, campo, descricao in (
+            ('osc_sql_duration_ms_total', 'sql_ms', 'Tempo acumulado de SQL por view (ms)'),
+            ('osc_sql_queries_total', 'sql_queries', 'Consultas SQL executadas por view'),
+            ('osc_response_bytes_total', 'response_bytes', 'Bytes de resposta por view'),
+        ):
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} counter')
+            for view, data in sorted(snapshot.items()):
+                valor = data[campo]
+                valor = f'{valor:.3f}' if isinstance(valor, float) else valor
+                linhas.append(f'{nome}{{view="{view}",worker="{worker}"}} {valor}')
+
+        for nome, valor in (extra_gauges or {}).items():
+            if valor is None:
+                continue
+            linhas.append(f'# TYPE {nome} gauge')
+            linhas.append(f'{nome}{{worker="{worker}"}} {valor}')
+
+        return '\n'.join(linhas) + '\n'
+
+
+histograms = LatencyHistograms()
@@ -0,0 +1,241 @@
+"""
+Consulta em lote de OSCs por id ou por nome
+
+Parceiros enviam planilhas (CSV ou XLSX) com ids ou nomes de OSCs para
+completar com os dados de contato. As chaves da planilha vão para uma
+tabela temporária, juntada à tabela oscs em uma única consulta: pelo índice
+de id_osc, para ids, ou pelo índice de nomes normalizados (oscs_nomes: nome
+sem acentos, pontuação e diferença de maiúsculas -> id_osc), para nomes.
+A planilha volta com as colunas originais seguidas do número de
+correspondências e dos dados da OSC, uma linha por OSC encontrada; as linhas
+saem do cursor direto para a resposta, sem a lista completa em memória.
+
+O índice de nomes é criado na migração (ou por
+core/utils/criar_indice_nomes.py) e mantido pelas atualizações
+incrementais; em bancos sem ele, a consulta por nome é recusada.
+
+Células de texto que começam com = + - @ são neutralizadas na saída, para
+que o Excel não as execute como fórmulas: no CSV ganham um apóstrofo na
+frente e no XLSX as iniciadas por = são gravadas como texto. Números e
+telefones ('+55 41 3333-0002', '-5') só com dígitos e pontuação não chamam
+funções nem referenciam células e saem intactos.
+"""
+
+import csv
+import io
+import re
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from .exports import COLUNAS_EXPORT, COLUNAS_SQL
+from .search import NAME_TABLE, has_name_index, normalize_name
+
+MODO_ID = 'id'
+MODO_NOME = 'nome'
+
+# Cabeçalhos reconhecidos (normalizados, sem espaços) da coluna das chaves
+CABECALHOS = {
+    MODO_ID: ['idosc', 'id'],
+    MODO_NOME: ['nome', 'nomeosc', 'nomedaosc', 'razaosocial'],
+}
+FORMATOS = {'.csv': 'csv', '.xlsx': 'xlsx'}
+
+COLUNA_CORRESPONDENCIAS = 'Correspondências'
+# Linhas do CSV por bloco enviado na resposta
+LINHAS_POR_BLOCO = 1000
+# Primeiros caracteres que o Excel interpreta como início de fórmula
+INICIO_FORMULA = ('=', '+', '-', '@')
+
+_ID_PATTERN = re.compile(r'^\d+(\.0+)?$')
+# Números e telefones com sinal na frente, que não precisam de neutralização
+_NUMERO_PATTERN = re.compile(r'^[+-][\d\s().,/-]*$')
+
+
+def parse_id(valor):
+    """id_osc da célula (aceita '123' e '123.0' de planilhas) ou None"""
+    texto = str(valor).strip()
+    if not _ID_PATTERN.match(texto):
+        return None
+    return int(texto.split('.')[0])
+
+
+def read_upload(arquivo, max_linhas):
+    """
+    Lê a planilha enviada como texto e retorna (DataFrame, formato,
+    separador do CSV). Levanta ValueError para arquivos inválidos, vazios ou
+    com mais de max_linhas linhas.
+    """
+    formato = FORMATOS.get(Path(arquivo.name).suffix.lower())
+    if formato is None:
+        raise ValueError("Envie um arquivo .csv ou .xlsx")
+
+    separador = None
+    try:
+        if formato == 'xlsx':
+            df = pd.read_excel(arquivo, dtype=str, nrows=max_linhas + 1).fillna('')
+        else:
+            conteudo = arquivo.read()
+            try:
+                texto = conteudo.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                # CSV salvo pelo Excel em português
+                texto = conteudo.decode('latin-1')
+            primeira_linha = texto.split('\n', 1)[0]
+            separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+            df = pd.read_csv(io.StringIO(texto), sep=separador, dtype=str, keep_default_na=False, nrows=max_linhas + 1)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Não foi possível ler o arquivo: {e}")
+
+    if df.empty:
+        raise ValueError("O arquivo não tem linhas")
+    if len(df) > max_linhas:
+        raise ValueError(f"O arquivo passa do limite de {max_linhas} linhas")
+    df.columns = [str(coluna) for coluna in df.columns]
+    return df, formato, separador
+
+
+def choose_column(df, coluna=None, modo=None):
+    """
+    Retorna (coluna das chaves, modo). Sem coluna, usa a de cabeçalho
+    reconhecido (ids antes de nomes) ou a primeira; sem modo, usa ids quando
+    a maioria dos valores preenchidos são números (os demais ficam sem OSC).
+    """
+    if modo and modo not in CABECALHOS:
+        raise ValueError(f"modo deve ser '{MODO_ID}' ou '{MODO_NOME}'")
+    if coluna:
+        if coluna not in df.columns:
+            raise ValueError(f"Coluna não encontrada no arquivo: {coluna}")
+    else:
+        cabecalhos = {}
+        for nome in df.columns:
+            cabecalhos.setdefault(normalize_name(nome).replace(' ', ''), nome)
+        reconhecidos = [
+            cabecalhos[cabecalho]
+            for tipo in ([modo] if modo else [MODO_ID, MODO_NOME])
+            for cabecalho in CABECALHOS[tipo] if cabecalho in cabecalhos
+        ]
+        coluna = reconhecidos[0] if reconhecidos else df.columns[0]
+
+    if not modo:
+        valores = [valor for valor in df[coluna] if str(valor).strip()]
+        numeros = sum(parse_id(valor) is not None for valor in valores)
+        modo = MODO_ID if numeros * 2 > len(valores) else MODO_NOME
+    return coluna, modo
+
+
+def lookup(conn, chaves, modo):
+    """
+    Junta as chaves (uma por linha da planilha) às OSCs e retorna (linhas da
+    planilha com alguma OSC, cursor). O cursor traz (linha, correspondências,
+    colunas de COLUNAS_SQL) na ordem da planilha; chaves sem OSC aparecem com
+    0 correspondências e colunas vazias. A conexão deve ficar aberta até o
+    cursor ser percorrido (iter_rows a fecha no fim).
+    """
+    if modo == MODO_ID:
+        valores = (parse_id(chave) for chave in chaves)
+        juncao = "LEFT JOIN oscs ON oscs.id_osc = lote.chave"
+    else:
+        if not has_name_index(conn):
+            raise ValueError(
+                "Consulta por nome indisponível: o banco não tem o índice de nomes "
+                "(crie com core/utils/criar_indice_nomes.py)"
+            )
+        valores = (normalize_name(chave) or None for chave in chaves)
+        juncao = (
+            f"LEFT JOIN {NAME_TABLE} nomes ON nomes.nome = lote.chave "
+            "LEFT JOIN oscs ON oscs.id_osc = nomes.id_osc"
+        )
+
+    conn.execute("DROP TABLE IF EXISTS temp.lote_chaves")
+    conn.execute("CREATE TEMP TABLE lote_chaves (linha INTEGER PRIMARY KEY, chave)")
+    conn.executemany("INSERT INTO temp.lote_chaves (linha, chave) VALUES (?, ?)", enumerate(valores))
+    encontradas = conn.execute(f"""
+        SELECT COUNT(DISTINCT lote.linha)
+        FROM temp.lote_chaves lote {juncao}
+        WHERE oscs.id_osc IS NOT NULL
+    """).fetchone()[0]
+    cursor = conn.execute(f"""
+        SELECT lote.linha, COUNT(oscs.id_osc) OVER (PARTITION BY lote.linha), {COLUNAS_SQL}
+        FROM temp.lote_chaves lote {juncao}
+        ORDER BY lote.linha, oscs.id_osc
+    """)
+    return encontradas, cursor
+
+
+def iter_rows(conn, cursor):
+    """Percorre o cursor de lookup e fecha a conexão ao terminar (ou se a resposta for abandonada)"""
+    try:
+        yield from cursor
+    finally:
+        conn.close()
+
+
+def enriched_header(df):
+    """Cabeçalho da planilha de saída (colunas repetidas ganham o sufixo '(OSC)')"""
+    colunas_osc = [coluna if coluna not in df.columns else f'{coluna} (OSC)' for coluna in COLUNAS_EXPORT]
+    return list(df.columns) + [COLUNA_CORRESPONDENCIAS] + colunas_osc
+
+
+def enriched_rows(df, resultados):
+    """Linhas de saída: a linha original, as correspondências e os dados da OSC"""
+    entrada = df.values.tolist()
+    for linha, correspondencias, *osc in resultados:
+        yield entrada[linha] + [correspondencias] + ['' if valor is None else valor for valor in osc]
+
+
+class _Eco:
+    """Arquivo falso que devolve o que o csv.writer escreve"""
+
+    def write(self, valor):
+        return valor
+
+
+def neutralize_formula(valor):
+    """Texto que o Excel leria como fórmula ganha um apóstrofo na frente (números e telefones não)"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA) and not _NUMERO_PATTERN.match(valor):
+        return "'" + valor
+    return valor
+
+
+def stream_csv(cabecalho, linhas, separador):
+    """Gera o CSV em blocos (com BOM, para o Excel reconhecer o UTF-8)"""
+    escritor = csv.writer(_Eco(), delimiter=separador)
+    yield '\ufeff' + escritor.writerow([neutralize_formula(valor) for valor in cabecalho])
+    bloco = []
+    for linha in linhas:
+        bloco.append(escritor.writerow([neutralize_formula(valor) for valor in linha]))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def _xlsx_row(worksheet, linha):
+    """Células da linha, com texto iniciado por = gravado como texto (o openpyxl o gravaria como fórmula)"""
+    celulas = []
+    for valor in linha:
+        celula = WriteOnlyCell(worksheet, valor)
+        if isinstance(valor, str) and valor.startswith('='):
+            celula.data_type = 's'
+        celulas.append(celula)
+    return celulas
+
+
+def write_xlsx(cabecalho, linhas, sheet_name='OSCs'):
+    """Grava a planilha (openpyxl em modo write_only) em um arquivo temporário, já no início"""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append(_xlsx_row(worksheet, cabecalho))
+    for linha in linhas:
+        worksheet.append(_xlsx_row(worksheet, linha))
+    arquivo = tempfile.TemporaryFile()
+    workbook.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
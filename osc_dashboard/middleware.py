@@ -0,0 +1,156 @@
+"""
+Middlewares do dashboard
+"""
+
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .instrumentation import current_metrics, end_request, histograms, start_request
+
+logger = logging.getLogger('osc_dashboard.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Mede cada requisição (tempo total, SQL, linhas, serialização e bytes de
+    resposta), devolve os tempos no cabeçalho Server-Timing, registra um log
+    estruturado em JSON e alimenta os histogramas de latência por view.
+    Funciona tanto no modo WSGI quanto no ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics, inicio)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics, inicio)
+
+    def finish(self, request, response, metrics, inicio):
+        """Registra as métricas da requisição e adiciona o cabeçalho Server-Timing"""
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'nao_resolvida'
+        response_bytes = None if response.streaming else len(response.content)
+
+        server_timing = [
+            f'total;dur={total_ms:.1f}',
+            f'sql;dur={metrics.sql_ms:.1f};desc="{metrics.sql_count} consultas, {metrics.rows} linhas"',
+        ]
+        server_timing.extend(f'{nome};dur={ms:.1f}' for nome, ms in metrics.timings.items())
+        response['Server-Timing'] = ', '.join(server_timing)
+
+        histograms.observe(view, total_ms, metrics.sql_ms, metrics.sql_count, response_bytes)
+
+        logger.info(json.dumps({
+            'evento': 'requisicao',
+            'metodo': request.method,
+            'caminho': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'sql_consultas': metrics.sql_count,
+            'sql_ms': round(metrics.sql_ms, 2),
+            'linhas': metrics.rows,
+            'tempos_ms': {nome: round(ms, 2) for nome, ms in metrics.timings.items()},
+            'bytes': response_bytes,
+        }, ensure_ascii=False))
+
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Perfila sob demanda as requisições de staff ou com token assinado (ver
+    profiling.py) e grava o relatório com o cProfile e os planos das
+    consultas. Só é carregado com PROFILING_ENABLED; no modo ASGI o cProfile
+    não acompanha as views assíncronas, mas as consultas são registradas.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from . import profiling
+
+        if not profiling.wants_profile(request):
+            return self.get_response(request)
+
+        # Sem o middleware de performance, as métricas da requisição são iniciadas aqui
+        metrics = current_metrics()
+        token = None
+        if metrics is None:
+            metrics, token = start_request()
+        inicio = time.perf_counter()
+        try:
+            response, profiler = profiling.run_profiled(self.get_response, request, metrics)
+            total_ms = (time.perf_counter() - inicio) * 1000
+            relatorio_id = profiling.save_report(request, response, total_ms, profiler, metrics)
+        finally:
+            metrics.queries = None
+            if token is not None:
+                end_request(token)
+        response['X-Perfil-Relatorio'] = reverse('osc_dashboard:profile_report', args=[relatorio_id])
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise com suporte ao modo ASGI: arquivos estáticos continuam servidos
+    pelo WhiteNoise, e as demais requisições seguem assíncronas, sem que o
+    Django precise rodar a cadeia de middlewares em uma thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,157 @@
+"""
+Bancos particionados por estado (UF) e roteamento das consultas
+
+Cada UF tem seu próprio arquivo SQLite com a mesma tabela oscs. O estado
+padrão usa OSC_DB_PATH; os demais ficam em OSC_ESTADOS_DIR como
+oscs_<UF>.db. Uma consulta de um único estado abre só o arquivo dele, sem
+custo extra. Consultas entre estados anexam (ATTACH) apenas os arquivos
+pedidos e criam views temporárias "oscs", "oscs_trigramas", "oscs_nomes",
+"municipios_regioes" e as do histórico de versões com UNION ALL, de modo que
+o SQL existente funciona sem alterações.
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache import db_version
+from .history import HISTORY_TABLE, VERSIONS_TABLE
+from .regions import REGIONS_TABLE
+from .search import NAME_TABLE, TRIGRAM_TABLE, WORDS_TABLE
+from .versions import active_db_path
+
+COLUMNS = (
+    'id_osc, nome, email, endereco, telefone, natureza_juridica, '
+    'situacao_cadastral, edmu_cd_municipio, edmu_nm_municipio'
+)
+
+_UF_PATTERN = re.compile(r'^[A-Z]{2}$')
+_ARQUIVO_PATTERN = re.compile(r'^oscs_([A-Za-z]{2})\.db$')
+
+
+def default_state():
+    """UF servida quando a requisição não escolhe estados"""
+    return settings.OSC_UF_PADRAO.upper()
+
+
+def state_databases():
+    """Retorna {UF: caminho do banco} para todos os estados disponíveis"""
+    # O estado padrão usa a versão publicada ativa do worker (ou OSC_DB_PATH)
+    bancos = {default_state(): active_db_path()}
+    diretorio = Path(settings.OSC_ESTADOS_DIR)
+    if diretorio.is_dir():
+        for arquivo in sorted(diretorio.glob('oscs_*.db')):
+            match = _ARQUIVO_PATTERN.match(arquivo.name)
+            if match:
+                bancos.setdefault(match.group(1).upper(), arquivo)
+    return bancos
+
+
+def state_db_path(uf):
+    """Caminho do arquivo de uma UF (existente ou a ser criado pela migração)"""
+    uf = uf.upper()
+    if uf == default_state():
+        return Path(settings.OSC_DB_PATH)
+    return Path(settings.OSC_ESTADOS_DIR) / f'oscs_{uf}.db'
+
+
+def resolve_states(estados):
+    """
+    Normaliza a lista de UFs pedida (vazia = estado padrão), sem repetição e
+    em ordem alfabética. Levanta ValueError para UFs sem banco.
+    """
+    if not estados:
+        return [default_state()]
+    bancos = state_databases()
+    ufs = sorted({uf.upper() for uf in estados})
+    desconhecidas = [uf for uf in ufs if uf not in bancos]
+    if desconhecidas:
+        raise ValueError(f"Estado(s) sem banco de dados: {', '.join(desconhecidas)}")
+    return ufs
+
+
+def states_version(ufs=None):
+    """Versão combinada dos arquivos dos estados informados (padrão: todos)"""
+    bancos = state_databases()
+    return '|'.join(f"{uf}:{db_version(bancos[uf])}" for uf in sorted(ufs or bancos))
+
+
+def connect_states(ufs, factory=sqlite3.Connection):
+    """
+    Abre a conexão para as UFs pedidas
+
+    Com uma UF retorna a conexão direta ao arquivo. Com várias, abre a
+    primeira, anexa as demais e cria as views temporárias de união.
+    """
+    bancos = state_databases()
+    conn = sqlite3.connect(bancos[ufs[0]], factory=factory)
+    if len(ufs) == 1:
+        return conn
+
+    try:
+        schemas = ['main']
+        for uf in ufs[1:]:
+            if not _UF_PATTERN.match(uf):
+                raise ValueError(f"UF inválida: {uf}")
+            schema = f'uf_{uf.lower()}'
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", [str(bancos[uf])])
+            schemas.append(schema)
+
+        conn.execute(
+            "CREATE TEMP VIEW oscs AS "
+            + " UNION ALL ".join(f"SELECT {COLUMNS} FROM {schema}.oscs" for schema in schemas)
+        )
+
+        # A busca aproximada só vale entre estados se todos tiverem o índice
+        # (UNION no vocabulário, para uma palavra comum a vários estados contar uma vez)
+        if all(_has_table(conn, schema, tabela) for schema in schemas for tabela in (TRIGRAM_TABLE, WORDS_TABLE)):
+            conn.execute(
+                f"CREATE TEMP VIEW {TRIGRAM_TABLE} AS "
+                + " UNION ".join(f"SELECT trigrama, palavra, total FROM {schema}.{TRIGRAM_TABLE}" for schema in schemas)
+            )
+            conn.execute(
+                f"CREATE TEMP VIEW {WORDS_TABLE} AS "
+                + " UNION ALL ".join(f"SELECT palavra, id_osc FROM {schema}.{WORDS_TABLE}" for schema in schemas)
+            )
+
+        # Idem para o índice de nomes da consulta em lote
+        if all(_has_table(conn, schema, NAME_TABLE) for schema in schemas):
+            conn.execute(
+                f"CREATE TEMP VIEW {NAME_TABLE} AS "
+                + " UNION ALL ".join(f"SELECT nome, id_osc FROM {schema}.{NAME_TABLE}" for schema in schemas)
+            )
+
+        # Mapeamento de bacias/regiões dos estados que o têm
+        com_regioes = [schema for schema in schemas if _has_table(conn, schema, REGIONS_TABLE)]
+        if com_regioes:
+            conn.execute(
+                f"CREATE TEMP VIEW {REGIONS_TABLE} AS "
+                + " UNION ALL ".join(
+                    f"SELECT edmu_nm_municipio, regiao, bacia FROM {schema}.{REGIONS_TABLE}" for schema in com_regioes
+                )
+            )
+
+        # Histórico de versões: só vale entre estados se todos o tiverem
+        if all(_has_table(conn, schema, VERSIONS_TABLE) for schema in schemas):
+            for tabela in (VERSIONS_TABLE, HISTORY_TABLE):
+                conn.execute(
+                    f"CREATE TEMP VIEW {tabela} AS "
+                    + " UNION ALL ".join(f"SELECT * FROM {schema}.{tabela}" for schema in schemas)
+                )
+    except sqlite3.OperationalError as e:
+        conn.close()
+        # Ex.: "too many attached databases" (limite do SQLite, 10 por padrão)
+        raise ValueError(f"Não foi possível consultar {len(ufs)} estados juntos: {e}")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _has_table(conn, schema, table):
+    cursor = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", [table]
+    )
+    return cursor.fetchone() is not None
@@ -0,0 +1,177 @@
+"""
+Perfilamento sob demanda de requisições
+
+Com PROFILING_ENABLED, o ProfilingMiddleware perfila as requisições pedidas
+por um membro da equipe (sessão de staff com o cabeçalho X-Perfil: 1 ou o
+parâmetro ?perfil=1) ou por quem enviar no cabeçalho X-Perfil um token
+assinado (core/utils/token_perfil.py). A view roda sob o cProfile e cada
+consulta feita pela conexão rastreada de get_db_connection é registrada com
+seus parâmetros, duração e EXPLAIN QUERY PLAN.
+
+O relatório é gravado como JSON em PROFILING_DIR (os PROFILING_MANTER mais
+recentes) e servido em /perfis/<id>/, só para staff. A resposta perfilada
+indica o relatório no cabeçalho X-Perfil-Relatorio.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.http.request import RawPostDataException
+
+CABECALHO = 'HTTP_X_PERFIL'
+SALT = 'osc_dashboard.perfil'
+
+# Validade (s) dos tokens assinados
+VALIDADE_TOKEN = 24 * 3600
+# Funções listadas no relatório do cProfile (ordenadas por tempo acumulado)
+FUNCOES_RELATORIO = 60
+# Tamanho máximo do texto de parâmetros e do corpo da requisição no relatório
+MAX_TEXTO = 2000
+
+_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def create_token():
+    """Token assinado (com data) que habilita o perfilamento pelo cabeçalho X-Perfil"""
+    return signing.TimestampSigner(salt=SALT).sign('perfil')
+
+
+def valid_token(token):
+    try:
+        return signing.TimestampSigner(salt=SALT).unsign(token, max_age=VALIDADE_TOKEN) == 'perfil'
+    except signing.BadSignature:
+        return False
+
+
+def wants_profile(request):
+    """Indica se a requisição deve ser perfilada (token assinado ou staff que pediu)"""
+    valor = request.META.get(CABECALHO, '')
+    if valor and valor != '1' and valid_token(valor):
+        return True
+    pediu = valor == '1' or request.GET.get('perfil') == '1'
+    user = getattr(request, 'user', None)
+    return pediu and user is not None and user.is_staff
+
+
+def reports_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def report_path(relatorio_id):
+    return reports_dir() / f'{relatorio_id}.json'
+
+
+def _texto(valor):
+    texto = valor if isinstance(valor, str) else repr(valor)
+    return texto if len(texto) <= MAX_TEXTO else f'{texto[:MAX_TEXTO]}... ({len(texto)} caracteres)'
+
+
+def _request_body(request):
+    try:
+        return _texto(request.body.decode('utf-8', errors='replace'))
+    except RawPostDataException:
+        # Corpo já consumido como stream pela view (ex.: upload)
+        return ''
+
+
+def profile_stats(profiler):
+    """Relatório textual do cProfile, ordenado por tempo acumulado"""
+    saida = io.StringIO()
+    pstats.Stats(profiler, stream=saida).sort_stats('cumulative').print_stats(FUNCOES_RELATORIO)
+    return saida.getvalue()
+
+
+def save_report(request, response, total_ms, profiler, metrics):
+    """Grava o relatório da requisição perfilada e retorna seu id"""
+    relatorio_id = uuid.uuid4().hex
+    relatorio = {
+        'id': relatorio_id,
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'metodo': request.method,
+        'caminho': request.get_full_path(),
+        'corpo': _request_body(request),
+        'status': response.status_code,
+        'total_ms': round(total_ms, 2),
+        'sql_consultas': metrics.sql_count,
+        'sql_ms': round(metrics.sql_ms, 2),
+        'linhas': metrics.rows,
+        'tempos_ms': {nome: round(ms, 2) for nome, ms in metrics.timings.items()},
+        'consultas': [
+            {
+                'sql': consulta['sql'].strip(),
+                'parametros': _texto(consulta['parametros']),
+                'ms': round(consulta['ms'], 2),
+                'plano': consulta['plano'],
+            }
+            for consulta in metrics.queries
+        ],
+        'perfil': profile_stats(profiler),
+    }
+
+    diretorio = reports_dir()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    destino = report_path(relatorio_id)
+    temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+    temporario.write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(temporario, destino)
+    prune_reports()
+    return relatorio_id
+
+
+def list_reports():
+    """Resumo dos relatórios gravados, do mais recente para o mais antigo"""
+    diretorio = reports_dir()
+    if not diretorio.is_dir():
+        return []
+    relatorios = []
+    for caminho in sorted(diretorio.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            dados = json.loads(caminho.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        relatorios.append({
+            chave: dados[chave]
+            for chave in ('id', 'criado_em', 'metodo', 'caminho', 'status', 'total_ms', 'sql_consultas', 'sql_ms')
+        })
+    return relatorios
+
+
+def read_report(relatorio_id):
+    """Relatório completo (None se não existe)"""
+    if not _ID_PATTERN.match(relatorio_id):
+        return None
+    try:
+        return json.loads(report_path(relatorio_id).read_text(encoding='utf-8'))
+    except OSError:
+        return None
+
+
+def prune_reports():
+    """Mantém só os PROFILING_MANTER relatórios mais recentes"""
+    caminhos = sorted(reports_dir().glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for caminho in caminhos[settings.PROFILING_MANTER:]:
+        try:
+            caminho.unlink()
+        except OSError:
+            pass
+
+
+def run_profiled(get_response, request, metrics):
+    """Executa a view sob o cProfile, com o registro das consultas ativo"""
+    metrics.queries = []
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    return response, profiler
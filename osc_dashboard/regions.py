@@ -0,0 +1,111 @@
+"""
+Mapeamento município -> mesorregião e bacia hidrográfica
+
+A migração carrega um CSV (colunas municipio, regiao, bacia) na tabela
+municipios_regioes, indexada por região e por bacia. Um município que
+atravessa várias bacias aparece em uma linha por bacia. Os filtros de bacia
+e região viram uma subconsulta indexada sobre essa tabela, combinada com o
+índice de município da tabela oscs, em vez de uma lista de municípios com
+dezenas de termos OR.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+REGIONS_TABLE = 'municipios_regioes'
+
+# Filtros de região: chave em parse_filters -> (campo do payload, coluna do mapeamento)
+REGION_FILTERS = {
+    'bacias': ('bacia', 'bacia'),
+    'regioes': ('regiao', 'regiao'),
+}
+
+# CSV padrão de cada estado
+REGIONS_CSV = 'data/municipios_regioes_{uf}.csv'
+
+
+def read_regions_csv(csv_path):
+    """Lê o CSV do mapeamento (colunas municipio, regiao, bacia)"""
+    df = pd.read_csv(csv_path, encoding='utf-8', dtype=str)
+    faltando = {'municipio', 'regiao', 'bacia'} - set(df.columns)
+    if faltando:
+        raise ValueError(f"Coluna(s) ausente(s) em {csv_path}: {', '.join(sorted(faltando))}")
+    return df
+
+
+def create_regions_table(conn, mapeamento):
+    """
+    Grava o mapeamento (DataFrame com colunas municipio, regiao, bacia) na
+    tabela municipios_regioes e retorna o número de linhas
+    """
+    df = mapeamento[['municipio', 'regiao', 'bacia']].astype('string').apply(lambda coluna: coluna.str.strip())
+    df = df.dropna(subset=['municipio']).drop_duplicates().astype(object)
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {REGIONS_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {REGIONS_TABLE} (
+            edmu_nm_municipio TEXT NOT NULL,
+            regiao TEXT,
+            bacia TEXT
+        )
+    """)
+    cursor.executemany(
+        f"INSERT INTO {REGIONS_TABLE} (edmu_nm_municipio, regiao, bacia) VALUES (?, ?, ?)",
+        df.where(df.notna(), None).itertuples(index=False, name=None),
+    )
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_regioes_regiao ON {REGIONS_TABLE}(regiao, edmu_nm_municipio)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_regioes_bacia ON {REGIONS_TABLE}(bacia, edmu_nm_municipio)")
+    conn.commit()
+    return len(df)
+
+
+def default_regions_csv(uf):
+    """CSV de mapeamento padrão da UF, se existir"""
+    caminho = Path(REGIONS_CSV.format(uf=uf.upper()))
+    return caminho if caminho.exists() else None
+
+
+def has_regions_table(conn):
+    """Indica se o mapeamento está disponível na conexão (tabela ou view temporária)"""
+    cursor = conn.execute(
+        "SELECT 1 FROM sqlite_temp_master WHERE type = 'view' AND name = ? "
+        "UNION ALL SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        [REGIONS_TABLE, REGIONS_TABLE],
+    )
+    return cursor.fetchone() is not None
+
+
+def region_options(conn):
+    """Listas de regiões e bacias do mapeamento (vazias sem a tabela)"""
+    if not has_regions_table(conn):
+        return {'regioes': [], 'bacias': []}
+    return {
+        chave: [v for (v,) in conn.execute(
+            f"SELECT DISTINCT {coluna} FROM {REGIONS_TABLE} WHERE {coluna} IS NOT NULL AND {coluna} != '' "
+            f"ORDER BY {coluna}"
+        )]
+        for chave, (_, coluna) in REGION_FILTERS.items()
+    }
+
+
+def build_region_conditions(filtros):
+    """Condições (subconsultas indexadas no mapeamento) e parâmetros dos filtros de região"""
+    conditions = []
+    params = []
+    for chave, (_, coluna) in REGION_FILTERS.items():
+        valores = filtros.get(chave)
+        if valores:
+            placeholders = ','.join('?' for _ in valores)
+            conditions.append(
+                f"oscs.edmu_nm_municipio IN (SELECT edmu_nm_municipio FROM {REGIONS_TABLE} "
+                f"WHERE {coluna} IN ({placeholders}))"
+            )
+            params.extend(valores)
+    return conditions, params
+
+
+def uses_regions(filtros):
+    """Indica se os filtros pedem bacia ou região"""
+    return any(filtros.get(chave) for chave in REGION_FILTERS)
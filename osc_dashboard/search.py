@@ -0,0 +1,304 @@
+"""
+Busca aproximada por palavras-chave usando um índice de trigramas
+
+O índice, gerado na migração, tem duas tabelas: os postings das palavras dos
+nomes (oscs_palavras: palavra normalizada -> id_osc) e os trigramas do
+vocabulário (oscs_trigramas: trigrama -> palavra, com o total de trigramas
+da palavra). A similaridade de uma palavra-chave com uma palavra do
+vocabulário é a do pg_trgm: trigramas em comum sobre a união dos trigramas
+das duas, o que tolera erros de digitação e variações de acentuação ("agua",
+"água", "ambeintal"). Uma OSC entra no resultado quando todas as
+palavras-chave têm uma palavra semelhante no nome; a relevância é a média
+da melhor similaridade de cada palavra-chave.
+
+As palavras candidatas vêm só dos trigramas mais raros de cada palavra-chave
+(filtro de prefixo): uma palavra com a similaridade mínima compartilha ao
+menos um deles, então os trigramas comuns ("ao ", "cao") não geram
+candidatas e a contagem exata é feita só para as candidatas.
+
+O índice de nomes (oscs_nomes: nome normalizado -> id_osc) atende à busca
+exata ignorando acentos e pontuação, usada na consulta em lote por nome.
+"""
+
+import math
+import unicodedata
+
+TRIGRAM_TABLE = 'oscs_trigramas'
+WORDS_TABLE = 'oscs_palavras'
+NAME_TABLE = 'oscs_nomes'
+
+
+def normalize_text(text):
+    """Remove acentos e converte para minúsculas"""
+    return unicodedata.normalize('NFKD', str(text)).encode('ASCII', 'ignore').decode('ASCII').lower()
+
+
+def split_words(text):
+    """Palavras do texto normalizado, sem pontuação"""
+    palavras = (''.join(ch for ch in palavra if ch.isalnum()) for palavra in normalize_text(text).split())
+    return [palavra for palavra in palavras if palavra]
+
+
+def word_trigrams(word):
+    """
+    Trigramas de uma palavra normalizada, com um espaço de cada lado: o
+    início e o fim da palavra contam, mas sem o trigrama de dois espaços do
+    pg_trgm, que só repete a primeira letra
+    """
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _vocabulary_trigrams(palavras):
+    for palavra in palavras:
+        trigramas = word_trigrams(palavra)
+        for trigrama in trigramas:
+            yield trigrama, palavra, len(trigramas)
+
+
+def create_trigram_index(conn):
+    """(Re)cria as tabelas de palavras e de trigramas a partir da coluna nome da tabela oscs"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}")
+    cursor.execute(f"DROP TABLE IF EXISTS {WORDS_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {WORDS_TABLE} (
+            palavra TEXT NOT NULL,
+            id_osc INTEGER NOT NULL,
+            PRIMARY KEY (palavra, id_osc)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        CREATE TABLE {TRIGRAM_TABLE} (
+            trigrama TEXT NOT NULL,
+            palavra TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (trigrama, palavra)
+        ) WITHOUT ROWID
+    """)
+
+    vocabulario = set()
+
+    def postings():
+        for id_osc, nome in conn.execute("SELECT id_osc, nome FROM oscs WHERE nome IS NOT NULL"):
+            for palavra in set(split_words(nome)):
+                vocabulario.add(palavra)
+                yield palavra, id_osc
+
+    cursor.executemany(f"INSERT OR IGNORE INTO {WORDS_TABLE} (palavra, id_osc) VALUES (?, ?)", postings())
+    cursor.executemany(
+        f"INSERT INTO {TRIGRAM_TABLE} (trigrama, palavra, total) VALUES (?, ?, ?)",
+        _vocabulary_trigrams(sorted(vocabulario)),
+    )
+    conn.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {TRIGRAM_TABLE}")
+    return cursor.fetchone()[0]
+
+
+def update_trigram_index(conn, nomes_antigos, ids):
+    """
+    Atualiza os postings das OSCs alteradas e o vocabulário, sem recriar o
+    índice e sem commit (faz parte da transação de quem chama)
+
+    nomes_antigos são os pares (id_osc, nome) anteriores à alteração; ids
+    são as OSCs afetadas, cujos nomes atuais são reindexados.
+    """
+    cursor = conn.cursor()
+    antigas = {
+        (palavra, id_osc) for id_osc, nome in nomes_antigos if nome is not None
+        for palavra in split_words(nome)
+    }
+    cursor.executemany(f"DELETE FROM {WORDS_TABLE} WHERE palavra = ? AND id_osc = ?", antigas)
+
+    novas = set()
+    ids = list(ids)
+    for inicio in range(0, len(ids), 500):
+        lote = ids[inicio:inicio + 500]
+        linhas = conn.execute(
+            f"SELECT id_osc, nome FROM oscs WHERE nome IS NOT NULL AND id_osc IN ({','.join('?' for _ in lote)})",
+            lote,
+        ).fetchall()
+        postings = {(palavra, id_osc) for id_osc, nome in linhas for palavra in split_words(nome)}
+        cursor.executemany(f"INSERT OR IGNORE INTO {WORDS_TABLE} (palavra, id_osc) VALUES (?, ?)", postings)
+        novas.update(palavra for palavra, _ in postings)
+
+    # Palavras novas entram no vocabulário; as que ficaram sem OSC saem
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO {TRIGRAM_TABLE} (trigrama, palavra, total) VALUES (?, ?, ?)",
+        _vocabulary_trigrams(sorted(novas)),
+    )
+    orfas = [
+        palavra for palavra in sorted({palavra for palavra, _ in antigas} - novas)
+        if conn.execute(f"SELECT 1 FROM {WORDS_TABLE} WHERE palavra = ? LIMIT 1", [palavra]).fetchone() is None
+    ]
+    cursor.executemany(
+        f"DELETE FROM {TRIGRAM_TABLE} WHERE trigrama = ? AND palavra = ?",
+        ((trigrama, palavra) for trigrama, palavra, _ in _vocabulary_trigrams(orfas)),
+    )
+
+
+def has_trigram_index(conn):
+    """
+    Verifica se o banco possui as tabelas de palavras e de trigramas (bancos
+    com o índice antigo, só de trigramas, usam a busca exata). Em consultas
+    entre estados (view temporária "oscs"), exige as views de união.
+    """
+    temporarias = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_temp_master WHERE type = 'view'")
+    }
+    if 'oscs' in temporarias:
+        return {TRIGRAM_TABLE, WORDS_TABLE} <= temporarias
+    cursor = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)", [TRIGRAM_TABLE, WORDS_TABLE]
+    )
+    return cursor.fetchone()[0] == 2
+
+
+def candidate_trigrams(conn, consulta, similaridade_minima):
+    """
+    Trigramas de cada palavra-chave usados para gerar as candidatas: os
+    total - m + 1 mais raros no vocabulário, sendo m = ceil(similaridade
+    mínima * total) o mínimo de trigramas em comum de uma palavra semelhante
+    """
+    todos = sorted(set().union(*consulta.values()))
+    frequencias = dict(conn.execute(
+        f"SELECT trigrama, COUNT(*) FROM {TRIGRAM_TABLE} WHERE trigrama IN ({','.join('?' for _ in todos)}) "
+        "GROUP BY trigrama",
+        todos,
+    ).fetchall())
+    prefixos = {}
+    for palavra, trigramas in consulta.items():
+        minimo = max(1, math.ceil(similaridade_minima * len(trigramas) - 1e-9))
+        raros = sorted(trigramas, key=lambda trigrama: (frequencias.get(trigrama, 0), trigrama))
+        prefixos[palavra] = raros[:len(trigramas) - minimo + 1]
+    return prefixos
+
+
+def build_relevance_cte(conn, keywords, similaridade_minima):
+    """
+    Monta as CTEs que calculam a relevância de cada OSC para as palavras-chave.
+
+    Retorna (sql, params) com uma CTE final chamada "relevancia" contendo
+    (id_osc, relevancia), já restrita às OSCs em que todas as palavras-chave
+    atingem a similaridade mínima com alguma palavra do nome. A relevância é
+    a média da melhor similaridade de cada palavra-chave, entre 0 e 1.
+    """
+    palavras = list(dict.fromkeys(palavra for keyword in keywords for palavra in split_words(keyword)))
+    if not palavras:
+        return None, []
+
+    consulta = {palavra: word_trigrams(palavra) for palavra in palavras}
+    prefixos = candidate_trigrams(conn, consulta, similaridade_minima)
+
+    values = []
+    params = []
+    for palavra, trigramas in consulta.items():
+        for trigrama in sorted(trigramas):
+            values.append('(?, ?, ?)')
+            params.extend([palavra, trigrama, len(trigramas)])
+    values_prefixo = []
+    for palavra, trigramas in prefixos.items():
+        for trigrama in trigramas:
+            values_prefixo.append('(?, ?)')
+            params.extend([palavra, trigrama])
+
+    sql = f"""
+        consulta(palavra, trigrama, total) AS (VALUES {', '.join(values)}),
+        prefixo(palavra, trigrama) AS (VALUES {', '.join(values_prefixo)}),
+        candidatas AS (
+            SELECT DISTINCT p.palavra AS chave, t.palavra
+            FROM prefixo p
+            JOIN {TRIGRAM_TABLE} t ON t.trigrama = p.trigrama
+        ),
+        semelhantes AS (
+            SELECT k.chave, k.palavra,
+                   COUNT(*) * 1.0 / (MAX(c.total) + MAX(t.total) - COUNT(*)) AS valor
+            FROM candidatas k
+            JOIN consulta c ON c.palavra = k.chave
+            JOIN {TRIGRAM_TABLE} t ON t.trigrama = c.trigrama AND t.palavra = k.palavra
+            GROUP BY k.chave, k.palavra
+            HAVING valor >= ?
+        ),
+        similaridade AS (
+            SELECT w.id_osc, s.chave, MAX(s.valor) AS valor
+            FROM semelhantes s
+            JOIN {WORDS_TABLE} w ON w.palavra = s.palavra
+            GROUP BY w.id_osc, s.chave
+        ),
+        relevancia AS (
+            SELECT id_osc, ROUND(SUM(valor) / ?, 4) AS relevancia
+            FROM similaridade
+            GROUP BY id_osc
+            HAVING COUNT(*) = ?
+        )
+    """
+    params.extend([similaridade_minima, len(palavras), len(palavras)])
+    return sql, params
+
+
+def normalize_name(text):
+    """Nome sem acentos, pontuação e maiúsculas, com espaços simples"""
+    return ' '.join(split_words(text))
+
+
+def _name_postings(linhas):
+    for id_osc, nome in linhas:
+        chave = normalize_name(nome)
+        if chave:
+            yield chave, id_osc
+
+
+def create_name_index(conn):
+    """(Re)cria o índice de nomes normalizados a partir da tabela oscs"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {NAME_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {NAME_TABLE} (
+            nome TEXT NOT NULL,
+            id_osc INTEGER NOT NULL,
+            PRIMARY KEY (nome, id_osc)
+        ) WITHOUT ROWID
+    """)
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO {NAME_TABLE} (nome, id_osc) VALUES (?, ?)",
+        _name_postings(conn.execute("SELECT id_osc, nome FROM oscs WHERE nome IS NOT NULL")),
+    )
+    conn.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {NAME_TABLE}")
+    return cursor.fetchone()[0]
+
+
+def update_name_index(conn, nomes_antigos, ids):
+    """
+    Atualiza o índice de nomes das OSCs alteradas, sem commit (mesmos
+    argumentos de update_trigram_index)
+    """
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"DELETE FROM {NAME_TABLE} WHERE nome = ? AND id_osc = ?",
+        _name_postings((id_osc, nome) for id_osc, nome in nomes_antigos if nome is not None),
+    )
+    ids = list(ids)
+    for inicio in range(0, len(ids), 500):
+        lote = ids[inicio:inicio + 500]
+        linhas = conn.execute(
+            f"SELECT id_osc, nome FROM oscs WHERE nome IS NOT NULL AND id_osc IN ({','.join('?' for _ in lote)})",
+            lote,
+        ).fetchall()
+        cursor.executemany(f"INSERT OR IGNORE INTO {NAME_TABLE} (nome, id_osc) VALUES (?, ?)", _name_postings(linhas))
+
+
+def has_name_index(conn):
+    """
+    Verifica se o banco possui o índice de nomes. Em consultas entre estados
+    (view temporária "oscs"), exige a view de união dos índices.
+    """
+    temporarias = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_temp_master WHERE type IN ('view', 'table')")
+    }
+    if 'oscs' in temporarias:
+        return NAME_TABLE in temporarias
+    cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [NAME_TABLE])
+    return cursor.fetchone() is not None
@@ -0,0 +1,63 @@
+"""
+Pacotes de scripts gerados no collectstatic
+
+BundledStaticFilesStorage estende o storage do WhiteNoise: antes do hash e
+da compressão, concatena os scripts de cada pacote de STATIC_BUNDLES (na
+ordem em que os templates os carregavam), minifica o resultado e grava o
+pacote em STATIC_ROOT. Daí em diante o pacote segue o caminho dos demais
+arquivos: ganha o nome com hash no manifesto e as versões .gz e .br (o
+brotli depende do pacote opcional brotli, usado pelo WhiteNoise).
+
+A minificação depende do pacote opcional rjsmin; sem ele, o pacote é só a
+concatenação dos arquivos. Nos templates, a tag {% bundle_scripts %}
+(templatetags/bundles.py) carrega o pacote quando STATIC_BUNDLES_ENABLED
+está ativo e o manifesto o contém, e os arquivos originais caso contrário.
+"""
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    import rjsmin
+except ImportError:  # dependência opcional
+    rjsmin = None
+
+
+def minify_js(codigo):
+    """Minifica o JavaScript com o rjsmin (sem ele, retorna o código intacto)"""
+    if rjsmin is None:
+        return codigo
+    return rjsmin.jsmin(codigo)
+
+
+def build_bundle(storage, arquivos):
+    """
+    Conteúdo do pacote: os arquivos na ordem dada, cada um minificado e
+    terminado em ';' para não emendar expressões entre arquivos
+    """
+    partes = []
+    for nome in arquivos:
+        with storage.open(nome) as arquivo:
+            codigo = arquivo.read().decode('utf-8')
+        partes.append(f"/* {nome} */\n{minify_js(codigo).strip()}\n;")
+    return '\n'.join(partes) + '\n'
+
+
+class BundledStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Storage do WhiteNoise que gera os pacotes de STATIC_BUNDLES antes do hash"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for pacote, arquivos in settings.STATIC_BUNDLES.items():
+                faltando = [nome for nome in arquivos if nome not in paths]
+                if faltando:
+                    raise ValueError(f"Pacote {pacote}: arquivos não coletados: {', '.join(faltando)}")
+                conteudo = build_bundle(self, arquivos).encode('utf-8')
+                if self.exists(pacote):
+                    self.delete(pacote)
+                self._save(pacote, ContentFile(conteudo))
+                paths[pacote] = (self, pacote)
+                tamanho = sum(self.size(nome) for nome in arquivos)
+                print(f"Pacote {pacote}: {len(arquivos)} arquivos, {tamanho:,} -> {len(conteudo):,} bytes")
+        yield from super().post_process(paths, dry_run=dry_run, **options)
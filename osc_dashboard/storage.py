@@ -0,0 +1,93 @@
+"""
+Artefato somente leitura do banco de OSCs: otimização e distribuição comprimida
+
+optimize_database gera a cópia compactada (VACUUM INTO com page_size maior e
+estatísticas do ANALYZE). O artefato pode ser distribuído comprimido com zstd
+(<banco>.zst), com menos bytes no repositório e no deploy; na inicialização,
+ensure_database descomprime o arquivo quando o banco ainda não existe ou é
+mais antigo que a versão comprimida (pacote zstandard).
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+import zstandard
+
+EXTENSAO_COMPRIMIDA = '.zst'
+
+# Nível alto: a compressão roda uma vez no build, a descompressão é rápida em qualquer nível
+NIVEL_ZSTD = 19
+
+# Páginas maiores: menos páginas lidas nas varreduras e índices mais rasos
+PAGE_SIZE_PADRAO = 8192
+
+
+def optimize_database(origem, destino, page_size=PAGE_SIZE_PADRAO):
+    """
+    Gera em destino a cópia otimizada do banco origem (destino pode ser a
+    própria origem; a troca é atômica)
+    """
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+    if temporario.exists():
+        temporario.unlink()
+
+    # O page_size definido antes do VACUUM INTO vale para a cópia; a origem não muda
+    conn = sqlite3.connect(f'file:{origem}?mode=ro', uri=True)
+    conn.execute(f"PRAGMA page_size = {int(page_size)}")
+    conn.execute("VACUUM INTO ?", [str(temporario)])
+    conn.close()
+
+    conn = sqlite3.connect(temporario)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("ANALYZE")
+    conn.commit()
+    # Compacta de novo, incluindo as tabelas de estatísticas criadas pelo ANALYZE
+    conn.execute("VACUUM")
+    conn.close()
+
+    os.replace(temporario, destino)
+    return destino
+
+
+def compressed_path(db_path):
+    """Caminho da versão comprimida do banco"""
+    return Path(f'{db_path}{EXTENSAO_COMPRIMIDA}')
+
+
+def compress_database(db_path, nivel=NIVEL_ZSTD):
+    """Comprime o banco em <banco>.zst e retorna o caminho gerado"""
+    destino = compressed_path(db_path)
+    temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+    compressor = zstandard.ZstdCompressor(level=nivel, threads=-1)
+    with open(db_path, 'rb') as origem, open(temporario, 'wb') as saida:
+        compressor.copy_stream(origem, saida, size=os.path.getsize(db_path))
+    os.replace(temporario, destino)
+    return destino
+
+
+def decompress_database(db_path):
+    """Descomprime <banco>.zst em db_path (troca atômica, segura entre workers)"""
+    db_path = Path(db_path)
+    temporario = db_path.with_name(f'{db_path.name}.{os.getpid()}.tmp')
+    with open(compressed_path(db_path), 'rb') as origem, open(temporario, 'wb') as saida:
+        zstandard.ZstdDecompressor().copy_stream(origem, saida)
+    os.replace(temporario, db_path)
+    return db_path
+
+
+def ensure_database(db_path):
+    """
+    Garante o banco descomprimido quando existe uma versão .zst mais nova.
+    Retorna True se descomprimiu.
+    """
+    db_path = Path(db_path)
+    comprimido = compressed_path(db_path)
+    if not comprimido.exists():
+        return False
+    if db_path.exists() and db_path.stat().st_mtime >= comprimido.stat().st_mtime:
+        return False
+    decompress_database(db_path)
+    return True
@@ -0,0 +1,131 @@
+"""
+Resumo estatístico pré-calculado da base de OSCs
+
+O resumo (totais, preenchimento de email e telefone, contagens por situação,
+natureza e município, ranking de municípios, as opções dos filtros,
+incluindo bacias e regiões do mapeamento de municípios, e as últimas
+versões carregadas) é calculado na migração e gravado como JSON na tabela
+oscs_resumo. O dashboard lê o resumo uma vez por worker e o mantém em
+memória até o arquivo do banco mudar, sem varreduras da tabela a cada
+página.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+from .history import load_versions
+from .regions import region_options
+
+SUMMARY_TABLE = 'oscs_resumo'
+
+# Quantidade de municípios no ranking do resumo
+TOP_MUNICIPIOS = 10
+
+# Quantidade de versões do histórico no resumo
+VERSOES_RESUMO = 12
+
+_lock = threading.Lock()
+# Resumos mantidos por worker: o da versão ativa do banco e o da versão sendo aquecida
+MAX_RESUMOS = 2
+_cache = {}
+
+
+def _preenchido(coluna):
+    return f"SUM(CASE WHEN {coluna} IS NOT NULL AND TRIM({coluna}) != '' THEN 1 ELSE 0 END)"
+
+
+def compute_summary(conn):
+    """Calcula o resumo a partir da tabela oscs"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT
+            COUNT(*),
+            {_preenchido('email')},
+            {_preenchido('telefone')},
+            SUM(CASE WHEN email IS NOT NULL AND TRIM(email) != ''
+                      AND telefone IS NOT NULL AND TRIM(telefone) != '' THEN 1 ELSE 0 END)
+        FROM oscs
+    """)
+    total, com_email, com_telefone, com_email_e_telefone = cursor.fetchone()
+
+    def contagens(coluna):
+        cursor.execute(f"""
+            SELECT {coluna}, COUNT(*) FROM oscs
+            WHERE {coluna} != '' GROUP BY {coluna} ORDER BY {coluna}
+        """)
+        return dict(cursor.fetchall())
+
+    por_municipio = contagens('edmu_nm_municipio')
+    por_natureza = contagens('natureza_juridica')
+    por_situacao = contagens('situacao_cadastral')
+    top_municipios = sorted(por_municipio.items(), key=lambda item: (-item[1], item[0]))[:TOP_MUNICIPIOS]
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'total': total,
+        'com_email': com_email or 0,
+        'com_telefone': com_telefone or 0,
+        'com_email_e_telefone': com_email_e_telefone or 0,
+        'total_municipios': len(por_municipio),
+        'por_situacao': por_situacao,
+        'por_natureza': por_natureza,
+        'por_municipio': por_municipio,
+        'top_municipios': [{'municipio': nome, 'total': n} for nome, n in top_municipios],
+        'municipios': list(por_municipio),
+        'naturezas_juridicas': list(por_natureza),
+        'situacoes_cadastrais': list(por_situacao),
+        **region_options(conn),
+        'versoes': load_versions(conn)[:VERSOES_RESUMO],
+    }
+
+
+def create_summary_table(conn):
+    """Calcula o resumo e o grava (substituindo o anterior) na tabela oscs_resumo"""
+    resumo = compute_summary(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {SUMMARY_TABLE}")
+    cursor.execute(f"CREATE TABLE {SUMMARY_TABLE} (dados TEXT NOT NULL)")
+    cursor.execute(f"INSERT INTO {SUMMARY_TABLE} (dados) VALUES (?)", [json.dumps(resumo, ensure_ascii=False)])
+    conn.commit()
+    return resumo
+
+
+def read_summary(conn):
+    """Lê o resumo gravado no banco (None se a tabela não existe)"""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [SUMMARY_TABLE]
+    ).fetchone()
+    if existe is None:
+        return None
+    linha = conn.execute(f"SELECT dados FROM {SUMMARY_TABLE} LIMIT 1").fetchone()
+    return json.loads(linha[0]) if linha else None
+
+
+def get_summary(db_path, connect):
+    """
+    Retorna o resumo do worker, relendo-o quando o arquivo do banco muda.
+    Bancos sem a tabela oscs_resumo têm o resumo calculado na hora (uma vez).
+    """
+    stat = os.stat(db_path)
+    chave = str(db_path)
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        entrada = _cache.get(chave)
+        if entrada is not None and entrada[0] == assinatura:
+            return entrada[1]
+
+    conn = connect()
+    try:
+        resumo = read_summary(conn) or compute_summary(conn)
+    finally:
+        conn.close()
+
+    with _lock:
+        _cache.pop(chave, None)
+        _cache[chave] = (assinatura, resumo)
+        while len(_cache) > MAX_RESUMOS:
+            _cache.pop(next(iter(_cache)))
+    return resumo
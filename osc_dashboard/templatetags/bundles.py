@@ -0,0 +1,30 @@
+"""
+Tag {% bundle_scripts %}: carrega um pacote de STATIC_BUNDLES ou seus arquivos
+"""
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle_scripts(pacote):
+    """
+    <script> do pacote gerado no collectstatic (osc_dashboard/staticfiles.py)
+    quando STATIC_BUNDLES_ENABLED está ativo e o pacote está no manifesto;
+    caso contrário (desenvolvimento, collectstatic sem o storage de pacotes),
+    um <script> por arquivo, na mesma ordem
+    """
+    if settings.STATIC_BUNDLES_ENABLED:
+        try:
+            return format_html('<script src="{}"></script>', static(pacote))
+        except ValueError:
+            # Manifesto sem o pacote
+            pass
+    return format_html_join(
+        '\n', '<script src="{}"></script>',
+        ((static(nome),) for nome in settings.STATIC_BUNDLES[pacote]),
+    )
@@ -0,0 +1,1236 @@
+"""
+Testes de regressão do dashboard
+
+Cada classe monta um banco SQLite pequeno (OSCS) em um diretório temporário
+e aponta OSC_DB_PATH e os demais diretórios de dados para ele. Rodar com:
+
+    python manage.py test osc_dashboard
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from unittest import mock, skipIf
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, TestCase, override_settings
+
+from . import (
+    admission, analytics, apps, async_views, exports, frames, history, lookup, profiling, regions, staticfiles, storage,
+    summary, updates, versions, views, warmup,
+)
+from .templatetags import bundles
+from .bitmap import BitmapIndex
+from .cache import (
+    JANELA_PAGINAS, PAGINAS_POR_ENTRADA, ResultCache, cached_page, canonical_filters, result_cache, store_pages,
+)
+from .filters import MAX_POR_PAGINA, parse_filters, parse_pagination
+from .search import NAME_TABLE, TRIGRAM_TABLE, WORDS_TABLE, create_name_index, create_trigram_index, has_trigram_index
+from .summary import create_summary_table
+
+OSCS = [
+    (1, 'ASSOCIAÇÃO AMBIENTAL AMIGOS DA ÁGUA', 'contato1@osc.org.br', 'Rua 1, 10', '(41) 99999-0001',
+     'Associação Privada', 'ATIVA', 4106902, 'Curitiba'),
+    (2, 'INSTITUTO AMBIENTAL DO PARANÁ', '', 'Rua 2, 20', '+55 41 3333-0002',
+     'Fundação Privada', 'ATIVA', 4106902, 'Curitiba'),
+    (3, 'IGREJA EVANGÉLICA BOAS NOVAS', 'igreja@osc.org.br', 'Rua 3, 30', '',
+     'Organização Religiosa', 'ATIVA', 4113700, 'Londrina'),
+    (4, 'CLUBE DE MÃES ÁGUA LIMPA', '', 'Rua 4, 40', '',
+     'Associação Privada', 'BAIXADA', 4113700, 'Londrina'),
+    (5, 'ASSOCIACAO DE MORADORES DO BAIRRO ALTO', 'moradores@osc.org.br', 'Rua 5, 50', '(44) 3030-0005',
+     'Associação Privada', 'ATIVA', 4115200, 'Maringá'),
+    (6, 'CENTRO CULTURAL ARTE VIVA', '', 'Rua 6, 60', '(44) 3030-0006',
+     'Associação Privada', 'INAPTA', 4115200, 'Maringá'),
+    (7, 'SOCIEDADE BENEFICENTE SÃO JOSÉ', 'sj@osc.org.br', 'Rua 7, 70', '',
+     'Associação Privada', 'ATIVA', 4106902, 'Curitiba'),
+    (8, 'FUNDACAO RECURSOS HIDRICOS', '', 'Rua 8, 80', '',
+     'Fundação Privada', 'SUSPENSA', 4119905, 'Ponta Grossa'),
+    (9, 'ASSOCIAÇÃO ESPORTIVA AMBIENTAL', '', 'Rua 9, 90', '',
+     'Associação Privada', 'ATIVA', 4106902, 'Curitiba'),
+    (10, 'CONSELHO COMUNITÁRIO DA ÁGUA', 'conselho@osc.org.br', 'Rua 10, 100', '(42) 3220-0010',
+     'Organização Social', 'ATIVA', 4119905, 'Ponta Grossa'),
+]
+
+
+def criar_banco(caminho, linhas=OSCS, trigramas=True, nomes=True):
+    """Cria em caminho um banco com a tabela oscs, os índices da migração e o resumo"""
+    conn = sqlite3.connect(caminho)
+    conn.execute("""
+        CREATE TABLE oscs (
+            id_osc INTEGER, nome TEXT, email TEXT, endereco TEXT, telefone TEXT,
+            natureza_juridica TEXT, situacao_cadastral TEXT,
+            edmu_cd_municipio INTEGER, edmu_nm_municipio TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO oscs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+    conn.execute("CREATE INDEX idx_id_osc ON oscs(id_osc)")
+    conn.execute("CREATE INDEX idx_municipio ON oscs(edmu_nm_municipio)")
+    conn.commit()
+    if trigramas:
+        create_trigram_index(conn)
+    if nomes:
+        create_name_index(conn)
+    create_summary_table(conn)
+    conn.close()
+    return Path(caminho)
+
+
+def setUpModule():
+    # O log estruturado das requisições e os avisos de 4xx e 503 esperados poluem a saída dos testes
+    logging.disable(logging.ERROR)
+
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class BancoTestCase(TestCase):
+    """Testes com um banco de OSCs próprio em um diretório temporário"""
+
+    linhas = OSCS
+    trigramas = True
+    nomes = True
+    configuracoes = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.diretorio = Path(tempfile.mkdtemp(prefix='osc_testes_'))
+        cls.db_path = criar_banco(cls.diretorio / 'oscs.db', cls.linhas, cls.trigramas, cls.nomes)
+        cls._configuracoes = override_settings(
+            OSC_DB_PATH=str(cls.db_path),
+            OSC_ESTADOS_DIR=str(cls.diretorio / 'estados'),
+            OSC_VERSOES_DIR=str(cls.diretorio / 'versions'),
+            EXPORT_DIR=str(cls.diretorio / 'exportacoes'),
+            ADMISSION_DIR=str(cls.diretorio / 'admissao'),
+            PROFILING_DIR=str(cls.diretorio / 'perfis'),
+            FILTER_ENGINE='sqlite',
+            **cls.configuracoes,
+        )
+        cls._configuracoes.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._configuracoes.disable()
+        shutil.rmtree(cls.diretorio, ignore_errors=True)
+
+    def setUp(self):
+        result_cache.clear()
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def copia(self, nome):
+        """Conexão a uma cópia do banco da classe, para testes que o alteram"""
+        destino = self.diretorio / nome
+        shutil.copyfile(self.db_path, destino)
+        conn = sqlite3.connect(destino)
+        self.addCleanup(conn.close)
+        return conn
+
+    def post_json(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json')
+
+    def filtrar(self, **payload):
+        response = self.post_json('/filter/', payload)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+class BuscaAproximadaTests(BancoTestCase):
+    """user-026: busca aproximada por trigramas"""
+
+    def ids(self, resultado):
+        return [linha['id_osc'] for linha in resultado['data']]
+
+    def test_tolera_erro_de_digitacao(self):
+        resultado = self.filtrar(palavras_chave='ambeintal', busca_aproximada=True)
+        self.assertTrue(resultado['busca_aproximada'])
+        self.assertEqual(sorted(self.ids(resultado)), [1, 2, 9])
+
+    def test_todas_as_palavras_chave_precisam_aparecer(self):
+        resultado = self.filtrar(palavras_chave='ambeintal agua', busca_aproximada=True)
+        self.assertEqual(self.ids(resultado), [1])
+
+    def test_busca_exata_aceita_qualquer_palavra(self):
+        resultado = self.filtrar(palavras_chave='ambiental igreja')
+        self.assertFalse(resultado['busca_aproximada'])
+        self.assertEqual(sorted(self.ids(resultado)), [1, 2, 3, 9])
+
+    def test_similaridade_invalida_responde_400(self):
+        for valor in ['abc', 1.5, -0.1]:
+            with self.subTest(valor=valor):
+                response = self.post_json(
+                    '/filter/', {'palavras_chave': 'agua', 'busca_aproximada': True, 'similaridade_minima': valor}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('similaridade_minima', response.json()['error'])
+
+    def test_indice_antigo_nao_conta_como_indice(self):
+        conn = self.copia('indice_antigo.db')
+        self.assertTrue(has_trigram_index(conn))
+        conn.execute(f"DROP TABLE {WORDS_TABLE}")
+        self.assertFalse(has_trigram_index(conn))
+
+
+class BancoSemTrigramasTests(BancoTestCase):
+    """user-026: sem o índice de trigramas, a busca aproximada volta à busca exata"""
+
+    trigramas = False
+
+    def test_busca_aproximada_sem_indice_faz_busca_exata(self):
+        resultado = self.filtrar(palavras_chave='ambiental', busca_aproximada=True)
+        self.assertFalse(resultado['busca_aproximada'])
+        self.assertEqual(resultado['total'], 3)
+
+    def test_criar_indice_habilita_a_busca_aproximada(self):
+        conn = self.copia('com_indice.db')
+        self.assertFalse(has_trigram_index(conn))
+        create_trigram_index(conn)
+        self.assertTrue(has_trigram_index(conn))
+        self.assertGreater(conn.execute(f"SELECT COUNT(*) FROM {TRIGRAM_TABLE}").fetchone()[0], 0)
+
+
+# Combinações de filtros categóricos comparadas entre os motores
+FILTROS_CATEGORICOS = [
+    {},
+    {'municipio': 'Curitiba'},
+    {'municipio': 'Curitiba,Londrina', 'situacao_cadastral': 'ATIVA'},
+    {'natureza_juridica': 'Fundação Privada'},
+    {'naturezas_ver': ['Associação Privada', 'Organização Social'], 'situacao_cadastral': 'ATIVA,BAIXADA'},
+    {'municipio': 'Município inexistente'},
+]
+
+
+class MotorBitmapTests(BancoTestCase):
+    """user-027: o motor de bitmaps retorna o mesmo que o SQLite"""
+
+    def resultado(self, motor, payload):
+        with override_settings(FILTER_ENGINE=motor):
+            resultado = self.filtrar(**payload, per_page=500)
+        return resultado
+
+    def test_mesmo_resultado_que_o_sqlite(self):
+        for payload in FILTROS_CATEGORICOS:
+            with self.subTest(payload=payload):
+                bitmap = self.resultado('bitmap', payload)
+                with mock.patch.object(result_cache, 'max_entries', 0):
+                    sqlite = self.resultado('sqlite', payload)
+                self.assertEqual(bitmap['motor'], 'bitmap')
+                self.assertEqual(sqlite['motor'], 'sqlite')
+                self.assertEqual(bitmap['total'], sqlite['total'])
+                # Sem palavras-chave a consulta SQL não tem ORDER BY: compara os conjuntos
+                self.assertEqual(
+                    sorted(linha['id_osc'] for linha in bitmap['data']),
+                    sorted(linha['id_osc'] for linha in sqlite['data']),
+                )
+
+    def test_palavras_chave_ficam_com_o_sqlite(self):
+        self.assertFalse(BitmapIndex.supports(parse_filters({'palavras_chave': 'agua'})))
+        self.assertEqual(self.resultado('bitmap', {'palavras_chave': 'AMBIENTAL'})['motor'], 'sqlite')
+
+    def test_paginacao(self):
+        with override_settings(FILTER_ENGINE='bitmap'):
+            paginas = [self.filtrar(page=page, per_page=4) for page in (1, 2, 3)]
+        self.assertEqual([len(pagina['data']) for pagina in paginas], [4, 4, 2])
+        ids = [linha['id_osc'] for pagina in paginas for linha in pagina['data']]
+        self.assertEqual(ids, list(range(1, 11)))
+
+
+class FacetasTests(BancoTestCase):
+    """user-028: contagens por faceta na resposta de /filter/"""
+
+    def test_sem_filtros_conta_todas_as_oscs(self):
+        facetas = self.filtrar(facetas=True)['facetas']
+        self.assertEqual(
+            facetas['municipio'], {'Curitiba': 4, 'Londrina': 2, 'Maringá': 2, 'Ponta Grossa': 2}
+        )
+        self.assertEqual(sum(facetas['situacao_cadastral'].values()), len(OSCS))
+
+    def test_faceta_ignora_a_selecao_da_propria_dimensao(self):
+        facetas = self.filtrar(municipio='Curitiba', situacao_cadastral='ATIVA', facetas=True)['facetas']
+        # Os outros municípios continuam com as OSCs ativas que retornariam
+        self.assertEqual(
+            facetas['municipio'], {'Curitiba': 4, 'Londrina': 1, 'Maringá': 1, 'Ponta Grossa': 1}
+        )
+        self.assertEqual(facetas['situacao_cadastral'], {'ATIVA': 4})
+        self.assertEqual(facetas['natureza_juridica'], {'Associação Privada': 3, 'Fundação Privada': 1})
+
+    def test_facetas_so_quando_pedidas(self):
+        self.assertNotIn('facetas', self.filtrar())
+
+    def test_motores_calculam_as_mesmas_facetas(self):
+        for payload in FILTROS_CATEGORICOS:
+            with self.subTest(payload=payload):
+                with override_settings(FILTER_ENGINE='bitmap'):
+                    bitmap = self.filtrar(**payload, facetas=True)
+                with mock.patch.object(result_cache, 'max_entries', 0):
+                    sqlite = self.filtrar(**payload, facetas=True)
+                self.assertEqual(bitmap['motor'], 'bitmap')
+                self.assertEqual(bitmap['facetas'], sqlite['facetas'])
+
+
+class CacheResultadosTests(BancoTestCase):
+    """user-029: cache de resultados chaveado pelos filtros normalizados"""
+
+    def test_chave_ignora_ordem_e_repeticoes(self):
+        self.assertEqual(
+            canonical_filters(parse_filters({'municipio': 'Londrina,Curitiba,Londrina'})),
+            canonical_filters(parse_filters({'municipio': 'Curitiba,Londrina'})),
+        )
+        self.assertNotEqual(
+            canonical_filters(parse_filters({'municipio': 'Curitiba'})),
+            canonical_filters(parse_filters({'municipio': 'Londrina'})),
+        )
+
+    def test_similaridade_so_entra_na_chave_da_busca_aproximada(self):
+        def chave(**payload):
+            return canonical_filters(parse_filters({'palavras_chave': 'agua', **payload}))
+
+        self.assertEqual(chave(similaridade_minima=0.2), chave(similaridade_minima=0.6))
+        self.assertNotEqual(
+            chave(busca_aproximada=True, similaridade_minima=0.2),
+            chave(busca_aproximada=True, similaridade_minima=0.6),
+        )
+
+    def test_despejo_lru(self):
+        cache = ResultCache(max_entries=2, max_ids=100)
+
+        def entrada(n):
+            return {'rowids': np.arange(n)}
+
+        cache.set('v1', 'a', entrada(1))
+        cache.set('v1', 'b', entrada(1))
+        cache.get('v1', 'a')
+        cache.set('v1', 'c', entrada(1))
+        self.assertIsNone(cache.get('v1', 'b'))
+        self.assertIsNotNone(cache.get('v1', 'a'))
+        self.assertEqual(cache.evictions, 1)
+
+        # Limite de ids armazenados
+        cache.set('v1', 'grande', entrada(100))
+        self.assertEqual(list(cache._entries), ['grande'])
+
+    def test_nova_versao_do_banco_invalida_o_cache(self):
+        cache = ResultCache(max_entries=10, max_ids=100)
+        cache.set('v1', 'a', {'rowids': np.arange(3)})
+        self.assertIsNone(cache.get('v2', 'a'))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_paginas_do_cache_iguais_as_da_consulta(self):
+        payload = {'municipio': 'Curitiba,Maringá', 'per_page': 2}
+        paginas = [self.filtrar(**payload, page=page) for page in (1, 2, 3, 4)]
+        with mock.patch.object(result_cache, 'max_entries', 0):
+            consultas = [self.filtrar(**payload, page=page) for page in (1, 2, 3, 4)]
+        self.assertEqual(result_cache.stats()['entradas'], 1)
+        self.assertEqual([p['data'] for p in paginas], [c['data'] for c in consultas])
+        self.assertEqual(paginas[0]['total_pages'], 3)
+        self.assertEqual(paginas[3]['data'], [])
+
+    def test_paginacao(self):
+        self.assertEqual(parse_pagination({}), (1, 50))
+        self.assertEqual(parse_pagination({'page': '0', 'per_page': '-5'}), (1, 1))
+        self.assertEqual(parse_pagination({'page': 2, 'per_page': 10**6}), (2, MAX_POR_PAGINA))
+        for payload in [{'page': 'x'}, {'per_page': 'muitas'}, {'page': None}]:
+            with self.subTest(payload=payload):
+                response = self.post_json('/filter/', payload)
+                self.assertEqual(response.status_code, 400)
+
+
+class MetricasTests(BancoTestCase):
+    """user-030: instrumentação por requisição e acesso a /metrics/ e /cache-stats/"""
+
+    def test_server_timing(self):
+        response = self.post_json('/filter/', {'municipio': 'Curitiba'})
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+    def test_metricas_exigem_staff_ou_token(self):
+        for url in ['/metrics/', '/cache-stats/']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 302)
+                with override_settings(METRICS_TOKEN='segredo'):
+                    self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer outro').status_code, 302)
+                    self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+
+    def test_staff_ve_as_metricas(self):
+        self.filtrar(municipio='Curitiba')
+        staff = User.objects.create_user('equipe', password='senha', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('osc_result_cache_misses', response.content.decode())
+        self.assertEqual(self.client.get('/cache-stats/').json()['entradas'], 1)
+
+
+OSCS_SC = [
+    (11, 'ASSOCIAÇÃO AMBIENTAL DA ILHA', '', 'Rua 11, 110', '(48) 3222-0011',
+     'Associação Privada', 'ATIVA', 4205407, 'Florianópolis'),
+    (12, 'IGREJA BATISTA DE JOINVILLE', '', 'Rua 12, 120', '',
+     'Organização Religiosa', 'BAIXADA', 4209102, 'Joinville'),
+]
+
+
+class MultiplosEstadosTests(BancoTestCase):
+    """user-033: bancos por estado, anexados nas consultas entre estados"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        (cls.diretorio / 'estados').mkdir()
+        criar_banco(cls.diretorio / 'estados' / 'oscs_SC.db', OSCS_SC)
+
+    def test_estado_padrao(self):
+        resultado = self.filtrar()
+        self.assertEqual(resultado['estados'], ['PR'])
+        self.assertEqual(resultado['total'], len(OSCS))
+
+    def test_um_estado(self):
+        resultado = self.filtrar(estado='sc')
+        self.assertEqual(resultado['estados'], ['SC'])
+        self.assertEqual(sorted(linha['id_osc'] for linha in resultado['data']), [11, 12])
+
+    def test_varios_estados(self):
+        resultado = self.filtrar(estado='SC,PR', situacao_cadastral='ATIVA', facetas=True)
+        self.assertEqual(resultado['estados'], ['PR', 'SC'])
+        self.assertEqual(resultado['total'], 8)
+        self.assertEqual(resultado['facetas']['municipio']['Florianópolis'], 1)
+
+    def test_busca_aproximada_entre_estados(self):
+        resultado = self.filtrar(estado='PR,SC', palavras_chave='ambeintal', busca_aproximada=True)
+        self.assertTrue(resultado['busca_aproximada'])
+        self.assertEqual(sorted(linha['id_osc'] for linha in resultado['data']), [1, 2, 9, 11])
+
+    def test_estado_sem_banco_responde_400(self):
+        response = self.post_json('/filter/', {'estado': 'PR,XX'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('XX', response.json()['error'])
+
+
+class ExecutorImediato:
+    """Executa as tarefas de exportação na hora, no próprio processo do teste"""
+
+    def __init__(self):
+        self.tarefas = 0
+
+    def submit(self, fn, *args):
+        self.tarefas += 1
+        fn(*args)
+
+
+class ExportacaoTarefasTests(BancoTestCase):
+    """user-034: exportações em segundo plano com arquivos reaproveitados"""
+
+    def setUp(self):
+        super().setUp()
+        self.executor = ExecutorImediato()
+        patcher = mock.patch.object(exports, '_get_executor', return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def criar(self, **payload):
+        return self.post_json('/export/jobs/', payload)
+
+    def test_tarefa_gera_a_planilha(self):
+        response = self.criar(municipio='Curitiba')
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(response.json()['url_status']).json()
+        self.assertEqual(job['status'], exports.CONCLUIDO)
+        self.assertEqual(job['linhas'], 4)
+
+        download = self.client.get(job['url_download'])
+        self.assertEqual(download.status_code, 200)
+        planilha = openpyxl.load_workbook(io.BytesIO(b''.join(download.streaming_content)))
+        linhas = list(planilha.active.values)
+        self.assertEqual(linhas[0][:2], ('ID OSC', 'Nome'))
+        self.assertEqual(sorted(linha[0] for linha in linhas[1:]), [1, 2, 7, 9])
+
+    def test_mesmos_filtros_reaproveitam_a_tarefa(self):
+        primeira = self.criar(municipio='Curitiba,Londrina').json()
+        segunda = self.criar(municipio='Londrina,Curitiba')
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.json()['job_id'], primeira['job_id'])
+        self.assertEqual(self.executor.tarefas, 1)
+
+    def test_sem_resultados(self):
+        job_id = self.criar(municipio='Município inexistente').json()['job_id']
+        job = exports.read_job(job_id)
+        self.assertEqual(job['status'], exports.ERRO)
+        self.assertEqual(job['erro'], 'Nenhum dado encontrado')
+
+    def test_tarefa_sem_atualizacao_e_dada_como_interrompida(self):
+        job_id = self.criar(municipio='Maringá').json()['job_id']
+        job = exports.read_job(job_id)
+        job['status'] = exports.EXECUTANDO
+        exports._write_job(job_id, job)
+        with override_settings(EXPORT_JOB_TIMEOUT=-1):
+            self.assertEqual(exports.read_job(job_id)['erro'], 'Tarefa interrompida')
+        self.assertEqual(self.client.get(f'/export/jobs/{"0" * 20}/').status_code, 404)
+
+
+class ViewsAssincronasTests(BancoTestCase):
+    """user-035: views de leitura assíncronas do modo ASGI"""
+
+    def chamar(self, view, payload=None, method='post'):
+        fabrica = AsyncRequestFactory()
+        if method == 'post':
+            request = fabrica.post('/', json.dumps(payload), content_type='application/json')
+        else:
+            request = fabrica.get('/')
+        return async_to_sync(view)(request)
+
+    def test_views_sao_corrotinas_sem_csrf(self):
+        for view in (async_views.filter_data, async_views.export_data, async_views.analytics_data):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+                self.assertTrue(view.csrf_exempt)
+
+    def test_filtro_igual_ao_sincrono(self):
+        payload = {'municipio': 'Londrina,Maringá', 'facetas': True}
+        response = self.chamar(async_views.filter_data, payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), self.filtrar(**payload))
+
+    def test_erros(self):
+        self.assertEqual(self.chamar(async_views.filter_data, {'page': 'x'}).status_code, 400)
+        self.assertEqual(self.chamar(async_views.filter_data, method='get').status_code, 405)
+
+    def test_exportacao(self):
+        response = self.chamar(async_views.export_data, {'municipio': 'Ponta Grossa'})
+        self.assertEqual(response.status_code, 200)
+        planilha = openpyxl.load_workbook(io.BytesIO(response.content))
+        self.assertEqual(planilha.active.max_row, 3)
+
+
+class ResumoTests(BancoTestCase):
+    """user-036: resumo estatístico pré-calculado"""
+
+    def test_resumo_gravado(self):
+        resumo = self.client.get('/resumo/').json()
+        self.assertEqual(resumo['total'], len(OSCS))
+        self.assertEqual(resumo['com_email'], 5)
+        self.assertEqual(resumo['com_telefone'], 5)
+        self.assertEqual(resumo['top_municipios'][0], {'municipio': 'Curitiba', 'total': 4})
+        self.assertEqual(resumo['situacoes_cadastrais'], ['ATIVA', 'BAIXADA', 'INAPTA', 'SUSPENSA'])
+
+    def test_resumo_lido_uma_vez_por_versao_do_banco(self):
+        conn = self.copia('resumo.db')
+        caminho = self.diretorio / 'resumo.db'
+        conexoes = []
+
+        def connect():
+            conexoes.append(caminho)
+            return sqlite3.connect(caminho)
+
+        self.assertEqual(summary.get_summary(caminho, connect)['total'], len(OSCS))
+        summary.get_summary(caminho, connect)
+        self.assertEqual(len(conexoes), 1)
+
+        # Banco alterado: o resumo é relido (e calculado na hora, sem a tabela)
+        conn.execute("DELETE FROM oscs WHERE id_osc > 5")
+        conn.execute(f"DROP TABLE {summary.SUMMARY_TABLE}")
+        conn.commit()
+        self.assertEqual(summary.get_summary(caminho, connect)['total'], 5)
+        self.assertEqual(len(conexoes), 2)
+
+
+class ArmazenamentoTests(BancoTestCase):
+    """user-037: banco otimizado para leitura e distribuição comprimida"""
+
+    def test_otimizacao_preserva_os_dados(self):
+        destino = storage.optimize_database(self.db_path, self.diretorio / 'otimizado.db', page_size=16384)
+        conn = sqlite3.connect(destino)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("PRAGMA page_size").fetchone()[0], 16384)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM oscs").fetchone()[0], len(OSCS))
+        self.assertIsNotNone(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone())
+
+    def test_descomprime_quando_o_zst_e_mais_novo(self):
+        banco = self.diretorio / 'distribuido.db'
+        shutil.copyfile(self.db_path, banco)
+        comprimido = storage.compress_database(banco)
+        self.assertLess(comprimido.stat().st_size, banco.stat().st_size)
+
+        # Banco em disco atual: nada a fazer
+        os.utime(comprimido, (1, 1))
+        self.assertFalse(storage.ensure_database(banco))
+
+        # Banco ausente (ou mais antigo que o .zst): descomprime
+        banco.unlink()
+        self.assertTrue(storage.ensure_database(banco))
+        self.assertEqual(banco.read_bytes(), self.db_path.read_bytes())
+
+
+class AnaliseTests(BancoTestCase):
+    """user-038: agregações de /analise/"""
+
+    def analisar(self, **payload):
+        return self.post_json('/analise/', payload)
+
+    def test_agrupa_pelas_dimensoes(self):
+        resultado = self.analisar(agrupar='municipio,situacao_cadastral', situacao_cadastral='ATIVA').json()
+        self.assertEqual(resultado['motor'], 'sqlite')
+        self.assertEqual(resultado['total'], 7)
+        self.assertEqual(
+            resultado['linhas'][0],
+            {'municipio': 'Curitiba', 'situacao_cadastral': 'ATIVA', 'total': 4, 'com_email': 2, 'com_telefone': 2},
+        )
+
+    def test_limite(self):
+        resultado = self.analisar(agrupar='municipio', limite='2').json()
+        self.assertEqual([linha['municipio'] for linha in resultado['linhas']], ['Curitiba', 'Londrina'])
+        self.assertEqual(analytics.parse_limit(10**9), analytics.MAX_LIMITE)
+        self.assertIsNone(analytics.parse_limit(None))
+
+    def test_limite_invalido_responde_400(self):
+        for limite in ['x', 0, -3, 2.5, True]:
+            with self.subTest(limite=limite):
+                response = self.analisar(limite=limite)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('limite', response.json()['error'])
+
+    def test_dimensao_invalida_responde_400(self):
+        self.assertEqual(self.analisar(agrupar='cor').status_code, 400)
+
+    @skipIf(analytics.pa is None, 'pyarrow não instalado')
+    def test_snapshot_igual_ao_sqlite(self):
+        payload = {'agrupar': 'municipio,natureza_juridica', 'naturezas_ver': ['Associação Privada', 'Fundação Privada']}
+        sqlite = self.analisar(**payload).json()
+
+        snapshot = analytics.snapshot_path(self.db_path)
+        with closing(self.connect()) as conn:
+            analytics.write_snapshot(conn, snapshot)
+        self.addCleanup(snapshot.unlink)
+        parquet = self.analisar(**payload).json()
+
+        self.assertEqual(parquet['motor'], 'parquet')
+        self.assertEqual(parquet['linhas'], sqlite['linhas'])
+
+
+class DataFrameCompactoTests(BancoTestCase):
+    """user-039: carga compacta da tabela oscs"""
+
+    def test_tipos_compactos(self):
+        with closing(self.connect()) as conn:
+            df = frames.read_frame(conn)
+        self.assertEqual(len(df), len(OSCS))
+        self.assertEqual(str(df['edmu_nm_municipio'].dtype), 'category')
+        self.assertEqual(df['id_osc'].dtype, np.int32)
+        self.assertEqual(list(df['situacao_cadastral'].cat.categories), ['ATIVA', 'BAIXADA', 'INAPTA', 'SUSPENSA'])
+
+    def test_categorias_iguais_em_todos_os_blocos(self):
+        with closing(self.connect()) as conn, mock.patch.object(frames, 'CHUNK_SIZE', 3):
+            df = frames.read_frame(conn, ['id_osc', 'natureza_juridica'])
+        self.assertEqual(list(df.columns), ['id_osc', 'natureza_juridica'])
+        self.assertEqual(str(df['natureza_juridica'].dtype), 'category')
+        self.assertEqual(df['natureza_juridica'].value_counts()['Associação Privada'], 6)
+
+    def test_coluna_inexistente(self):
+        with closing(self.connect()) as conn, self.assertRaises(ValueError):
+            frames.read_frame(conn, ['senha'])
+
+    def test_carga_compartilhada_pelo_worker(self):
+        conexoes = []
+
+        def connect():
+            conexoes.append(1)
+            return self.connect()
+
+        df = frames.get_frame(self.db_path, connect, ['id_osc'])
+        self.assertIs(frames.get_frame(self.db_path, connect, ['id_osc']), df)
+        self.assertEqual(len(conexoes), 1)
+
+
+MUNICIPIOS_REGIOES = pd.DataFrame(
+    [
+        ('Curitiba', 'Metropolitana de Curitiba', 'Iguaçu'),
+        ('Curitiba', 'Metropolitana de Curitiba', 'Ribeira'),
+        ('Londrina', 'Norte Central', 'Tibagi'),
+        ('Maringá', 'Norte Central', 'Ivaí'),
+        ('Maringá', 'Norte Central', 'Pirapó'),
+        ('Ponta Grossa', 'Centro Oriental', 'Tibagi'),
+    ],
+    columns=['municipio', 'regiao', 'bacia'],
+)
+
+
+class RegioesTests(BancoTestCase):
+    """user-040: filtros de mesorregião e bacia hidrográfica"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with closing(sqlite3.connect(cls.db_path)) as conn:
+            regions.create_regions_table(conn, MUNICIPIOS_REGIOES)
+
+    def ids(self, **payload):
+        return sorted(linha['id_osc'] for linha in self.filtrar(**payload)['data'])
+
+    def test_filtro_de_regiao(self):
+        self.assertEqual(self.ids(regiao='Norte Central'), [3, 4, 5, 6])
+
+    def test_municipio_em_varias_bacias_aparece_uma_vez(self):
+        self.assertEqual(self.ids(bacia='Iguaçu,Ribeira'), [1, 2, 7, 9])
+        self.assertEqual(self.ids(bacia='Tibagi', situacao_cadastral='ATIVA'), [3, 10])
+
+    def test_opcoes_do_mapeamento(self):
+        with closing(self.connect()) as conn:
+            opcoes = regions.region_options(conn)
+        self.assertEqual(opcoes['regioes'], ['Centro Oriental', 'Metropolitana de Curitiba', 'Norte Central'])
+        self.assertEqual(opcoes['bacias'], ['Iguaçu', 'Ivaí', 'Pirapó', 'Ribeira', 'Tibagi'])
+
+    def test_sem_mapeamento_responde_400(self):
+        conn = self.copia('sem_regioes.db')
+        conn.execute(f"DROP TABLE {regions.REGIONS_TABLE}")
+        conn.commit()
+        with override_settings(OSC_DB_PATH=str(self.diretorio / 'sem_regioes.db')):
+            response = self.post_json('/filter/', {'bacia': 'Tibagi'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bacia/região', response.json()['error'])
+
+
+class VersoesTests(BancoTestCase):
+    """user-041: versões publicadas do banco e troca sem reinício"""
+
+    def setUp(self):
+        super().setUp()
+        self.limpar_estado()
+        self.addCleanup(self.limpar_estado)
+        self.addCleanup(shutil.rmtree, self.diretorio / 'versions', True)
+
+    def limpar_estado(self):
+        versions._estado.update(ponteiro=None, destino=None, ativo=None, aquecendo=None)
+
+    def banco_menor(self, nome, municipio='Curitiba'):
+        """Cópia do banco só com as OSCs do município"""
+        conn = self.copia(nome)
+        conn.execute("DELETE FROM oscs WHERE edmu_nm_municipio != ?", [municipio])
+        conn.commit()
+        return self.diretorio / nome
+
+    def esperar_versao(self, destino, limite=10):
+        fim = time.monotonic() + limite
+        while versions.active_db_path() != destino:
+            self.assertLess(time.monotonic(), fim, 'a versão nova não foi ativada')
+            time.sleep(0.02)
+        # Depois da troca a thread ainda aquece o cache de resultados
+        for thread in threading.enumerate():
+            if thread.name == 'aquecimento-versao':
+                thread.join(limite)
+
+    def test_sem_versoes_usa_osc_db_path(self):
+        self.assertEqual(versions.active_db_path(), self.db_path)
+
+    def test_troca_depois_do_aquecimento(self):
+        primeira = versions.publish_version(self.db_path)
+        self.assertEqual(versions.active_db_path(), primeira)
+        self.assertEqual(self.filtrar()['total'], len(OSCS))
+
+        segunda = versions.publish_version(self.banco_menor('curitiba.db'))
+        self.esperar_versao(segunda)
+        self.assertEqual(self.filtrar()['total'], 4)
+
+        # Volta à versão anterior
+        versions.activate_version(primeira.stem)
+        self.esperar_versao(primeira)
+        self.assertEqual(self.filtrar()['total'], len(OSCS))
+        with self.assertRaises(ValueError):
+            versions.activate_version('0' * 16)
+
+    def test_retencao_nunca_remove_a_ativa(self):
+        antiga = versions.publish_version(self.db_path)
+        versions.publish_version(self.banco_menor('curitiba.db'))
+        outra = versions.publish_version(self.banco_menor('londrina.db', 'Londrina'))
+        versions.activate_version(antiga.stem)
+        versions.prune_versions(manter=1)
+        self.assertEqual(sorted(versions.list_versions()), sorted([antiga, outra]))
+
+    def test_dados_em_memoria_vem_do_arquivo_da_chave(self):
+        # O índice de bitmaps é lido do caminho resolvido, não de uma nova resolução da versão ativa
+        menor = self.banco_menor('indice.db')
+        with override_settings(FILTER_ENGINE='bitmap'), \
+                mock.patch.object(views, 'get_db_connection', side_effect=AssertionError):
+            index = views.get_filter_index(parse_filters({}) | {'estados': ['PR']}, menor)
+        self.assertEqual(index.size, 4)
+
+
+COLUNAS = ['id_osc', 'nome', 'email', 'endereco', 'telefone', 'natureza_juridica',
+           'situacao_cadastral', 'edmu_cd_municipio', 'edmu_nm_municipio']
+
+
+def nova_saida(linhas=OSCS):
+    """
+    Saída do pipeline para a atualização incremental: remove a OSC 6, muda o
+    nome da 2 e o telefone da 5 e inclui a OSC 11
+    """
+    novas = [list(linha) for linha in linhas if linha[0] != 6]
+    for linha in novas:
+        if linha[0] == 2:
+            linha[1] = 'INSTITUTO DE RECURSOS HIDRICOS DO PARANÁ'
+        elif linha[0] == 5:
+            linha[4] = '(44) 3030-9999'
+    novas.append([11, 'ASSOCIAÇÃO AMBIENTAL RIO BONITO', '', 'Rua 11, 110', '',
+                  'Associação Privada', 'ATIVA', 4113700, 'Londrina'])
+    return pd.DataFrame(novas, columns=COLUNAS)
+
+
+def conteudo(conn, tabela):
+    return sorted(conn.execute(f"SELECT * FROM {tabela}").fetchall())
+
+
+class AtualizacaoIncrementalTests(BancoTestCase):
+    """user-042: atualização aplicando só as OSCs alteradas"""
+
+    def test_relatorio_e_dados(self):
+        conn = self.copia('incremental.db')
+        relatorio = updates.update_from_dataframe(conn, nova_saida(), origem='teste.csv')
+        self.assertEqual(
+            (relatorio['inseridos'], relatorio['alterados'], relatorio['removidos'], relatorio['inalterados']),
+            (1, 2, 1, 7),
+        )
+        self.assertEqual(relatorio['colunas_alteradas'], {'nome': 1, 'telefone': 1})
+        self.assertEqual(relatorio['exemplos_alterados'], [2, 5])
+        self.assertEqual(
+            sorted(id_osc for (id_osc,) in conn.execute("SELECT id_osc FROM oscs")),
+            [1, 2, 3, 4, 5, 7, 8, 9, 10, 11],
+        )
+        self.assertEqual(summary.read_summary(conn)['total'], 10)
+
+    def test_indices_iguais_a_reconstrucao(self):
+        conn = self.copia('incremental.db')
+        updates.update_from_dataframe(conn, nova_saida())
+        incrementais = {tabela: conteudo(conn, tabela) for tabela in (TRIGRAM_TABLE, WORDS_TABLE, NAME_TABLE)}
+
+        create_trigram_index(conn)
+        create_name_index(conn)
+        for tabela, linhas in incrementais.items():
+            with self.subTest(tabela=tabela):
+                self.assertEqual(linhas, conteudo(conn, tabela))
+
+    def test_simulacao_nao_grava(self):
+        conn = self.copia('simulacao.db')
+        relatorio = updates.update_from_dataframe(conn, nova_saida(), simular=True)
+        self.assertEqual(relatorio['removidos'], 1)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM oscs").fetchone()[0], len(OSCS))
+        self.assertFalse(history.has_history(conn))
+
+    def test_saida_sem_alteracoes(self):
+        conn = self.copia('igual.db')
+        relatorio = updates.update_from_dataframe(conn, pd.DataFrame(OSCS, columns=COLUNAS))
+        self.assertEqual(relatorio['inalterados'], len(OSCS))
+        self.assertNotIn('versao', relatorio)
+
+    def test_estrutura_diferente(self):
+        conn = self.copia('estrutura.db')
+        with self.assertRaisesRegex(ValueError, 'migração completa'):
+            updates.update_from_dataframe(conn, nova_saida().drop(columns=['email']))
+
+
+class HistoricoTests(BancoTestCase):
+    """user-043: histórico de versões e filtro alterado_desde"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Banco com uma atualização incremental sobre o estado inicial (versão 1)
+        cls.atualizado = cls.diretorio / 'atualizado.db'
+        shutil.copyfile(cls.db_path, cls.atualizado)
+        with closing(sqlite3.connect(cls.atualizado)) as conn:
+            updates.update_from_dataframe(conn, nova_saida(), origem='teste.csv')
+
+    def filtrar_atualizado(self, **payload):
+        with override_settings(OSC_DB_PATH=str(self.atualizado)):
+            return self.post_json('/filter/', payload)
+
+    def test_alteradas_desde_a_versao(self):
+        resultado = self.filtrar_atualizado(alterado_desde=1).json()
+        # A OSC removida não aparece
+        self.assertEqual(sorted(linha['id_osc'] for linha in resultado['data']), [2, 5, 11])
+        self.assertEqual(self.filtrar_atualizado(alterado_desde=2).json()['total'], 0)
+
+    def test_ponto_anterior_a_carga_completa_responde_400(self):
+        for desde in [0, '2000-01-01']:
+            with self.subTest(desde=desde):
+                response = self.filtrar_atualizado(alterado_desde=desde)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('versão 1', response.json()['error'])
+
+    def test_banco_sem_historico_responde_400(self):
+        response = self.post_json('/filter/', {'alterado_desde': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('histórico', response.json()['error'])
+
+    def test_valor_invalido_responde_400(self):
+        self.assertEqual(self.filtrar_atualizado(alterado_desde='ontem').status_code, 400)
+
+    def test_lista_de_versoes(self):
+        with override_settings(OSC_DB_PATH=str(self.atualizado)):
+            versoes = self.client.get('/versoes/').json()['versoes']
+        self.assertEqual([(v['versao'], v['tipo']) for v in versoes], [(2, 'incremental'), (1, 'completa')])
+        self.assertEqual((versoes[0]['inseridos'], versoes[0]['alterados'], versoes[0]['removidos']), (1, 2, 1))
+        self.assertEqual(views.incremental_versions(versoes), versoes[:1])
+
+
+class AquecimentoTests(BancoTestCase):
+    """user-044: aquecimento do worker na inicialização"""
+
+    def test_so_processos_que_servem_requisicoes_aquecem(self):
+        casos = [
+            (['/usr/bin/gunicorn', 'dashboard_osc.wsgi:application'], {}, True),
+            (['/venv/lib/python3.11/site-packages/uvicorn/__main__.py', 'dashboard_osc.asgi:application'], {}, True),
+            (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+            (['manage.py', 'runserver', '--noreload'], {}, True),
+            # Processo do autoreloader, que só vigia os arquivos
+            (['manage.py', 'runserver'], {}, False),
+            (['manage.py', 'test', 'osc_dashboard'], {}, False),
+            (['benchmarks/carga.py'], {}, False),
+        ]
+        for argv, ambiente, esperado in casos:
+            with self.subTest(argv=argv, ambiente=ambiente), \
+                    mock.patch.object(sys, 'argv', argv), \
+                    mock.patch.dict(os.environ, ambiente, clear=True), \
+                    mock.patch.object(multiprocessing, 'parent_process', return_value=None):
+                self.assertEqual(apps._servindo_requisicoes(), esperado)
+
+    def test_processo_do_pool_de_exportacao_nao_aquece(self):
+        with mock.patch.object(sys, 'argv', ['gunicorn']), \
+                mock.patch.object(multiprocessing, 'parent_process', return_value=object()):
+            self.assertFalse(apps._servindo_requisicoes())
+
+    def test_aquece_uma_vez_por_processo(self):
+        with mock.patch.object(warmup, '_aquecido', False), \
+                mock.patch.object(warmup.logger, 'warning') as aviso:
+            tempos = warmup.warm_worker()
+            self.assertIsNone(warmup.warm_worker())
+        aviso.assert_not_called()
+        self.assertEqual(set(tempos), {'banco', 'opcoes', 'template', 'primeira_pagina', 'consultas'})
+        # As consultas representativas ficam no cache de resultados
+        self.assertGreaterEqual(result_cache.stats()['entradas'], 3)
+
+
+class PerfilamentoTests(BancoTestCase):
+    """user-045: perfilamento sob demanda, relatórios só para staff"""
+
+    configuracoes = {'PROFILING_ENABLED': True}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(shutil.rmtree, self.diretorio / 'perfis', True)
+
+    def test_anonimo_nao_perfila(self):
+        response = self.client.post('/filter/?perfil=1', '{}', content_type='application/json', HTTP_X_PERFIL='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Perfil-Relatorio', response)
+        self.assertEqual(profiling.list_reports(), [])
+
+    def test_token_assinado_perfila(self):
+        response = self.client.post(
+            '/filter/', json.dumps({'municipio': 'Curitiba'}), content_type='application/json',
+            HTTP_X_PERFIL=profiling.create_token(),
+        )
+        self.assertIn('X-Perfil-Relatorio', response)
+        self.assertFalse(profiling.valid_token('perfil:falso'))
+
+        # O relatório é servido só para staff
+        url = response['X-Perfil-Relatorio']
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('equipe', is_staff=True))
+        relatorio = self.client.get(url).json()
+        self.assertGreater(relatorio['sql_consultas'], 0)
+        self.assertTrue(any('Curitiba' in consulta['parametros'] for consulta in relatorio['consultas']))
+        self.assertIn('cumulative', self.client.get(url, {'formato': 'texto'}).content.decode())
+        self.assertEqual([r['id'] for r in self.client.get('/perfis/').json()['relatorios']], [relatorio['id']])
+
+    def test_staff_pede_o_perfil(self):
+        self.client.force_login(User.objects.create_user('equipe', is_staff=True))
+        response = self.client.post('/filter/', '{}', content_type='application/json', HTTP_X_PERFIL='1')
+        self.assertIn('X-Perfil-Relatorio', response)
+        self.assertEqual(self.client.get(f'/perfis/{"0" * 32}/').status_code, 404)
+
+
+class AdmissaoTests(BancoTestCase):
+    """user-046: vagas compartilhadas entre workers e limite por cliente"""
+
+    configuracoes = {
+        'ADMISSION_WAIT': 0.2,
+        'ADMISSION_CONCURRENCY': {'exportacao': 1, 'analise': 1, 'lote': 1},
+        'ADMISSION_RATE': {'exportacao': (2, 60), 'lote': (2, 60)},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(shutil.rmtree, self.diretorio / 'admissao', True)
+
+    def ocupar(self, endpoint):
+        """Ocupa a única vaga do endpoint, como outro worker faria"""
+        vaga = admission._try_acquire(endpoint, 1)
+        self.assertIsNotNone(vaga)
+        return vaga
+
+    def exportar(self):
+        return self.post_json('/export/', {'municipio': 'Maringá'})
+
+    def test_sem_vaga_espera_e_responde_503(self):
+        vaga = self.ocupar('exportacao')
+        inicio = time.monotonic()
+        response = self.exportar()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(admission.RETRY_AFTER_OCUPADO))
+        admission._release('exportacao', vaga)
+        self.assertEqual(self.exportar().status_code, 200)
+
+    def test_vaga_liberada_durante_a_espera(self):
+        vaga = self.ocupar('analise')
+        threading.Timer(0.05, admission._release, ['analise', vaga]).start()
+        self.assertEqual(self.post_json('/analise/', {}).status_code, 200)
+
+    def test_recusa_por_falta_de_vaga_nao_conta_no_limite_do_cliente(self):
+        vaga = self.ocupar('exportacao')
+        self.assertEqual(self.exportar().status_code, 503)
+        admission._release('exportacao', vaga)
+        self.assertEqual([self.exportar().status_code for _ in range(3)], [200, 200, 429])
+
+    def test_tarefa_em_segundo_plano_espera_a_vaga(self):
+        filtros = parse_filters({'municipio': 'Curitiba'})
+        filtros['estados'] = ['PR']
+        job_id = 'a' * 20
+        job = {'status': exports.PENDENTE, 'progresso': 0, 'linhas': None, 'erro': None, 'arquivo': None}
+        exports._write_job(job_id, job)
+
+        vaga = self.ocupar('exportacao')
+        tarefa = threading.Thread(target=exports._run_export, args=(job_id, job, filtros, '', views.get_db_connection))
+        tarefa.start()
+        time.sleep(0.2)
+        self.assertEqual(exports.read_job(job_id)['status'], exports.PENDENTE)
+
+        admission._release('exportacao', vaga)
+        tarefa.join(10)
+        self.assertEqual(exports.read_job(job_id)['status'], exports.CONCLUIDO)
+        # A tarefa devolveu a vaga
+        admission._release('exportacao', self.ocupar('exportacao'))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PrimeiraPaginaTests(BancoTestCase):
+    """user-047: primeira página embutida no HTML do dashboard"""
+
+    def setUp(self):
+        super().setUp()
+        self.limpar()
+        self.addCleanup(self.limpar)
+
+    def limpar(self):
+        self.esperar_montagem()
+        views._primeira_pagina.update(versao=None, json=None, montando=None)
+
+    def esperar_montagem(self, limite=10):
+        for thread in threading.enumerate():
+            if thread.name == 'primeira-pagina':
+                thread.join(limite)
+
+    def test_monta_fora_da_requisicao(self):
+        # Sem a página pronta a requisição não espera: a montagem vai para uma thread
+        self.assertIsNone(views.cached_first_page())
+        self.esperar_montagem()
+        pagina = json.loads(views.cached_first_page())
+        self.assertEqual(pagina['total'], len(OSCS))
+        self.assertEqual(len(pagina['data']), len(OSCS))
+
+    def test_chave_pela_versao_do_banco(self):
+        primeira = views.get_first_page_json()
+        with mock.patch.object(views, 'filter_results', side_effect=AssertionError):
+            self.assertIs(views.get_first_page_json(), primeira)
+        with mock.patch.object(views, 'states_version', return_value='outra'), \
+                mock.patch.object(views, 'filter_results', return_value={'total': 0, 'data': []}) as consulta:
+            self.assertEqual(json.loads(views.get_first_page_json()), {'total': 0, 'data': []})
+        consulta.assert_called_once_with(views.PRIMEIRA_PAGINA)
+
+    def test_json_escapado_para_a_tag_script(self):
+        with mock.patch.object(views, 'filter_results', return_value={'nome': '</script><b>&'}):
+            conteudo = views.get_first_page_json()
+        self.assertNotIn('<', conteudo)
+        self.assertEqual(json.loads(conteudo), {'nome': '</script><b>&'})
+
+    def test_dashboard_embute_a_pagina(self):
+        self.assertNotIn('data-primeira-pagina', self.client.get('/').content.decode())
+        self.esperar_montagem()
+        html = self.client.get('/').content.decode()
+        self.assertIn('data-primeira-pagina', html)
+        self.assertIn(views._primeira_pagina['json'], html)
+
+
+class JanelaPaginasTests(BancoTestCase):
+    """user-048: páginas serializadas guardadas na entrada do cache"""
+
+    def test_proxima_pagina_sai_da_entrada(self):
+        payload = {'municipio': 'Curitiba,Maringá', 'per_page': 2}
+        primeira = self.filtrar(**payload, page=1)
+        with mock.patch.object(views, 'read_rows', side_effect=AssertionError):
+            segunda = self.filtrar(**payload, page=2)
+        with mock.patch.object(result_cache, 'max_entries', 0):
+            self.assertEqual(self.filtrar(**payload, page=2)['data'], segunda['data'])
+        self.assertNotEqual(primeira['data'], segunda['data'])
+
+        # A terceira página, a última, não lê uma quarta inexistente
+        self.filtrar(**payload, page=3)
+        entry = next(iter(result_cache._entries.values()))
+        self.assertEqual(sorted(entry['paginas']), [(2, 1), (2, 2), (2, 3)])
+
+    def test_despejo_das_paginas_mais_antigas(self):
+        self.assertEqual(JANELA_PAGINAS, 2)
+        entry = {'paginas': {}}
+        for page in range(1, PAGINAS_POR_ENTRADA + 3):
+            store_pages(entry, 10, {page: [page]})
+        self.assertEqual(len(entry['paginas']), PAGINAS_POR_ENTRADA)
+        self.assertIsNone(cached_page(entry, 1, 10))
+        self.assertIsNone(cached_page(entry, 2, 10))
+        self.assertEqual(cached_page(entry, 3, 10), [3])
+        # Regravar uma página a torna a mais recente
+        store_pages(entry, 10, {3: [3]})
+        store_pages(entry, 10, {99: []})
+        self.assertEqual(cached_page(entry, 3, 10), [3])
+        self.assertIsNone(cached_page(entry, 4, 10))
+        # Tamanhos de página diferentes não se misturam
+        self.assertIsNone(cached_page(entry, 3, 20))
+
+
+class PacotesEstaticosTests(BancoTestCase):
+    """user-049: pacotes de scripts gerados no collectstatic"""
+
+    def renderizar(self, pacote):
+        return Template("{% load bundles %}{% bundle_scripts pacote %}").render(Context({'pacote': pacote}))
+
+    def test_pacote_concatena_na_ordem(self):
+        origem = FileSystemStorage(location=self.diretorio / 'origem')
+        origem.save('js/a.js', ContentFile('function a() {\n    return 1;\n}\n'))
+        origem.save('js/b.js', ContentFile('// comentário\nvar b = a()\n'))
+        pacote = staticfiles.build_bundle(origem, ['js/b.js', 'js/a.js'])
+        self.assertLess(pacote.index('/* js/b.js */'), pacote.index('/* js/a.js */'))
+        # Cada arquivo termina em ';', mesmo sem ponto e vírgula no fim
+        self.assertEqual(pacote.count('\n;\n'), 2)
+
+    @skipIf(staticfiles.rjsmin is None, 'rjsmin não instalado')
+    def test_pacote_minificado(self):
+        self.assertEqual(staticfiles.minify_js('// comentário\nvar b = a()\n'), 'var b=a()')
+
+    def test_collectstatic_gera_o_pacote(self):
+        destino = self.diretorio / 'staticfiles'
+        with override_settings(STATIC_ROOT=str(destino), STATIC_BUNDLES_ENABLED=True):
+            # O storage informa o tamanho de cada pacote com print
+            with mock.patch.object(sys, 'stdout', io.StringIO()):
+                call_command('collectstatic', interactive=False, verbosity=0)
+            html = self.renderizar('js/dashboard.bundle.js')
+        self.assertEqual(html.count('<script'), 1)
+        self.assertRegex(html, r'/static/js/dashboard\.bundle\.[0-9a-f]{12}\.js')
+        manifesto = json.loads((destino / 'staticfiles.json').read_text())
+        self.assertIn('js/base.bundle.js', manifesto['paths'])
+
+    @override_settings(STATIC_BUNDLES_ENABLED=True)
+    def test_manifesto_sem_o_pacote_usa_os_arquivos(self):
+        def static(nome):
+            if nome.endswith('.bundle.js'):
+                raise ValueError(f"Missing staticfiles manifest entry for '{nome}'")
+            return f'/static/{nome}'
+
+        with mock.patch.object(bundles, 'static', side_effect=static):
+            html = self.renderizar('js/dashboard.bundle.js')
+        self.assertEqual(html, '<script src="/static/js/mapa_temp.js"></script>\n'
+                               '<script src="/static/js/dashboard.js"></script>')
+
+    @override_settings(STATIC_BUNDLES_ENABLED=False,
+                       STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_desativado_usa_os_arquivos(self):
+        html = self.renderizar('js/base.bundle.js')
+        self.assertEqual(html.count('<script'), 2)
+        self.assertLess(html.index('modern-table.js'), html.index('osc-table.js'))
+
+
+class ConsultaEmLoteTests(BancoTestCase):
+    """user-050: consulta em lote por ids ou nomes"""
+
+    configuracoes = {'ADMISSION_WAIT': 0, 'ADMISSION_CONCURRENCY': {'lote': 1}, 'ADMISSION_RATE': {}}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(shutil.rmtree, self.diretorio / 'admissao', True)
+
+    def enviar(self, nome, conteudo, **campos):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode('utf-8'))
+        return self.client.post('/lote/', {'arquivo': arquivo, **campos})
+
+    def ler_csv(self, response):
+        self.assertEqual(response.status_code, 200)
+        texto = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(texto), delimiter=';'))
+
+    def test_por_ids(self):
+        response = self.enviar('parceiros.csv', 'id_osc;obs\n2;=cmd\n99;-5\n')
+        self.assertEqual(response['X-Lote-Modo'], 'id')
+        self.assertEqual((response['X-Lote-Linhas'], response['X-Lote-Encontradas']), ('2', '1'))
+        cabecalho, encontrada, ausente = self.ler_csv(response)
+        self.assertEqual(cabecalho[:3], ['id_osc', 'obs', 'Correspondências'])
+        # Fórmulas neutralizadas; números e telefones intactos
+        self.assertEqual(encontrada[:4], ['2', "'=cmd", '1', '2'])
+        self.assertIn('+55 41 3333-0002', encontrada)
+        self.assertEqual(ausente[:3], ['99', '-5', '0'])
+
+    def test_por_nomes(self):
+        response = self.enviar('parceiros.csv', 'Nome da OSC;x\ninstituto ambiental do parana;1\nclube de maes agua limpa;2\n')
+        self.assertEqual(response['X-Lote-Modo'], 'nome')
+        linhas = self.ler_csv(response)
+        self.assertEqual([linha[3] for linha in linhas[1:]], ['2', '4'])
+
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['id', 'obs'])
+        workbook.active.append([10, '=1+1'])
+        workbook.active['B2'].data_type = 's'
+        planilha = io.BytesIO()
+        workbook.save(planilha)
+        response = self.client.post('/lote/', {'arquivo': SimpleUploadedFile('lote.xlsx', planilha.getvalue())})
+        self.assertEqual(response.status_code, 200)
+        resultado = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        response.close()
+        linha = resultado.active[2]
+        self.assertEqual([celula.value for celula in linha[:4]], ['10', '=1+1', 1, 10])
+        # Gravado como texto, não como fórmula
+        self.assertEqual(linha[1].data_type, 's')
+
+    def test_sem_indice_de_nomes(self):
+        with mock.patch.object(lookup, 'has_name_index', return_value=False):
+            response = self.enviar('parceiros.csv', 'nome\nclube de maes\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('criar_indice_nomes', response.json()['error'])
+        # A vaga foi devolvida com o erro
+        admission._release('lote', admission._try_acquire('lote', 1))
+
+    def test_vaga_ocupada_ate_o_fim_do_envio(self):
+        response = self.enviar('parceiros.csv', 'id_osc\n1\n2\n')
+        self.assertEqual(response.status_code, 200)
+        # O CSV ainda não foi lido do banco: a vaga continua com a resposta
+        self.assertIsNone(admission._try_acquire('lote', 1))
+        self.assertEqual(self.enviar('parceiros.csv', 'id_osc\n3\n').status_code, 503)
+        response.close()
+        admission._release('lote', admission._try_acquire('lote', 1))
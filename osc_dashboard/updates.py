@@ -0,0 +1,195 @@
+"""
+Atualização incremental da tabela oscs a partir de uma nova saída do pipeline
+
+Em vez de recriar a tabela, a nova saída é carregada em uma tabela
+temporária com os mesmos tipos da tabela oscs, comparada com ela por id_osc
+e coluna a coluna (comparação que trata NULL como valor), e só as OSCs
+inseridas, alteradas e removidas são aplicadas. Tudo acontece em uma única
+transação, junto com a atualização dos postings de trigramas das OSCs
+afetadas, o registro da versão no histórico (com as OSCs alteradas) e o
+recálculo do resumo: leitores veem a versão anterior ou a nova, nunca uma
+mistura.
+"""
+
+import pandas as pd
+
+from .history import INCREMENTAL, record_version
+from .search import NAME_TABLE, WORDS_TABLE, update_name_index, update_trigram_index
+from .summary import create_summary_table
+
+TABELA_NOVA = 'oscs_novos'
+TABELA_ALTERACOES = 'oscs_alteracoes'
+
+INSERIDO = 'inserido'
+ALTERADO = 'alterado'
+REMOVIDO = 'removido'
+
+# Quantidade de id_osc de exemplo por tipo de alteração no relatório
+EXEMPLOS = 10
+
+
+def table_columns(conn):
+    """Colunas da tabela oscs, na ordem da tabela"""
+    return [row[1] for row in conn.execute("PRAGMA table_info(oscs)")]
+
+
+def _has_table(conn, nome):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [nome]
+    ).fetchone() is not None
+
+
+def stage_rows(conn, df):
+    """
+    Carrega o DataFrame na tabela temporária oscs_novos (mesmos tipos da
+    tabela oscs). Linhas sem id_osc são descartadas e, para id_osc
+    repetidos, vale a última linha. Retorna (carregadas, descartadas).
+    """
+    colunas = table_columns(conn)
+    faltando = [coluna for coluna in colunas if coluna not in df.columns]
+    extras = [coluna for coluna in df.columns if coluna not in colunas]
+    if faltando or extras:
+        raise ValueError(
+            "A estrutura da nova saída difere da tabela oscs "
+            f"(faltando: {', '.join(faltando) or '-'}; extras: {', '.join(extras) or '-'}); "
+            "use a migração completa"
+        )
+
+    total = len(df)
+    df = df.dropna(subset=['id_osc']).drop_duplicates(subset=['id_osc'], keep='last')
+    df = df[colunas].astype(object).where(df[colunas].notna(), None)
+
+    conn.execute(f"DROP TABLE IF EXISTS temp.{TABELA_NOVA}")
+    conn.execute(f"CREATE TEMP TABLE {TABELA_NOVA} AS SELECT * FROM main.oscs WHERE 0")
+    conn.executemany(
+        f"INSERT INTO temp.{TABELA_NOVA} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})",
+        df.itertuples(index=False, name=None),
+    )
+    conn.execute(f"CREATE INDEX temp.idx_{TABELA_NOVA}_id ON {TABELA_NOVA}(id_osc)")
+    return len(df), total - len(df)
+
+
+def diff_rows(conn):
+    """
+    Compara oscs_novos com a tabela oscs e grava em oscs_alteracoes
+    (id_osc, tipo) as OSCs inseridas, alteradas e removidas. Retorna as
+    contagens de alterações por coluna.
+    """
+    colunas = [coluna for coluna in table_columns(conn) if coluna != 'id_osc']
+    diferente = ' OR '.join(f"o.{coluna} IS NOT n.{coluna}" for coluna in colunas)
+
+    conn.execute(f"DROP TABLE IF EXISTS temp.{TABELA_ALTERACOES}")
+    conn.execute(f"CREATE TEMP TABLE {TABELA_ALTERACOES} (id_osc INTEGER PRIMARY KEY, tipo TEXT NOT NULL)")
+    conn.execute(f"""
+        INSERT INTO {TABELA_ALTERACOES} (id_osc, tipo)
+        SELECT n.id_osc, '{INSERIDO}' FROM {TABELA_NOVA} n
+        WHERE NOT EXISTS (SELECT 1 FROM main.oscs o WHERE o.id_osc = n.id_osc)
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO {TABELA_ALTERACOES} (id_osc, tipo)
+        SELECT DISTINCT o.id_osc, '{REMOVIDO}' FROM main.oscs o
+        WHERE o.id_osc IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM {TABELA_NOVA} n WHERE n.id_osc = o.id_osc)
+    """)
+
+    contagens = conn.execute(f"""
+        SELECT {', '.join(f'SUM(o.{coluna} IS NOT n.{coluna})' for coluna in colunas)}
+        FROM {TABELA_NOVA} n JOIN main.oscs o ON o.id_osc = n.id_osc
+        WHERE {diferente}
+    """).fetchone()
+    conn.execute(f"""
+        INSERT OR IGNORE INTO {TABELA_ALTERACOES} (id_osc, tipo)
+        SELECT DISTINCT n.id_osc, '{ALTERADO}' FROM {TABELA_NOVA} n JOIN main.oscs o ON o.id_osc = n.id_osc
+        WHERE {diferente}
+    """)
+    return {coluna: total for coluna, total in zip(colunas, contagens) if total}
+
+
+def apply_changes(conn):
+    """Aplica as alterações de oscs_alteracoes na tabela oscs, nos postings de trigramas e no índice de nomes"""
+    colunas = table_columns(conn)
+    ids_tipo = f"SELECT id_osc FROM {TABELA_ALTERACOES} WHERE tipo = ?"
+
+    # Nomes anteriores das OSCs removidas ou com nome alterado (postings a retirar)
+    nomes_antigos = conn.execute(f"""
+        SELECT o.id_osc, o.nome FROM main.oscs o
+        JOIN {TABELA_ALTERACOES} a ON a.id_osc = o.id_osc
+        LEFT JOIN {TABELA_NOVA} n ON n.id_osc = o.id_osc
+        WHERE a.tipo = '{REMOVIDO}' OR (a.tipo = '{ALTERADO}' AND o.nome IS NOT n.nome)
+    """).fetchall()
+    reindexar = [row[0] for row in conn.execute(f"""
+        SELECT a.id_osc FROM {TABELA_ALTERACOES} a
+        WHERE a.tipo = '{INSERIDO}'
+           OR (a.tipo = '{ALTERADO}' AND EXISTS (
+               SELECT 1 FROM main.oscs o JOIN {TABELA_NOVA} n ON n.id_osc = o.id_osc
+               WHERE o.id_osc = a.id_osc AND o.nome IS NOT n.nome))
+    """)]
+
+    conn.execute(f"DELETE FROM main.oscs WHERE id_osc IN ({ids_tipo})", [REMOVIDO])
+    atribuicoes = ', '.join(f"{coluna} = n.{coluna}" for coluna in colunas if coluna != 'id_osc')
+    conn.execute(f"""
+        UPDATE main.oscs SET {atribuicoes}
+        FROM {TABELA_NOVA} n
+        WHERE n.id_osc = oscs.id_osc AND oscs.id_osc IN ({ids_tipo})
+    """, [ALTERADO])
+    conn.execute(f"""
+        INSERT INTO main.oscs ({', '.join(colunas)})
+        SELECT {', '.join(colunas)} FROM {TABELA_NOVA} WHERE id_osc IN ({ids_tipo})
+    """, [INSERIDO])
+
+    if _has_table(conn, WORDS_TABLE):
+        update_trigram_index(conn, nomes_antigos, reindexar)
+    if _has_table(conn, NAME_TABLE):
+        update_name_index(conn, nomes_antigos, reindexar)
+
+
+def update_from_dataframe(conn, df, simular=False, origem=None):
+    """
+    Atualiza a tabela oscs com o DataFrame da nova saída do pipeline,
+    registra a versão no histórico (origem descreve a saída, ex.: nome do
+    CSV) e retorna o relatório das alterações. Com simular=True nada é gravado.
+    """
+    try:
+        carregadas, descartadas = stage_rows(conn, df)
+        colunas_alteradas = diff_rows(conn)
+
+        relatorio = {
+            'linhas_novas': carregadas,
+            'linhas_descartadas': descartadas,
+            'colunas_alteradas': colunas_alteradas,
+        }
+        for tipo in (INSERIDO, ALTERADO, REMOVIDO):
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id_osc FROM {TABELA_ALTERACOES} WHERE tipo = ? ORDER BY id_osc", [tipo]
+            )]
+            relatorio[f'{tipo}s'] = len(ids)
+            relatorio[f'exemplos_{tipo}s'] = ids[:EXEMPLOS]
+        relatorio['inalterados'] = carregadas - relatorio['inseridos'] - relatorio['alterados']
+
+        if simular:
+            conn.rollback()
+            return relatorio
+
+        if relatorio['inseridos'] or relatorio['alterados'] or relatorio['removidos']:
+            apply_changes(conn)
+            relatorio['versao'] = record_version(
+                conn, INCREMENTAL, origem,
+                relatorio['inseridos'], relatorio['alterados'], relatorio['removidos'],
+                alteracoes=f"SELECT id_osc, tipo FROM temp.{TABELA_ALTERACOES}",
+            )
+            # O resumo é gravado por último; seu commit fecha a transação inteira
+            create_summary_table(conn)
+        else:
+            conn.rollback()
+        return relatorio
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{TABELA_NOVA}")
+        conn.execute(f"DROP TABLE IF EXISTS temp.{TABELA_ALTERACOES}")
+
+
+def read_pipeline_csv(csv_path):
+    """Lê a saída do pipeline como a migração completa (mesma conversão de tipos)"""
+    return pd.read_csv(csv_path, encoding='utf-8')
@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'osc_dashboard'
 
+# No modo ASGI as views de leitura assíncronas substituem as síncronas
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
-    path('export/', views.export_data, name='export_data'),
-    path('filter/', views.filter_data, name='filter_data'),
+    path('export/', read_views.export_data, name='export_data'),
+    path('export/jobs/', views.export_job_create, name='export_job_create'),
+    path('export/jobs/<str:job_id>/', views.export_job_status, name='export_job_status'),
+    path('export/jobs/<str:job_id>/download/', views.export_job_download, name='export_job_download'),
+    path('lote/', views.batch_lookup, name='batch_lookup'),
+    path('filter/', read_views.filter_data, name='filter_data'),
     path('mapa-teste/', views.mapa_teste, name='mapa_teste'),
-    path('municipios-data/', views.get_municipios_data, name='municipios_data'),
+    path('municipios-data/', read_views.get_municipios_data, name='municipios_data'),
+    path('analise/', read_views.analytics_data, name='analytics_data'),
+    path('resumo/', views.summary_data, name='summary_data'),
+    path('versoes/', views.version_history, name='version_history'),
+    path('perfis/', views.profile_reports, name='profile_reports'),
+    path('perfis/<str:relatorio_id>/', views.profile_report, name='profile_report'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
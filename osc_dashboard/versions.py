@@ -0,0 +1,215 @@
+"""
+Versões publicadas do banco do estado padrão e troca sem reinício
+
+Cada publicação copia o banco para OSC_VERSOES_DIR/<hash>.db (arquivo
+imutável, nomeado pelo conteúdo) e troca atomicamente o ponteiro
+OSC_VERSOES_DIR/current, um arquivo texto com o nome da versão ativa.
+
+Cada worker confere o ponteiro a cada requisição (um stat). Ao ver uma
+versão nova, continua servindo a anterior enquanto uma thread aquece a nova
+(resumo, índice de bitmaps e páginas dos índices) e só então passa a usá-la;
+logo após a troca, a consulta sem filtros é calculada no cache de resultados.
+As conexões são abertas por requisição: as que já estavam abertas terminam
+na versão anterior, que fica em disco até sair da retenção
+(OSC_VERSOES_MANTER). Sem ponteiro, vale OSC_DB_PATH.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PONTEIRO = 'current'
+EXTENSAO = '.db'
+
+_lock = threading.Lock()
+_estado = {'ponteiro': None, 'destino': None, 'ativo': None, 'aquecendo': None}
+
+
+def versions_dir():
+    return Path(settings.OSC_VERSOES_DIR)
+
+
+def file_hash(caminho):
+    """Hash do conteúdo do arquivo (identificador da versão)"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()[:16]
+
+
+def _copy_atomic(origem, destino):
+    temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+    shutil.copyfile(origem, temporario)
+    os.replace(temporario, destino)
+
+
+def _write_pointer(nome):
+    ponteiro = versions_dir() / PONTEIRO
+    temporario = ponteiro.with_name(f'{PONTEIRO}.{os.getpid()}.tmp')
+    temporario.write_text(nome, encoding='utf-8')
+    os.replace(temporario, ponteiro)
+
+
+def list_versions():
+    """Versões publicadas, da mais recente para a mais antiga"""
+    diretorio = versions_dir()
+    if not diretorio.is_dir():
+        return []
+    return sorted(diretorio.glob(f'*{EXTENSAO}'), key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def current_version_path():
+    """Caminho da versão apontada pelo ponteiro (None sem versões publicadas)"""
+    ponteiro = versions_dir() / PONTEIRO
+    try:
+        stat = ponteiro.stat()
+    except OSError:
+        return None
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _estado['ponteiro'] != assinatura:
+            nome = ponteiro.read_text(encoding='utf-8').strip()
+            _estado['destino'] = versions_dir() / nome if nome else None
+            _estado['ponteiro'] = assinatura
+        return _estado['destino']
+
+
+def publish_version(db_path, manter=None):
+    """
+    Publica o banco como nova versão ativa (o snapshot Parquet atualizado vai
+    junto) e remove as versões fora da retenção. Retorna o caminho publicado.
+    """
+    from .analytics import snapshot_path
+
+    diretorio = versions_dir()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    destino = diretorio / f'{file_hash(db_path)}{EXTENSAO}'
+    if not destino.exists():
+        _copy_atomic(Path(db_path), destino)
+
+    snapshot = snapshot_path(db_path)
+    if snapshot.exists() and snapshot.stat().st_mtime >= Path(db_path).stat().st_mtime:
+        _copy_atomic(snapshot, snapshot_path(destino))
+
+    _write_pointer(destino.name)
+    prune_versions(manter)
+    return destino
+
+
+def activate_version(nome):
+    """Aponta o ponteiro para uma versão já publicada (ex.: para voltar à anterior)"""
+    destino = versions_dir() / (nome if nome.endswith(EXTENSAO) else f'{nome}{EXTENSAO}')
+    if not destino.exists():
+        raise ValueError(f"Versão não encontrada: {destino.name}")
+    _write_pointer(destino.name)
+    return destino
+
+
+def prune_versions(manter=None):
+    """Remove as versões mais antigas além das OSC_VERSOES_MANTER mais recentes (nunca a ativa)"""
+    from .analytics import snapshot_path
+
+    manter = manter or settings.OSC_VERSOES_MANTER
+    atual = current_version_path()
+    for caminho in list_versions()[manter:]:
+        if atual is not None and caminho.name == atual.name:
+            continue
+        for arquivo in (caminho, snapshot_path(caminho)):
+            try:
+                arquivo.unlink()
+            except OSError:
+                pass
+
+
+def warm_version(db_path):
+    """Carrega o resumo e o índice de bitmaps da versão e pré-lê as páginas dos índices"""
+    from .bitmap import get_bitmap_index
+    from .instrumentation import TracedConnection
+    from .summary import get_summary
+
+    def connect():
+        return sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, factory=TracedConnection)
+
+    get_summary(db_path, connect)
+    if settings.FILTER_ENGINE == 'bitmap':
+        get_bitmap_index(db_path, connect)
+
+    conn = connect()
+    try:
+        indices = [nome for (nome,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'oscs'"
+        )]
+        for indice in indices:
+            conn.execute(f"SELECT COUNT(*) FROM oscs INDEXED BY {indice}").fetchone()
+    finally:
+        conn.close()
+
+
+def warm_landing_query(db_path):
+    """Calcula no cache de resultados a consulta sem filtros (a primeira página do dashboard)"""
+    from .cache import canonical_filters, compute_entry, result_cache
+    from .filters import parse_filters
+    from .partitions import default_state, states_version
+
+    if not result_cache.enabled:
+        return
+    filtros = parse_filters({})
+    filtros['estados'] = [default_state()]
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        result_cache.get_or_compute(states_version(), canonical_filters(filtros), lambda: compute_entry(conn, filtros))
+    finally:
+        conn.close()
+
+
+def _warm_and_switch(destino):
+    inicio = time.perf_counter()
+    try:
+        warm_version(destino)
+        logger.info(f"Versão {destino.name} aquecida em {(time.perf_counter() - inicio) * 1000:.0f} ms; trocando")
+    except Exception:
+        logger.exception(f"Erro ao aquecer a versão {destino.name}, trocando mesmo assim")
+    with _lock:
+        if _estado['aquecendo'] == destino:
+            _estado['aquecendo'] = None
+        # Se outra versão foi publicada durante o aquecimento, ela é que será ativada
+        if _estado['destino'] != destino:
+            return
+        _estado['ativo'] = destino
+    # O cache de resultados guarda uma versão por vez: só é aquecido depois da troca
+    try:
+        warm_landing_query(destino)
+    except Exception:
+        logger.exception(f"Erro ao aquecer o cache de resultados da versão {destino.name}")
+
+
+def active_db_path():
+    """
+    Banco do estado padrão servido por este worker: a versão ativa publicada
+    ou, sem versões, OSC_DB_PATH. Uma versão nova só passa a ser servida
+    depois de aquecida em segundo plano.
+    """
+    destino = current_version_path()
+    if destino is None or not destino.exists():
+        return Path(settings.OSC_DB_PATH)
+
+    with _lock:
+        if _estado['ativo'] is None or not _estado['ativo'].exists():
+            # Primeira requisição do worker (ou versão anterior já removida): usa direto
+            _estado['ativo'] = destino
+        elif destino != _estado['ativo'] and _estado['aquecendo'] != destino:
+            _estado['aquecendo'] = destino
+            threading.Thread(
+                target=_warm_and_switch, args=(destino,), name='aquecimento-versao', daemon=True
+            ).start()
+        return _estado['ativo']
@@ -1,48 +1,109 @@
-import sqlite3
-import unicodedata
-import os
+import re
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
+import hmac
 import json
+import logging
+import sqlite3
+import threading
+from functools import wraps
 from datetime import datetime
 import pandas as pd
 
-def get_db_connection():
-    """Retorna conexão com o banco SQLite"""
-    db_path = os.path.join(settings.BASE_DIR, 'data', 'oscs_parana_novo.db')
-    return sqlite3.connect(db_path)
+from .admission import concurrency_limit, rate_limit
+from .analytics import DIMENSOES, aggregate_snapshot, aggregate_sql, get_snapshot, parse_limit, supports
+from .bitmap import BitmapIndex, get_bitmap_index, rowid_query
+from .cache import JANELA_PAGINAS, cached_page, canonical_filters, compute_entry, result_cache, store_pages
+from .exports import artifact_path, export_dataframe, export_labels, read_job, submit_export, write_workbook
+from .facets import facet_counts_sql
+from .filters import build_query, parse_filters, parse_pagination, split_values
+from .frames import get_frame
+from .history import INCREMENTAL, load_versions
+from .instrumentation import TracedConnection, histograms, measure
+from .lookup import choose_column, enriched_header, enriched_rows, iter_rows, lookup, read_upload, stream_csv, write_xlsx
+from .partitions import connect_states, default_state, resolve_states, state_databases, states_version
+from .profiling import list_reports, read_report
+from .summary import get_summary
+from .versions import active_db_path
+
+logger = logging.getLogger(__name__)
+
+def get_db_path():
+    """Retorna o caminho do banco SQLite das OSCs do estado padrão (versão ativa do worker)"""
+    return active_db_path()
+
+def get_db_connection(estados=None):
+    """
+    Retorna conexão com o banco SQLite (rastreada pela instrumentação de performance)
+
+    Sem estados, abre o banco do estado padrão; com vários, anexa os bancos
+    pedidos e expõe a união deles como "oscs".
+    """
+    return connect_states(resolve_states(estados), factory=TracedConnection)
+
+def path_connector(db_path):
+    """
+    Função que abre a conexão (rastreada) com o arquivo db_path. Os dados
+    carregados em memória por versão do banco (bitmaps, DataFrame, resumo)
+    são lidos do mesmo arquivo que dá a chave do cache, mesmo que a versão
+    ativa troque no meio da carga.
+    """
+    def connect():
+        return sqlite3.connect(db_path, factory=TracedConnection)
+    return connect
+
+def read_rows(conn, rowids, relevancias=None):
+    """Lê as linhas da tabela oscs pelos rowids, na ordem da lista"""
+    query, params = rowid_query(rowids, columns='rowid AS _rowid, *')
+    df = pd.read_sql_query(query, conn, params=params)
+    df = df.set_index('_rowid').loc[rowids].reset_index(drop=True)
+    if relevancias is not None:
+        df['relevancia'] = relevancias
+    return df
 
-def load_osc_data():
-    """Carrega os dados do banco SQLite das OSCs"""
+def get_filter_index(filtros, db_path):
+    """
+    Retorna o índice de bitmaps do banco db_path (o do estado padrão) quando
+    o motor em memória está ativo e atende aos filtros
+    """
+    if settings.FILTER_ENGINE != 'bitmap' or not BitmapIndex.supports(filtros):
+        return None
+    # O índice em memória cobre só o estado padrão
+    if filtros['estados'] != [default_state()]:
+        return None
     try:
-        conn = get_db_connection()
-        df = pd.read_sql_query("SELECT * FROM oscs", conn)
-        conn.close()
-        return df
-    except Exception as e:
-        print(f"Erro ao carregar dados do banco: {e}")
+        return get_bitmap_index(db_path, path_connector(db_path))
+    except Exception:
+        logger.exception("Erro ao carregar índice de bitmaps, usando SQLite")
+        return None
+
+def load_osc_data(colunas=None):
+    """
+    Carrega os dados do banco SQLite das OSCs em um DataFrame compacto
+    (categorias e int32), compartilhado pelo worker: não altere o resultado
+    """
+    try:
+        db_path = get_db_path()
+        return get_frame(db_path, path_connector(db_path), colunas)
+    except Exception:
+        logger.exception("Erro ao carregar dados do banco")
         return pd.DataFrame()
 
 def get_oscs_por_municipio():
-    """Retorna a contagem de OSCs por município"""
+    """Retorna a contagem de OSCs por município (a partir do resumo em memória)"""
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                edmu_nm_municipio as municipio,
-                COUNT(*) as total_oscs
-            FROM oscs 
-            WHERE edmu_nm_municipio != ''
-            GROUP BY edmu_nm_municipio
-            ORDER BY edmu_nm_municipio
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df.to_dict('records')
-    except Exception as e:
-        print(f"Erro ao obter contagem de OSCs por município: {e}")
+        resumo = get_summary_snapshot()
+        return [
+            {'municipio': municipio, 'total_oscs': total}
+            for municipio, total in resumo['por_municipio'].items()
+        ]
+    except Exception:
+        logger.exception("Erro ao obter contagem de OSCs por município")
         return []
 
 def get_municipios_data(request):
@@ -54,311 +115,553 @@ def mapa_teste(request):
     """View para testar o mapa isoladamente"""
     return render(request, 'osc_dashboard/mapa_teste.html')
 
+def get_summary_snapshot():
+    """Resumo estatístico da base (pré-calculado na migração e mantido em memória)"""
+    db_path = get_db_path()
+    return get_summary(db_path, path_connector(db_path))
+
 def get_filter_options():
-    """Obtém as opções de filtro disponíveis do banco"""
+    """Obtém as opções de filtro disponíveis do banco (a partir do resumo em memória)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Obtém municípios únicos
-        cursor.execute("SELECT DISTINCT edmu_nm_municipio FROM oscs WHERE edmu_nm_municipio != '' ORDER BY edmu_nm_municipio")
-        municipios = [row[0] for row in cursor.fetchall()]
-        
-        # Obtém naturezas jurídicas únicas
-        cursor.execute("SELECT DISTINCT natureza_juridica FROM oscs WHERE natureza_juridica != '' ORDER BY natureza_juridica")
-        naturezas_juridicas = [row[0] for row in cursor.fetchall()]
-
-        # Obtém situações cadastrais únicas
-        cursor.execute("SELECT DISTINCT situacao_cadastral FROM oscs WHERE situacao_cadastral != '' ORDER BY situacao_cadastral")
-        situacoes_cadastrais = [row[0] for row in cursor.fetchall()]
-
-        # Obtém total de registros
-        cursor.execute("SELECT COUNT(*) FROM oscs")
-        total_registros = cursor.fetchone()[0]
-
-        conn.close()
-
+        resumo = get_summary_snapshot()
         return {
-            'municipios': municipios,
-            'naturezas_juridicas': naturezas_juridicas,
-            'situacoes_cadastrais': situacoes_cadastrais,
-            'total_registros': total_registros
+            'municipios': resumo['municipios'],
+            'naturezas_juridicas': resumo['naturezas_juridicas'],
+            'situacoes_cadastrais': resumo['situacoes_cadastrais'],
+            'bacias': resumo.get('bacias', []),
+            'regioes': resumo.get('regioes', []),
+            'atualizacoes': incremental_versions(resumo.get('versoes', [])),
+            'total_registros': resumo['total']
         }
-    except Exception as e:
-        print(f"Erro ao obter opções de filtro: {e}")
+    except Exception:
+        logger.exception("Erro ao obter opções de filtro")
         return {
             'municipios': [],
             'naturezas_juridicas': [],
             'situacoes_cadastrais': [],
+            'bacias': [],
+            'regioes': [],
+            'atualizacoes': [],
             'total_registros': 0
         }
 
+def incremental_versions(versoes):
+    """Atualizações incrementais desde a última carga completa (opções do filtro alterado_desde)"""
+    atualizacoes = []
+    for versao in versoes:
+        if versao['tipo'] != INCREMENTAL:
+            break
+        atualizacoes.append(versao)
+    return atualizacoes
+
+def get_dashboard_summary():
+    """Estatísticas do resumo formatadas para os cards do dashboard"""
+    try:
+        resumo = get_summary_snapshot()
+    except Exception:
+        logger.exception("Erro ao obter resumo estatístico")
+        return None
+    total = resumo['total'] or 1
+    return {
+        'com_email': resumo['com_email'],
+        'com_email_pct': round(100 * resumo['com_email'] / total, 1),
+        'com_telefone': resumo['com_telefone'],
+        'com_telefone_pct': round(100 * resumo['com_telefone'] / total, 1),
+        'com_email_e_telefone': resumo['com_email_e_telefone'],
+        'por_situacao': sorted(resumo['por_situacao'].items(), key=lambda item: -item[1]),
+        'top_municipios': resumo['top_municipios'][:5],
+        'gerado_em': resumo['gerado_em'],
+    }
+
+def get_first_page_safe():
+    """Primeira página para o template (None se não está pronta ou em caso de erro: o JS busca em /filter/)"""
+    try:
+        return cached_first_page()
+    except Exception:
+        logger.exception("Erro ao montar a primeira página do dashboard")
+        return None
+
 def dashboard(request):
     """View principal do dashboard"""
     filter_options = get_filter_options()
 
     context = {
+        'estados': sorted(state_databases()),
+        'estado_padrao': default_state(),
         'municipios': filter_options['municipios'],  # Lista para contagem no template
         'municipios_json': json.dumps(filter_options['municipios']),  # JSON para JavaScript
         'naturezas_juridicas': filter_options['naturezas_juridicas'],
         'situacoes_cadastrais': filter_options['situacoes_cadastrais'],
-        'total_registros': filter_options['total_registros']
+        'bacias': filter_options['bacias'],
+        'regioes': filter_options['regioes'],
+        'atualizacoes': filter_options['atualizacoes'],
+        'total_registros': filter_options['total_registros'],
+        'resumo': get_dashboard_summary(),
+        'primeira_pagina_json': get_first_page_safe(),
     }
 
     return render(request, 'osc_dashboard/dashboard.html', context)
 
+def export_response(data):
+    """Monta a resposta HTTP com a planilha Excel dos dados filtrados pelo payload"""
+    # Parâmetros de filtro
+    filtros = parse_filters(data)
+    filtros['estados'] = resolve_states(filtros['estados'])
+    palavras_chave = data.get('palavras_chave', '')
+
+    # Conecta ao banco (anexando os estados pedidos)
+    conn = get_db_connection(filtros['estados'])
+    df_export = export_dataframe(conn, filtros, palavras_chave)
+    conn.close()
+
+    if df_export.empty:
+        return JsonResponse({'error': 'Nenhum dado encontrado'}, status=404)
+
+    # Gera nome do arquivo
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    rotulo, sheet_name = export_labels(filtros['estados'])
+    filename = f'OSCs_{rotulo}_{timestamp}.xlsx'
+
+    # Cria resposta HTTP com arquivo Excel
+    response = HttpResponse(
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    # Salva no Excel
+    with measure('serializacao'):
+        write_workbook(df_export, response, sheet_name)
+
+    return response
+
 @csrf_exempt
+@concurrency_limit('exportacao')
+@rate_limit('exportacao')
 def export_data(request):
     """Exporta dados filtrados para Excel usando SQLite"""
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            
-            # Parâmetros de filtro
-            municipio = data.get('municipio', '')
-            natureza_juridica = data.get('natureza_juridica', '')
-            palavras_chave = data.get('palavras_chave', '')
-            naturezas_ver = data.get('naturezas_ver', [])  # Mudança: agora são as naturezas que quer ver
-            palavras_excluir = data.get('palavras_excluir', '')
-            situacao_cadastral = data.get('situacao_cadastral', '')
-            
-            # Conecta ao banco
-            conn = get_db_connection()
-            
-            # Constrói query SQL
-            query = "SELECT id_osc, nome, email, endereco, telefone, natureza_juridica, situacao_cadastral, edmu_cd_municipio, edmu_nm_municipio FROM oscs WHERE 1=1"
-            params = []
-            
-            if municipio:
-                # Separa os municípios e faz busca OR com igualdade exata
-                municipios = [m.strip() for m in municipio.split(',') if m.strip()]
-                if municipios:
-                    municipio_conditions = []
-                    for mun in municipios:
-                        municipio_conditions.append("edmu_nm_municipio = ?")
-                        params.append(mun)
-                    query += f" AND ({' OR '.join(municipio_conditions)})"
-            
-            if natureza_juridica:
-                # Separa as naturezas jurídicas e faz busca OR com igualdade exata
-                naturezas = [n.strip() for n in natureza_juridica.split(',') if n.strip()]
-                if naturezas:
-                    natureza_conditions = []
-                    for natureza in naturezas:
-                        natureza_conditions.append("natureza_juridica = ?")
-                        params.append(natureza)
-                    query += f" AND ({' OR '.join(natureza_conditions)})"
-            
-            if palavras_chave:
-                # Busca por palavras separadas por espaço ou vírgula, ignorando acentos e case
-                def normalize(text):
-                    return unicodedata.normalize('NFKD', str(text)).encode('ASCII', 'ignore').decode('ASCII').lower()
-
-                # Separa por vírgula ou espaço
-                import re
-                keywords = [kw.strip() for kw in re.split(r'[ ,]+', palavras_chave) if kw.strip()]
-
-            if palavras_excluir:
-                # Separa as palavras para excluir e faz busca NOT LIKE
-                exclude_keywords = [kw.strip() for kw in palavras_excluir.split() if kw.strip()]
-                if exclude_keywords:
-                    exclude_conditions = []
-                    for keyword in exclude_keywords:
-                        exclude_conditions.append("nome NOT LIKE ?")
-                        params.append(f'%{keyword}%')
-                    query += f" AND ({' AND '.join(exclude_conditions)})"
-
-            if situacao_cadastral:
-                # Separa as situações cadastrais e faz busca OR com igualdade exata
-                situacoes = [s.strip() for s in situacao_cadastral.split(',') if s.strip()]
-                if situacoes:
-                    situacao_conditions = []
-                    for situacao in situacoes:
-                        situacao_conditions.append("situacao_cadastral = ?")
-                        params.append(situacao)
-                    query += f" AND ({' OR '.join(situacao_conditions)})"
-            
-            # Filtra apenas as naturezas jurídicas selecionadas
-            if naturezas_ver:
-                placeholders = ','.join(['?' for _ in naturezas_ver])
-                query += f" AND natureza_juridica IN ({placeholders})"
-                params.extend(naturezas_ver)
-            
-            # Executa query
-            df = pd.read_sql_query(query, conn, params=params)
-            # Filtra por palavras-chave no Python, ignorando acentos e case
-            if palavras_chave:
-                keywords_norm = [normalize(kw) for kw in keywords]
-                mask = df['nome'].apply(lambda x: any(kw in normalize(x) for kw in keywords_norm))
-                df = df[mask]
-            conn.close()
-
-            if df.empty:
-                return JsonResponse({'error': 'Nenhum dado encontrado'}, status=404)
-
-            # Substitui NaN por string vazia para Excel
-            df = df.fillna('')
-            
-            # Renomeia colunas para melhor visualização
-            df_export = df.copy()
-            if len(df_export.columns) == 9:
-                df_export.columns = [
-                    'ID OSC', 'Nome', 'Email', 'Endereço', 'Telefone', 
-                    'Natureza Jurídica', 'Situação Cadastral', 'Código Município', 'Município'
-                ]
-            else:
-                return JsonResponse({'error': f'Erro: número de colunas inesperado ({len(df_export.columns)}). Não foi possível exportar.'}, status=500)
-            
-            # Gera nome do arquivo
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'OSCs_Parana_{timestamp}.xlsx'
-            
-            # Cria resposta HTTP com arquivo Excel
-            response = HttpResponse(
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            # Salva no Excel
-            with pd.ExcelWriter(response, engine='openpyxl') as writer:
-                df_export.to_excel(writer, sheet_name='OSCs Paraná', index=False)
-                
-                # Ajusta largura das colunas
-                worksheet = writer.sheets['OSCs Paraná']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            return response
-            
+            return export_response(json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': f'Erro ao exportar dados: {str(e)}'}, status=500)
     
     return JsonResponse({'error': 'Método não permitido'}, status=405)
 
+def _export_job_response(job_id, job):
+    """Resposta JSON com o estado de uma tarefa de exportação"""
+    resultado = {
+        'job_id': job_id,
+        'status': job['status'],
+        'progresso': job['progresso'],
+        'linhas': job['linhas'],
+        'erro': job['erro'],
+        'url_status': reverse('osc_dashboard:export_job_status', args=[job_id]),
+        'url_download': None,
+    }
+    if job['status'] == 'concluido':
+        resultado['url_download'] = reverse('osc_dashboard:export_job_download', args=[job_id])
+    return resultado
+
 @csrf_exempt
-def filter_data(request):
-    """Filtra dados usando SQLite e retorna resultados em JSON"""
+@rate_limit('exportacao')
+def export_job_create(request):
+    """Cria uma tarefa de exportação em segundo plano (ou reaproveita uma idêntica)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            
-            # Parâmetros de filtro
-            municipio = data.get('municipio', '')
-            natureza_juridica = data.get('natureza_juridica', '')
-            palavras_chave = data.get('palavras_chave', '')
-            palavras_excluir = data.get('palavras_excluir', '')  # Novo: palavras para excluir
-            situacao_cadastral = data.get('situacao_cadastral', '')  # Novo: situação cadastral
-            naturezas_ver = data.get('naturezas_ver', [])  # Mudança: agora são as naturezas que quer ver
-            page = data.get('page', 1)
-            per_page = data.get('per_page', 50)
-            
-            # Conecta ao banco
-            conn = get_db_connection()
-            
-            # Constrói query SQL para contagem total
-            count_query = "SELECT COUNT(*) FROM oscs WHERE 1=1"
-            params = []
-            
-            if municipio:
-                # Separa os municípios e faz busca OR com igualdade exata
-                municipios = [m.strip() for m in municipio.split(',') if m.strip()]
-                if municipios:
-                    municipio_conditions = []
-                    for mun in municipios:
-                        municipio_conditions.append("edmu_nm_municipio = ?")
-                        params.append(mun)
-                    count_query += f" AND ({' OR '.join(municipio_conditions)})"
-            
-            if natureza_juridica:
-                # Separa as naturezas jurídicas e faz busca OR com igualdade exata
-                naturezas = [n.strip() for n in natureza_juridica.split(',') if n.strip()]
-                if naturezas:
-                    natureza_conditions = []
-                    for natureza in naturezas:
-                        natureza_conditions.append("natureza_juridica = ?")
-                        params.append(natureza)
-                    count_query += f" AND ({' OR '.join(natureza_conditions)})"
-            
-            if palavras_chave:
-                # Separa as palavras-chave e faz busca OR (OSC deve conter QUALQUER uma das palavras)
-                keywords = [kw.strip() for kw in palavras_chave.split() if kw.strip()]
-                if keywords:
-                    keyword_conditions = []
-                    for keyword in keywords:
-                        keyword_conditions.append("nome LIKE ?")
-                        params.append(f'%{keyword}%')
-                    count_query += f" AND ({' OR '.join(keyword_conditions)})"
-
-            if palavras_excluir:
-                # Separa as palavras para excluir e faz busca NOT LIKE
-                exclude_keywords = [kw.strip() for kw in palavras_excluir.split() if kw.strip()]
-                if exclude_keywords:
-                    exclude_conditions = []
-                    for keyword in exclude_keywords:
-                        exclude_conditions.append("nome NOT LIKE ?")
-                        params.append(f'%{keyword}%')
-                    count_query += f" AND ({' AND '.join(exclude_conditions)})"
-
-            if situacao_cadastral:
-                # Separa as situações cadastrais e faz busca OR com igualdade exata
-                situacoes = [s.strip() for s in situacao_cadastral.split(',') if s.strip()]
-                if situacoes:
-                    situacao_conditions = []
-                    for situacao in situacoes:
-                        situacao_conditions.append("situacao_cadastral = ?")
-                        params.append(situacao)
-                    count_query += f" AND ({' OR '.join(situacao_conditions)})"
-            
-            # Filtra apenas as naturezas jurídicas selecionadas
-            if naturezas_ver:
-                placeholders = ','.join(['?' for _ in naturezas_ver])
-                count_query += f" AND natureza_juridica IN ({placeholders})"
-                params.extend(naturezas_ver)
-            
-            # Executa contagem
-            cursor = conn.cursor()
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
-            
-            # Constrói query para dados com paginação
-            data_query = count_query.replace("SELECT COUNT(*)", "SELECT *")
-            data_query += " LIMIT ? OFFSET ?"
-            data_params = params + [per_page, (page - 1) * per_page]
-            
-            # Executa query de dados
-            df = pd.read_sql_query(data_query, conn, params=data_params)
-            conn.close()
+            filtros = parse_filters(data)
+            filtros['estados'] = resolve_states(filtros['estados'])
+            job_id, job = submit_export(filtros, data.get('palavras_chave', ''), get_db_connection)
+            status = 200 if job['status'] == 'concluido' else 202
+            return JsonResponse(_export_job_response(job_id, job), status=status)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro ao criar exportação: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+def export_job_status(request, job_id):
+    """Estado e progresso de uma tarefa de exportação"""
+    job = read_job(job_id)
+    if job is None:
+        return JsonResponse({'error': 'Exportação não encontrada'}, status=404)
+    return JsonResponse(_export_job_response(job_id, job))
+
+def export_job_download(request, job_id):
+    """Baixa a planilha gerada por uma tarefa concluída"""
+    job = read_job(job_id)
+    if job is None or job['status'] != 'concluido':
+        return JsonResponse({'error': 'Exportação não encontrada ou não concluída'}, status=404)
+    return FileResponse(
+        open(artifact_path(job_id), 'rb'),
+        as_attachment=True,
+        filename=job['arquivo'],
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+def batch_lookup_response(request):
+    """Monta a resposta com a planilha enviada completada com os dados das OSCs"""
+    arquivo = request.FILES.get('arquivo')
+    if arquivo is None:
+        raise ValueError("Envie a planilha no campo 'arquivo'")
+    df, formato, separador = read_upload(arquivo, settings.LOOKUP_MAX_LINHAS)
+    coluna, modo = choose_column(df, request.POST.get('coluna'), request.POST.get('modo'))
+    estados = resolve_states([uf.upper() for uf in split_values(request.POST.get('estado', ''))])
+
+    conn = get_db_connection(estados)
+    try:
+        encontradas, cursor = lookup(conn, df[coluna].tolist(), modo)
+    except Exception:
+        conn.close()
+        raise
+
+    # As linhas saem do cursor; a conexão é fechada quando ele termina
+    cabecalho = enriched_header(df)
+    linhas = enriched_rows(df, iter_rows(conn, cursor))
+    filename = f"{re.sub(r'[^A-Za-z0-9_-]+', '_', arquivo.name.rsplit('.', 1)[0])}_enriquecido.{formato}"
+
+    if formato == 'csv':
+        response = StreamingHttpResponse(stream_csv(cabecalho, linhas, separador), content_type='text/csv; charset=utf-8')
+    else:
+        with measure('serializacao'):
+            planilha = write_xlsx(cabecalho, linhas)
+        response = FileResponse(
+            planilha,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Lote-Linhas'] = str(len(df))
+    response['X-Lote-Encontradas'] = str(encontradas)
+    response['X-Lote-Modo'] = modo
+    return response
 
-            # Converte para lista de dicionários e trata NaN
-            data_list = []
-            for _, row in df.iterrows():
-                row_dict = {}
-                for col, value in row.items():
-                    # Converte NaN para None
-                    if pd.isna(value):
-                        row_dict[col] = None
-                    else:
-                        row_dict[col] = value
-                data_list.append(row_dict)
-            
-            return JsonResponse({
-                'data': data_list,
-                'total': total,
-                'page': page,
-                'per_page': per_page,
-                'total_pages': (total + per_page - 1) // per_page
-            })
-            
+@csrf_exempt
+@concurrency_limit('lote')
+@rate_limit('lote')
+def batch_lookup(request):
+    """Consulta em lote: completa uma planilha (CSV ou XLSX) de ids ou nomes de OSCs"""
+    if request.method == 'POST':
+        try:
+            return batch_lookup_response(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro na consulta em lote: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+def serialize_rows(df):
+    """Converte as linhas do DataFrame em dicionários, com NaN como None"""
+    data_list = []
+    for _, row in df.iterrows():
+        row_dict = {}
+        for col, value in row.items():
+            # Converte NaN para None
+            if pd.isna(value):
+                row_dict[col] = None
+            else:
+                row_dict[col] = value
+        data_list.append(row_dict)
+    return data_list
+
+def filter_results(data):
+    """Executa a filtragem paginada do payload e retorna o resultado (dict serializável em JSON)"""
+    # Parâmetros de filtro
+    filtros = parse_filters(data)
+    filtros['estados'] = resolve_states(filtros['estados'])
+    page, per_page = parse_pagination(data)
+
+    # Versão e caminho lidos uma vez, antes de abrir a conexão: se a versão
+    # ativa trocar no meio da requisição, o cache recebe no máximo dados
+    # novos sob a chave antiga (descartada na próxima leitura), e as linhas
+    # da página vêm do mesmo arquivo que gerou o índice de bitmaps
+    version = states_version()
+    db_path = get_db_path()
+    index = get_filter_index(filtros, db_path)
+
+    # Conecta ao banco (anexando os estados pedidos)
+    if index is not None:
+        conn = path_connector(db_path)()
+    else:
+        conn = get_db_connection(filtros['estados'])
+    entry = None
+    data_list = None
+    offset = (page - 1) * per_page
+    if index is not None:
+        # Contagem e paginação pelos bitmaps em memória; o SQLite só busca as linhas da página
+        total = index.count(filtros)
+        df = read_rows(conn, index.page(filtros, offset, per_page))
+        busca_aproximada = False
+    elif result_cache.enabled and len(filtros['estados']) == 1:
+        # Lista ordenada de rowids em cache; cada página é uma fatia dela
+        # (rowids só identificam linhas dentro de um único arquivo)
+        spec = canonical_filters(filtros)
+        entry = result_cache.get_or_compute(version, spec, lambda: compute_entry(conn, filtros))
+        total = len(entry['rowids'])
+        busca_aproximada = entry['busca_aproximada']
+        data_list = cached_page(entry, page, per_page)
+        if data_list is None:
+            # Lê a página pedida junto com as seguintes da janela, que ficam serializadas na entrada
+            fim = offset + per_page * JANELA_PAGINAS
+            relevancias = None
+            if entry['relevancias'] is not None:
+                relevancias = entry['relevancias'][offset:fim].tolist()
+            df = read_rows(conn, entry['rowids'][offset:fim].tolist(), relevancias)
+            with measure('serializacao'):
+                linhas = serialize_rows(df)
+            paginas = {
+                page + i: linhas[i * per_page:(i + 1) * per_page]
+                for i in range(JANELA_PAGINAS)
+                if i == 0 or offset + i * per_page < total
+            }
+            store_pages(entry, per_page, paginas)
+            result_cache.set(version, spec, entry)
+            data_list = paginas[page]
+    else:
+        # Constrói query SQL para contagem total
+        with_clause, from_where, params, order_by = build_query(conn, filtros)
+        count_query = f"{with_clause}SELECT COUNT(*) {from_where}"
+        
+        # Executa contagem
+        cursor = conn.cursor()
+        cursor.execute(count_query, params)
+        total = cursor.fetchone()[0]
+        
+        # Constrói query para dados com paginação
+        colunas = "oscs.*, relevancia.relevancia" if with_clause else "*"
+        data_query = f"{with_clause}SELECT {colunas} {from_where}{order_by} LIMIT ? OFFSET ?"
+        data_params = params + [per_page, offset]
+        
+        # Executa query de dados
+        df = pd.read_sql_query(data_query, conn, params=data_params)
+        busca_aproximada = bool(with_clause)
+
+    # Contagens por faceta, sob demanda
+    facetas = None
+    if data.get('facetas'):
+        if index is not None:
+            facetas = index.facet_counts(filtros)
+        elif entry is not None:
+            if entry['facetas'] is None:
+                entry['facetas'] = facet_counts_sql(conn, filtros)
+                result_cache.set(version, spec, entry)
+            facetas = entry['facetas']
+        else:
+            facetas = facet_counts_sql(conn, filtros)
+    conn.close()
+
+    with measure('serializacao'):
+        if data_list is None:
+            data_list = serialize_rows(df)
+        
+        resultado = {
+            'data': data_list,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page,
+            'busca_aproximada': busca_aproximada,
+            'estados': filtros['estados'],
+            'motor': 'bitmap' if index is not None else 'sqlite'
+        }
+        if facetas is not None:
+            resultado['facetas'] = facetas
+
+        return resultado
+
+def filter_response(data):
+    """Executa a filtragem paginada do payload e monta a resposta JSON"""
+    return JsonResponse(filter_results(data))
+
+# Payload da primeira página do dashboard (sem filtros), embutida no HTML
+PRIMEIRA_PAGINA = {'page': 1, 'per_page': 50, 'facetas': True}
+_primeira_pagina = {'versao': None, 'json': None, 'montando': None}
+_primeira_pagina_lock = threading.Lock()
+
+def get_first_page_json():
+    """
+    Primeira página sem filtros (dados, total e facetas) serializada para o
+    template, mantida por worker enquanto a versão do banco não muda. Monta
+    na hora quando falta; é chamada no aquecimento e pela thread de
+    cached_first_page, nunca na requisição do dashboard.
+    """
+    versao = states_version([default_state()])
+    if _primeira_pagina['versao'] != versao:
+        conteudo = json.dumps(filter_results(PRIMEIRA_PAGINA), cls=DjangoJSONEncoder, ensure_ascii=False)
+        # Como o json_script do Django: nada no JSON pode fechar a tag <script>
+        conteudo = conteudo.replace('<', '\\u003C').replace('>', '\\u003E').replace('&', '\\u0026')
+        _primeira_pagina.update(versao=versao, json=conteudo)
+    return _primeira_pagina['json']
+
+def _build_first_page():
+    try:
+        get_first_page_json()
+    except Exception:
+        logger.exception("Erro ao montar a primeira página do dashboard")
+    finally:
+        with _primeira_pagina_lock:
+            _primeira_pagina['montando'] = None
+
+def cached_first_page():
+    """
+    Primeira página já montada para a versão atual do banco, ou None. Sem
+    ela (worker sem aquecimento, versão nova do banco), a montagem roda em
+    uma thread, fora da requisição, e esta página do dashboard é carregada
+    pelo JS em /filter/.
+    """
+    versao = states_version([default_state()])
+    with _primeira_pagina_lock:
+        if _primeira_pagina['versao'] == versao:
+            return _primeira_pagina['json']
+        if _primeira_pagina['montando'] != versao:
+            _primeira_pagina['montando'] = versao
+            threading.Thread(target=_build_first_page, name='primeira-pagina', daemon=True).start()
+    return None
+
+@csrf_exempt
+def filter_data(request):
+    """Filtra dados usando SQLite e retorna resultados em JSON"""
+    if request.method == 'POST':
+        try:
+            return filter_response(json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': f'Erro ao filtrar dados: {str(e)}'}, status=500)
     
     return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+def analytics_response(data):
+    """Agrega as OSCs filtradas pelas dimensões pedidas (snapshot Parquet ou SQLite)"""
+    filtros = parse_filters(data)
+    filtros['estados'] = resolve_states(filtros['estados'])
+    agrupar = split_values(data.get('agrupar', 'municipio'))
+    invalidas = [d for d in agrupar if d not in DIMENSOES]
+    if invalidas:
+        raise ValueError(f"Dimensão(ões) inválida(s): {', '.join(invalidas)}")
+    limite = parse_limit(data.get('limite'))
+
+    tabelas = None
+    if supports(filtros):
+        bancos = state_databases()
+        tabelas = [get_snapshot(bancos[uf]) for uf in filtros['estados']]
+        if any(tabela is None for tabela in tabelas):
+            tabelas = None
+
+    if tabelas is not None:
+        with measure('agregacao'):
+            linhas = aggregate_snapshot(tabelas, filtros, agrupar, limite)
+    else:
+        conn = get_db_connection(filtros['estados'])
+        linhas = aggregate_sql(conn, filtros, agrupar, limite)
+        conn.close()
+
+    return JsonResponse({
+        'agrupar': agrupar,
+        'linhas': linhas,
+        'total': sum(linha['total'] for linha in linhas),
+        'estados': filtros['estados'],
+        'motor': 'parquet' if tabelas is not None else 'sqlite',
+    })
+
+@csrf_exempt
+@concurrency_limit('analise')
+def analytics_data(request):
+    """API endpoint de agregações (contagens por município, natureza e situação)"""
+    if request.method == 'POST':
+        try:
+            return analytics_response(json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': f'Erro ao agregar dados: {str(e)}'}, status=500)
+
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+def summary_data(request):
+    """API endpoint com o resumo estatístico pré-calculado da base"""
+    return JsonResponse(get_summary_snapshot())
+
+def version_history(request):
+    """API endpoint com o histórico de versões dos dados (?estado=UF; padrão: estado padrão)"""
+    try:
+        estados = resolve_states(split_values(request.GET.get('estado', '')))
+        conn = get_db_connection(estados[:1])
+        try:
+            versoes = load_versions(conn)
+        finally:
+            conn.close()
+        return JsonResponse({'estado': estados[0], 'versoes': versoes})
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Erro ao obter histórico de versões")
+        return JsonResponse({'error': f'Erro ao obter histórico de versões: {str(e)}'}, status=500)
+
+@staff_member_required
+def profile_reports(request):
+    """Lista os relatórios de perfilamento gravados (só staff)"""
+    return JsonResponse({'relatorios': list_reports()})
+
+@staff_member_required
+def profile_report(request, relatorio_id):
+    """Relatório de uma requisição perfilada: cProfile e planos das consultas (só staff)"""
+    relatorio = read_report(relatorio_id)
+    if relatorio is None:
+        return JsonResponse({'error': 'Relatório não encontrado'}, status=404)
+    if request.GET.get('formato') == 'texto':
+        return HttpResponse(profile_text(relatorio), content_type='text/plain; charset=utf-8')
+    return JsonResponse(relatorio, json_dumps_params={'ensure_ascii': False})
+
+def profile_text(relatorio):
+    """Relatório de perfilamento em texto (consultas com seus planos e a saída do cProfile)"""
+    linhas = [
+        f"{relatorio['metodo']} {relatorio['caminho']} -> {relatorio['status']} "
+        f"em {relatorio['total_ms']} ms ({relatorio['sql_consultas']} consultas, {relatorio['sql_ms']} ms de SQL)",
+        f"Corpo: {relatorio['corpo']}",
+        '',
+    ]
+    for i, consulta in enumerate(relatorio['consultas'], 1):
+        linhas.append(f"[{i}] {consulta['ms']} ms")
+        linhas.append(consulta['sql'])
+        linhas.append(f"Parâmetros: {consulta['parametros']}")
+        linhas.extend(f"  {passo}" for passo in consulta['plano'] or [])
+        linhas.append('')
+    linhas.append(relatorio['perfil'])
+    return '\n'.join(linhas)
+
+def metrics_access(view):
+    """
+    Restringe a view a staff ou a quem enviar METRICS_TOKEN no cabeçalho
+    Authorization (Bearer), para coletores como o Prometheus
+    """
+    protegida = staff_member_required(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        if token and hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return view(request, *args, **kwargs)
+        return protegida(request, *args, **kwargs)
+    return wrapper
+
+@metrics_access
+def cache_stats(request):
+    """API endpoint com as métricas do cache de resultados do worker (staff ou token)"""
+    return JsonResponse(result_cache.stats())
+
+@metrics_access
+def metrics(request):
+    """Métricas de performance do worker no formato texto do Prometheus (staff ou token)"""
+    cache = result_cache.stats()
+    conteudo = histograms.render_prometheus({
+        'osc_result_cache_hits': cache['hits'],
+        'osc_result_cache_misses': cache['misses'],
+        'osc_result_cache_evictions': cache['evictions'],
+        'osc_result_cache_invalidations': cache['invalidacoes'],
+        'osc_result_cache_entries': cache['entradas'],
+    })
+    return HttpResponse(conteudo, content_type='text/plain; version=0.0.4; charset=utf-8')
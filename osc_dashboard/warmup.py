@@ -0,0 +1,93 @@
+"""
+Aquecimento do worker na inicialização
+
+Antes de o worker aceitar tráfego, carrega o resumo e o índice de bitmaps do
+banco ativo, pré-lê as páginas dos índices, preenche as opções de filtro e
+a contagem por município, compila o template do dashboard, monta a primeira
+página embutida no HTML e executa algumas consultas representativas (a
+página inicial, o município com mais OSCs, a situação cadastral mais comum
+e uma busca por palavra-chave), que ficam no cache de resultados. Sem isso,
+o primeiro usuário depois de um cold start paga todas essas cargas.
+
+Roda uma vez por processo, a partir de OscDashboardConfig.ready(), quando
+WARMUP_ON_BOOT está ativo e o processo vai servir requisições (gunicorn,
+uvicorn ou runserver). Os workers do gunicorn carregam a aplicação antes de
+aceitar conexões, então o ready() já roda nesse ponto; com --preload, roda
+uma vez no processo mestre e os workers herdam os caches no fork. Os tempos
+de cada etapa vão para o log estruturado de performance.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('osc_dashboard.performance')
+
+_lock = threading.Lock()
+_aquecido = False
+
+# Palavra-chave da consulta representativa de busca
+PALAVRA_CHAVE = 'associacao'
+
+
+def representative_payloads(resumo):
+    """Payloads de /filter/ das consultas executadas no aquecimento"""
+    payloads = [{}]
+    if resumo['top_municipios']:
+        payloads.append({'municipio': resumo['top_municipios'][0]['municipio']})
+    if resumo['por_situacao']:
+        situacao = max(resumo['por_situacao'].items(), key=lambda item: item[1])[0]
+        payloads.append({'situacao_cadastral': situacao})
+    payloads.append({'palavras_chave': PALAVRA_CHAVE, 'busca_aproximada': True})
+    return payloads
+
+
+def warm_worker():
+    """
+    Aquece o processo atual (uma vez por processo) e retorna os tempos de
+    cada etapa em ms. Erros são registrados sem impedir a inicialização.
+    """
+    global _aquecido
+    from django.template.loader import get_template
+
+    from . import views
+    from .versions import warm_version
+
+    with _lock:
+        if _aquecido:
+            return None
+        _aquecido = True
+
+    tempos = {}
+    inicio = time.perf_counter()
+
+    def etapa(nome, funcao):
+        comeco = time.perf_counter()
+        try:
+            funcao()
+        except Exception as e:
+            logger.warning(f"Erro no aquecimento ({nome}): {e}")
+        tempos[nome] = round((time.perf_counter() - comeco) * 1000, 2)
+
+    db_path = views.get_db_path()
+    etapa('banco', lambda: warm_version(db_path))
+    etapa('opcoes', lambda: (views.get_filter_options(), views.get_oscs_por_municipio()))
+    etapa('template', lambda: get_template('osc_dashboard/dashboard.html'))
+    etapa('primeira_pagina', views.get_first_page_json)
+
+    def consultas():
+        for payload in representative_payloads(views.get_summary_snapshot()):
+            views.filter_response(payload)
+
+    etapa('consultas', consultas)
+
+    logger.info(json.dumps({
+        'evento': 'aquecimento',
+        'pid': os.getpid(),
+        'banco': str(db_path),
+        'total_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'tempos_ms': tempos,
+    }, ensure_ascii=False))
+    return tempos
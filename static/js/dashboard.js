@@ -13,6 +13,12 @@ document.addEventListener('DOMContentLoaded', function() {
     let selectedNaturezas = []; // Array para armazenar múltiplas naturezas jurídicas
     let selectedSituacoes = []; // Array para armazenar múltiplas situações cadastrais
     let allMunicipios = []; // Lista de todos os municípios disponíveis
+    let facetCounts = null; // Contagens por faceta retornadas pelo último filtro
+    const PER_PAGE = 50;
+    const MAX_PREFETCHED_PAGES = 5;
+    const prefetchedPages = new Map(); // Páginas pré-carregadas (página -> resposta) dos filtros atuais
+    let prefetchKey = null; // Filtros (JSON) a que as páginas pré-carregadas correspondem
+    let facetasKey = null; // Filtros (JSON) a que as facetas exibidas correspondem
 
     // Instância da tabela moderna
     let oscTable = null;
@@ -38,6 +44,20 @@ document.addEventListener('DOMContentLoaded', function() {
         if (totalOscs) totalOscs.textContent = filtered || totalRecords;
     }
 
+    function updateFacetas(facetas) {
+        // Mostra nas opções quantas OSCs cada valor retornaria com os demais filtros
+        facetCounts = facetas || null;
+        ['natureza_juridica', 'situacao_cadastral'].forEach(campo => {
+            const select = document.getElementById(campo);
+            if (!select) return;
+            Array.from(select.options).forEach(option => {
+                if (!option.value) return;
+                const total = facetCounts && facetCounts[campo] ? (facetCounts[campo][option.value] || 0) : null;
+                option.textContent = total === null ? option.value : `${option.value} (${total})`;
+            });
+        });
+    }
+
     function handleEmptyMunicipioResult(municipio) {
         // Limpar filtros
         clearAllFilters();
@@ -75,6 +95,23 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('palavras_excluir').value = '';
         document.getElementById('situacao_cadastral').value = '';
         document.getElementById('naturezas_ver').selectedIndex = -1;
+        ['bacia', 'regiao'].forEach(id => {
+            const select = document.getElementById(id);
+            if (select) {
+                select.selectedIndex = -1;
+            }
+        });
+        const alteradoDesde = document.getElementById('alterado_desde');
+        if (alteradoDesde) {
+            alteradoDesde.value = '';
+        }
+        document.getElementById('busca_aproximada').checked = false;
+        const estadoSelect = document.getElementById('estado');
+        if (estadoSelect) {
+            Array.from(estadoSelect.options).forEach(option => {
+                option.selected = option.defaultSelected;
+            });
+        }
 
         // Limpar palavras-chave múltiplas
         keywords = [];
@@ -98,6 +135,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Reset current filters
         currentFilters = {};
+        updateFacetas(null);
     }
 
     // Funções para gerenciar múltiplas palavras-chave
@@ -337,11 +375,12 @@ document.addEventListener('DOMContentLoaded', function() {
         if (municipios.length === 0) {
             suggestions.innerHTML = '<div class="municipio-suggestion-item">Nenhum município encontrado</div>';
         } else {
-            suggestions.innerHTML = municipios.map(municipio =>
-                `<div class="municipio-suggestion-item" data-municipio="${municipio}">
-                    ${municipio}
-                </div>`
-            ).join('');
+            suggestions.innerHTML = municipios.map(municipio => {
+                const total = facetCounts && facetCounts.municipio ? (facetCounts.municipio[municipio] || 0) : null;
+                return `<div class="municipio-suggestion-item" data-municipio="${municipio}">
+                    ${municipio}${total === null ? '' : ` <small class="text-muted">(${total})</small>`}
+                </div>`;
+            }).join('');
 
             // Adiciona event listeners para os itens
             suggestions.querySelectorAll('.municipio-suggestion-item').forEach(item => {
@@ -483,20 +522,57 @@ document.addEventListener('DOMContentLoaded', function() {
             palavras_chave: getKeywordsString(),
             palavras_excluir: getExcludeKeywordsString(),
             situacao_cadastral: getSituacoesString(),
-            naturezas_ver: Array.from(document.getElementById('naturezas_ver').selectedOptions).map(option => option.value)
+            naturezas_ver: Array.from(document.getElementById('naturezas_ver').selectedOptions).map(option => option.value),
+            busca_aproximada: document.getElementById('busca_aproximada').checked,
+            estado: getEstados(),
+            bacia: getSelecionados('bacia'),
+            regiao: getSelecionados('regiao'),
+            alterado_desde: getAlteradoDesde()
         };
     }
 
+    function getAlteradoDesde() {
+        // O seletor só existe quando o banco tem atualizações incrementais no histórico
+        const select = document.getElementById('alterado_desde');
+        return select ? select.value : '';
+    }
+
+    function getSelecionados(id) {
+        // Os seletores de bacia e região só existem quando o banco tem o mapeamento de municípios
+        const select = document.getElementById(id);
+        return select ? Array.from(select.selectedOptions).map(option => option.value) : [];
+    }
+
+    function getEstados() {
+        // O seletor de estados só existe quando há bancos de mais de uma UF
+        const select = document.getElementById('estado');
+        return select ? Array.from(select.selectedOptions).map(option => option.value) : [];
+    }
+
     function loadData(page = 1, shouldScroll = true) {
         console.log('Iniciando loadData, página:', page);
-        showLoading(shouldScroll);
-
         currentFilters = getFilters();
+        resetPrefetchIfFiltersChanged();
+
+        // Página já pré-carregada em tempo ocioso: exibida sem esperar a rede
+        const prefetched = prefetchedPages.get(page);
+        if (prefetched) {
+            renderResults(prefetched);
+            schedulePrefetch(page + 1);
+            return;
+        }
+
+        showLoading(shouldScroll);
+        const filtrosKey = JSON.stringify(currentFilters);
         const data = {
             ...currentFilters,
             page: page,
-            per_page: 50
+            per_page: PER_PAGE
         };
+        // As facetas não mudam entre páginas: só são pedidas quando os filtros mudam
+        if (filtrosKey !== facetasKey) {
+            data.facetas = true;
+        }
 
         console.log('Dados a serem enviados:', data);
         console.log('URL da API:', filterDataUrl);
@@ -524,19 +600,22 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            currentPage = response.page;
-            totalPages = response.total_pages;
-            totalRecords = response.total;
-
             // Verificar se não há resultados e há filtro de município
             if (response.total === 0 && currentFilters.municipio) {
                 handleEmptyMunicipioResult(currentFilters.municipio);
                 return;
             }
 
-            updateTable(response.data);
-            updatePaginationInfo();
-            updateStats(response.total);
+            renderResults(response);
+            if (response.facetas !== undefined) {
+                facetasKey = filtrosKey;
+            }
+            schedulePrefetch(response.page + 1);
+
+            // Sem o índice de trigramas no banco, o servidor faz a busca exata
+            if (currentFilters.busca_aproximada && currentFilters.palavras_chave && !response.busca_aproximada) {
+                showToast('warning', 'Busca aproximada indisponível neste banco: resultados da busca exata.');
+            }
 
             if (response.total > 0) {
                 showToast('success', `${response.data.length} registros carregados com sucesso!`);
@@ -550,6 +629,78 @@ document.addEventListener('DOMContentLoaded', function() {
             showToast('error', 'Erro ao carregar dados. Tente novamente.');
         });
     }
+    function renderResults(response) {
+        // Exibe uma resposta de /filter/ (requisição ou primeira página embutida no HTML)
+        currentPage = response.page;
+        totalPages = response.total_pages;
+        totalRecords = response.total;
+
+        updateTable(response.data);
+        updatePaginationInfo();
+        updateStats(response.total);
+        // As facetas não mudam entre páginas; as páginas pré-carregadas não as trazem
+        if (response.facetas !== undefined) {
+            updateFacetas(response.facetas);
+        }
+    }
+
+    function resetPrefetchIfFiltersChanged() {
+        const key = JSON.stringify(currentFilters);
+        if (key !== prefetchKey) {
+            prefetchedPages.clear();
+            prefetchKey = key;
+        }
+    }
+
+    function schedulePrefetch(page) {
+        // Pré-carrega a próxima página em tempo ocioso; o servidor já a leu junto com a atual
+        if (page > totalPages || prefetchedPages.has(page)) return;
+        const key = prefetchKey;
+        const whenIdle = window.requestIdleCallback || (callback => setTimeout(callback, 200));
+        whenIdle(() => {
+            if (key !== prefetchKey) return;
+            fetch(filterDataUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                },
+                body: JSON.stringify({ ...JSON.parse(key), page: page, per_page: PER_PAGE })
+            })
+            .then(response => response.ok ? response.json() : null)
+            .then(response => {
+                if (!response || response.error || key !== prefetchKey) return;
+                prefetchedPages.set(page, response);
+                while (prefetchedPages.size > MAX_PREFETCHED_PAGES) {
+                    prefetchedPages.delete(prefetchedPages.keys().next().value);
+                }
+            })
+            .catch(error => console.warn('Erro ao pré-carregar a página', page, error));
+        });
+    }
+
+    function hydrateFirstPage() {
+        // A primeira página sem filtros vem no HTML: exibida sem esperar uma requisição.
+        // Sem ela (ainda sendo montada no servidor), busca em /filter/
+        const script = document.querySelector('script[data-primeira-pagina]');
+        if (!script) {
+            loadData(1, false);
+            return;
+        }
+        try {
+            currentFilters = getFilters();
+            resetPrefetchIfFiltersChanged();
+            const primeiraPagina = JSON.parse(script.textContent);
+            renderResults(primeiraPagina);
+            if (primeiraPagina.facetas !== undefined) {
+                facetasKey = JSON.stringify(currentFilters);
+            }
+            schedulePrefetch(currentPage + 1);
+        } catch (e) {
+            console.error('Erro ao exibir a primeira página embutida:', e);
+        }
+    }
+
     function updateTable(data) {
         // Usar a nova implementação de tabela moderna
         if (oscTable) {
@@ -559,13 +710,20 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     function updatePaginationInfo() {
-        // A paginação agora é gerenciada pela OSCTable
-        // Esta função é mantida para compatibilidade, mas a lógica foi movida para OSCTable
-        if (oscTable) {
-            currentPage = oscTable.getCurrentPage();
-            totalPages = oscTable.getTotalPages();
-            totalRecords = oscTable.getTotalRecords();
+        // A OSCTable recebe só a página atual: os controles refletem a paginação do servidor
+        const start = totalRecords ? (currentPage - 1) * PER_PAGE + 1 : 0;
+        const end = Math.min(currentPage * PER_PAGE, totalRecords);
+
+        const infoPaginacao = document.getElementById('info-paginacao');
+        if (infoPaginacao) {
+            infoPaginacao.textContent = `Mostrando ${start} a ${end} de ${totalRecords} registros`;
         }
+        const paginaAtual = document.getElementById('pagina-atual');
+        if (paginaAtual) {
+            paginaAtual.textContent = `Página ${totalPages ? currentPage : 0} de ${totalPages}`;
+        }
+        document.getElementById('btn-anterior').disabled = currentPage <= 1;
+        document.getElementById('btn-proximo').disabled = currentPage >= totalPages;
     }
 
     function exportData() {
@@ -578,7 +736,41 @@ document.addEventListener('DOMContentLoaded', function() {
 
         const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
 
-        fetch(exportDataUrl, {
+        const restoreButton = () => {
+            exportBtn.disabled = false;
+            exportBtn.innerHTML = originalText;
+        };
+
+        // A planilha é gerada em segundo plano; o progresso é consultado até a conclusão
+        const pollJob = (job) => {
+            if (job.status === 'concluido') {
+                window.location.href = job.url_download;
+                showToast('success', 'Arquivo exportado com sucesso!');
+                restoreButton();
+                return;
+            }
+            if (job.status === 'erro') {
+                throw new Error(job.erro || 'Erro na exportação');
+            }
+            exportBtn.innerHTML = `<i class="fas fa-spinner fa-spin me-2"></i>Exportando... ${job.progresso}%`;
+            setTimeout(() => {
+                fetch(job.url_status)
+                    .then(response => {
+                        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                        return response.json();
+                    })
+                    .then(pollJob)
+                    .catch(handleError);
+            }, 1000);
+        };
+
+        const handleError = (error) => {
+            console.error('Erro na exportação:', error);
+            showToast('error', 'Erro ao exportar dados. Tente novamente.');
+            restoreButton();
+        };
+
+        fetch(exportJobsUrl, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -588,34 +780,15 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(response => {
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            return response.blob();
-        })
-        .then(blob => {
-            // Cria link para download
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.style.display = 'none';
-            a.href = url;
-            a.download = `OSCs_Parana_${new Date().toISOString().slice(0,10)}.xlsx`;
-            document.body.appendChild(a);
-            a.click();
-            window.URL.revokeObjectURL(url);
-            document.body.removeChild(a);
-
-            showToast('success', 'Arquivo exportado com sucesso!');
-        })
-        .catch(error => {
-            console.error('Erro na exportação:', error);
-            showToast('error', 'Erro ao exportar dados. Tente novamente.');
+            return response.json();
         })
-        .finally(() => {
-            // Restaura o botão
-            exportBtn.disabled = false;
-            exportBtn.innerHTML = originalText;
-        });
+        .then(pollJob)
+        .catch(handleError);
     }
     // Event Listeners
     document.getElementById('btn-filtrar').addEventListener('click', function() {
+        // Filtrar de novo sempre consulta o servidor
+        prefetchedPages.clear();
         loadData(1);
     });
 
@@ -839,6 +1012,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
 
         console.log('OSCTable inicializada com sucesso!');
+        hydrateFirstPage();
     } else {
         console.warn('OSCTable não está disponível. Verifique se o arquivo osc-table.js foi carregado.');
     }
@@ -41,7 +41,8 @@ class OSCTable extends ModernTable {
                 className: ''
             },
             {
-                content: `<span class="fw-semibold">${escapeHtml(osc.nome)}</span>`,
+                content: `<span class="fw-semibold">${escapeHtml(osc.nome)}</span>` +
+                    (osc.relevancia != null ? ` <span class="badge bg-light text-dark" title="Relevância da busca aproximada">${Math.round(osc.relevancia * 100)}%</span>` : ''),
                 className: 'text-truncate',
                 style: 'max-width: 200px;',
                 title: osc.nome || ''